@@ -1,21 +1,24 @@
 from web3 import Web3
-from typing import Dict, List, Tuple, Set
+from typing import Dict, List, Tuple
 from dotenv import load_dotenv
 import os
-from itertools import permutations
 from concurrent.futures import ThreadPoolExecutor
 import asyncio
+import sys
 from services.cache_service import CurvePoolCache
 from services.route_finder import RouteFinder
+from services.token_registry import TokenRegistry, checksum
+from pricer_core.chains import ARBITRUM
+from pricer_core.multicall import Call, Multicall
 import time
 
 # Load environment variables
 load_dotenv()
 
 class CurveRouter:
-    def __init__(self):
+    def __init__(self, rebuild_cache: bool = False):
         # Initialize Web3
-        self.w3 = Web3(Web3.HTTPProvider(os.getenv('ARB_ALCHEMY_API_URL')))
+        self.w3 = ARBITRUM.web3()
         
         # Initialize address provider
         self.address_provider = self.w3.eth.contract(
@@ -38,11 +41,16 @@ class CurveRouter:
             abi=self._get_rate_provider_abi()
         )
         
-        # Initialize cache service
-        self.cache = CurvePoolCache(self.w3, self.registry)
+        # Initialize cache service, which only indexes pools added to the registry handlers since its last run
+        self.multicall = Multicall(self.w3)
+        self.cache = CurvePoolCache(self.w3, self.registry, self.multicall, rebuild=rebuild_cache)
         
-        # Initialize route finder
-        self.route_finder = RouteFinder(self.cache)
+        # Token decimals/symbols for every pooled token, read once and kept on disk
+        self.tokens = TokenRegistry(self.multicall)
+        self.tokens.warm(self.cache.all_tokens)
+        
+        # Initialize route finder, which ranks paths on rates quoted through multicall
+        self.route_finder = RouteFinder(self.cache, self._estimate_rates)
         
     def _get_address_provider_abi(self) -> List:
         return [{
@@ -55,6 +63,13 @@ class CurveRouter:
 
     def _get_registry_abi(self) -> List:
         return [{
+            "name": "registry_length",
+            "outputs": [{"type": "uint256"}],
+            "inputs": [],
+            "stateMutability": "view",
+            "type": "function"
+        },
+        {
             "name": "pool_count",
             "outputs": [{"type": "uint256"}],
             "inputs": [],
@@ -115,26 +130,6 @@ class CurveRouter:
             "type": "function"
         }]
 
-    def _get_possible_intermediate_tokens(self, token_in: str, token_out: str) -> Set[str]:
-        """Get all tokens that could serve as intermediaries"""
-        pools_with_input = self.cache.token_pools.get(token_in, set())
-        pools_with_output = self.cache.token_pools.get(token_out, set())
-        
-        # For intermediate routes
-        possible_intermediates = set()
-        # Check tokens in pools that have input token
-        for pool in pools_with_input:
-            possible_intermediates.update(self.cache.pool_tokens[pool])
-        # Check tokens in pools that have output token
-        for pool in pools_with_output:
-            possible_intermediates.update(self.cache.pool_tokens[pool])
-        
-        # Remove input/output tokens
-        possible_intermediates -= {token_in, token_out}
-        
-        print(f"\nFound {len(possible_intermediates)} possible intermediate tokens")
-        return possible_intermediates
-
     def _get_single_hop_quote(self, token_in: str, token_out: str, amount_in: int) -> List[tuple]:
         """Get quotes for a single hop"""
         try:
@@ -146,135 +141,109 @@ class CurveRouter:
             print(f"Error getting quote: {str(e)}")
             return []
 
-    def _find_routes(self, token_in: str, token_out: str, max_hops: int = 3) -> List[List[str]]:
-        """Find all possible routes up to max_hops"""
-        routes = []
-        
-        # Direct routes (1 hop)
-        if self._get_single_hop_quote(token_in, token_out, 1):  # Use small amount to test
-            routes.append([token_in, token_out])
-        
-        # 2 hop routes
-        if max_hops >= 2:
-            intermediates = self._get_possible_intermediate_tokens(token_in, token_out)
-            for mid in intermediates:
-                if (self._get_single_hop_quote(token_in, mid, 1) and 
-                    self._get_single_hop_quote(mid, token_out, 1)):
-                    routes.append([token_in, mid, token_out])
-        
-        # 3 hop routes
-        if max_hops >= 3:
-            intermediates = list(self._get_possible_intermediate_tokens(token_in, token_out))
-            for mid1, mid2 in permutations(intermediates, 2):
-                if (self._get_single_hop_quote(token_in, mid1, 1) and 
-                    self._get_single_hop_quote(mid1, mid2, 1) and 
-                    self._get_single_hop_quote(mid2, token_out, 1)):
-                    routes.append([token_in, mid1, mid2, token_out])
-        
-        return routes
+    def _best_quotes(self, requests: List[Tuple[str, str, int]]) -> Dict[Tuple[str, str, int], tuple]:
+        """Best get_quotes quote for each distinct (token_in, token_out, amount_in), all in one multicall"""
+        calls = [Call(self.rate_provider.address, "get_quotes(address,address,uint256)", request,
+                      ('(uint256,uint256,bool,uint256,address,uint256,uint256,uint256)[]',), key=request)
+                 for request in requests]
+        result = self.multicall.aggregate(calls)
+        best = {}
+        for request in requests:
+            quotes = result.get(request) or []
+            if quotes:
+                best[request] = max(quotes, key=lambda x: x[3])  # x[3] is amount_out
+        return best
 
-    async def _simulate_route(self, route: List[str], amount_in: int) -> Dict:
-        """Simulate a multi-hop route"""
-        current_amount = amount_in
-        hops = []
-        
-        print(f"\nSimulating route: {' -> '.join(route)}")
+    def _estimate_rates(self, edges: List[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+        """Rate (raw amount_out / amount_in) for one whole token_in on each edge"""
+        probe = {token: 10 ** self._get_token_decimals(token) for token in {a for a, _ in edges}}
+        quotes = self._best_quotes([(a, b, probe[a]) for a, b in edges])
+        return {(a, b): quotes[(a, b, probe[a])][3] / probe[a] if (a, b, probe[a]) in quotes else 0.0
+                for a, b in edges}
+
+    async def _simulate_routes(self, routes: List[List[str]], amount_in: int) -> List[Dict]:
+        """
+        Simulate multi-hop routes level by level: every route's first hop is
+        quoted in one batch, then every second hop, and so on, with hops
+        shared by several routes quoted once. Routes with a hop that gets no
+        quote come back as None.
+        """
+        amounts = [amount_in] * len(routes)
+        hops: List[List[Dict]] = [[] for _ in routes]
+        alive = [True] * len(routes)
         
-        # Process each hop sequentially
-        for i in range(len(route) - 1):
-            token_in, token_out = route[i], route[i + 1]
-            
-            # Get decimals for better logging
-            in_decimals = self._get_token_decimals(token_in)
-            out_decimals = self._get_token_decimals(token_out)
-            
-            print(f"\nHop {i+1}: {token_in} -> {token_out}")
-            print(f"Input amount: {current_amount / 10**in_decimals} ({current_amount} raw)")
-            
-            quotes = self._get_single_hop_quote(token_in, token_out, current_amount)
-            
-            if not quotes:
-                print(f"No quotes found for hop {i+1}")
-                return None
+        for level in range(max((len(route) - 1 for route in routes), default=0)):
+            requests = {i: (route[level], route[level + 1], amounts[i])
+                        for i, route in enumerate(routes) if alive[i] and level < len(route) - 1}
+            quotes = await asyncio.to_thread(self._best_quotes, list(set(requests.values())))
+            print(f"\nHop {level + 1}: {len(requests)} routes, {len(set(requests.values()))} distinct quotes")
             
-            best_quote = max(quotes, key=lambda x: x[3])  # x[3] is amount_out
-            if not best_quote:
-                print(f"No valid quote found for hop {i+1}")
-                return None
-            
-            current_amount = best_quote[3]  # Update amount for next hop
-            print(f"Output amount: {current_amount / 10**out_decimals} ({current_amount} raw)")
-            
-            hops.append({
-                "token_in": route[i],
-                "token_out": route[i + 1],
-                "amount_in": amount_in if i == 0 else hops[i-1]["amount_out"],
-                "amount_out": best_quote[3],
-                "pool": best_quote[4]  # pool address is at index 4
-            })
+            for i, (token_in, token_out, amount) in requests.items():
+                best_quote = quotes.get((token_in, token_out, amount))
+                if not best_quote:
+                    print(f"No quotes found for hop {level + 1} of {' -> '.join(routes[i])}")
+                    alive[i] = False
+                    continue
+                amounts[i] = best_quote[3]
+                hops[i].append({
+                    "token_in": token_in,
+                    "token_out": token_out,
+                    "amount_in": amount,
+                    "amount_out": best_quote[3],
+                    "pool": best_quote[4]  # pool address is at index 4
+                })
         
-        return {
+        return [{
             "protocol": "Curve",
             "path": route,
-            "hops": hops,
+            "hops": hops[i],
             "input_amount": amount_in,
-            "output_amount": current_amount
-        }
+            "output_amount": amounts[i]
+        } if alive[i] else None for i, route in enumerate(routes)]
+
+    async def _simulate_route(self, route: List[str], amount_in: int) -> Dict:
+        """Simulate a multi-hop route"""
+        return (await self._simulate_routes([route], amount_in))[0]
 
     async def find_best_route(self, token_in: str, token_out: str, amount_in: int):
         # Convert addresses to checksum format
-        token_in = Web3.to_checksum_address(token_in)
-        token_out = Web3.to_checksum_address(token_out)
+        token_in = checksum(token_in)
+        token_out = checksum(token_out)
         
         print(f"\nSearching for routes between {token_in} and {token_out}")
         possible_routes = self.route_finder.find_possible_routes(token_in, token_out)
         
         if not possible_routes:
             print("\nDebug: Route finding failed")
-            print(f"Input token pools: {self.cache.token_pools.get(token_in, set())}")
-            print(f"Output token pools: {self.cache.token_pools.get(token_out, set())}")
+            print(f"Input token pools: {self.cache.pools_for(token_in)}")
+            print(f"Output token pools: {self.cache.pools_for(token_out)}")
             print(f"Direct path possible: {self._get_single_hop_quote(token_in, token_out, 1)}")
             return None
         
         print(f"\nFound {len(possible_routes)} possible routes:")
         for route in possible_routes:
-            print(f"Route: {' -> '.join(route.path)}")
+            print(f"Route: {' -> '.join(route.path)} (cost {route.cost:.4f})")
         
-        # Simulate each route to find the best one
-        best_route = None
-        best_amount = 0
-        all_routes = []
-        
-        for route in possible_routes:
-            print(f"Trying route: {' -> '.join(route.path)}")
-            result = await self._simulate_route(route.path, amount_in)
-            if result and result['output_amount'] > best_amount:
-                best_route = result
-                best_amount = result['output_amount']
-            if result:
-                all_routes.append(result)
+        # Simulate every route at once to find the best one
+        all_routes = [result for result in await self._simulate_routes([route.path for route in possible_routes], amount_in)
+                      if result]
         
         if not all_routes:
             print("No valid routes found")
             return None
         
         return {
-            'best_route': best_route,
+            'best_route': max(all_routes, key=lambda route: route['output_amount']),
             'all_routes': all_routes
         }
 
     def _get_token_decimals(self, token_address: str) -> int:
-        """Get token decimals from contract"""
-        try:
-            abi = [{"inputs":[],"name":"decimals","outputs":[{"internalType":"uint8","type":"uint8"}],"stateMutability":"view","type":"function"}]
-            token_contract = self.w3.eth.contract(address=Web3.to_checksum_address(token_address), abi=abi)
-            return token_contract.functions.decimals().call()
-        except Exception as e:
-            print(f"Error getting decimals for {token_address}: {e}")
-            return 18  # Default to 18 if unable to get decimals
+        """Token decimals from the registry, read from chain only the first time a token is seen"""
+        return self.tokens.decimals(token_address)
 
 async def main():
-    router = CurveRouter()
+    # python curve_get_route.py --rebuild  re-indexes every registry pool
+    router = CurveRouter(rebuild_cache='--rebuild' in sys.argv)
     
     # Example tokens
     token_in = "0x912CE59144191C1204E64559FE8253a0e49E6548"  # arb
@@ -306,8 +275,8 @@ async def main():
             hop_out_decimals = router._get_token_decimals(hop['token_out'])
             
             print(f"Pool: {hop['pool']}")
-            print(f"Amount In: {hop['amount_in'] / 10**hop_in_decimals}")
-            print(f"Amount Out: {hop['amount_out'] / 10**hop_out_decimals}")
+            print(f"Amount In: {hop['amount_in'] / 10**hop_in_decimals} {router.tokens.symbol(hop['token_in'])}")
+            print(f"Amount Out: {hop['amount_out'] / 10**hop_out_decimals} {router.tokens.symbol(hop['token_out'])}")
             print("---")
         
         print("\nAll Routes Found:", len(result['all_routes']))
@@ -1,94 +1,205 @@
 from web3 import Web3
 import json
 import time
-from typing import Dict, Set
+from typing import Dict, Optional, Set
+
+from pricer_core.multicall import Call, Multicall
+from services.pool_index import PoolIndex
+from services.token_registry import checksum
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+
+# Incremental refreshes can't see pools removed from a handler, so the index is rebuilt from scratch this often
+FULL_REBUILD_INTERVAL = 7 * 24 * 3600
 
 class CurvePoolCache:
-    def __init__(self, w3: Web3, registry_contract):
+    """
+    Pool <-> token index of the Curve MetaRegistry as integer ids in CSR
+    arrays (services/pool_index.py), memory-mapped from curve_pool_cache.bin
+    along with how many pools of each registry handler it covers. The
+    MetaRegistry's own pool_list(i) concatenates its handlers' lists, so its
+    indices shift whenever an earlier handler grows; each handler's list is
+    append-only though, so each start reads every handler's pool_count() and
+    indexes just the pools added to it since, through multicall, skipping
+    addresses already indexed. build_cache() starts over, on request, when
+    there is no cache file, or once the last full build is
+    FULL_REBUILD_INTERVAL old.
+    """
+    def __init__(self, w3: Web3, registry_contract, multicall: Optional[Multicall] = None, rebuild: bool = False):
         self.w3 = w3
         self.registry = registry_contract
-        self.cache_file = "curve_pool_cache.json"
-        self.cache_expiry = 3600  # 1 hour in seconds
-        
-        # Cache structures
-        self.pool_tokens: Dict[str, Set[str]] = {}  # pool -> tokens
-        self.token_pools: Dict[str, Set[str]] = {}  # token -> pools
-        self.all_tokens: Set[str] = set()
-        self.last_update = 0
-        
+        self.multicall = multicall or Multicall(w3)
+        self.cache_file = "curve_pool_cache.bin"
+        self.legacy_cache_file = "curve_pool_cache.json"  # imported once when there is no .bin yet
+
+        self.index = PoolIndex.build([], self._empty_meta())
+
         # Load or build cache
-        self.load_cache()
-    
+        if rebuild:
+            self.build_cache()
+        else:
+            self.load_cache()
+
+    @staticmethod
+    def _empty_meta() -> Dict:
+        return {'handler_counts': {}, 'block_number': 0, 'timestamp': 0, 'full_build': 0}
+
+    @property
+    def handler_counts(self) -> Dict[str, int]:
+        """Registry handler -> its indices 0..count-1 are indexed"""
+        return self.index.meta.get('handler_counts', {})
+
+    @property
+    def pool_count(self) -> int:
+        return self.index.n_pools
+
+    @property
+    def block_number(self) -> int:
+        return self.index.meta['block_number']
+
+    @property
+    def last_update(self) -> float:
+        return self.index.meta['timestamp']
+
+    # Address views of the index, for callers that don't work in ids
+
+    @property
+    def pool_tokens(self) -> Dict[str, Set[str]]:
+        return {self.index.pool_address(p): {self.index.token_address(t) for t in self.index.tokens_of(p)}
+                for p in range(self.index.n_pools)}
+
+    @property
+    def token_pools(self) -> Dict[str, Set[str]]:
+        return {self.index.token_address(t): {self.index.pool_address(p) for p in self.index.pools_of(t)}
+                for t in range(self.index.n_tokens)}
+
+    def pools_for(self, token: str) -> Set[str]:
+        token_id = self.index.token_id(token)
+        return set() if token_id is None else {self.index.pool_address(p) for p in self.index.pools_of(token_id)}
+
+    @property
+    def all_tokens(self) -> Set[str]:
+        return {self.index.token_address(t) for t in range(self.index.n_tokens)}
+
     def load_cache(self):
-        """Load cache from file or build if expired/missing"""
+        """Load cache from file, then index pools added since; build if missing or due a full rebuild"""
+        index = PoolIndex.load(self.cache_file)
+        if index is None:
+            index = self._load_legacy_cache()
+            if index is None:
+                self.build_cache()
+                return
+            # Write the .bin now, refresh() only saves when a handler has grown
+            self.index = index
+            self.save_cache()
+        else:
+            self.index = index
+        if time.time() - self.index.meta.get('full_build', 0) > FULL_REBUILD_INTERVAL:
+            print("Pool cache is due a full rebuild")
+            self.build_cache()
+            return
+        self.refresh()
+
+    def _load_legacy_cache(self) -> Optional[PoolIndex]:
         try:
-            with open(self.cache_file, 'r') as f:
+            with open(self.legacy_cache_file, 'r') as f:
                 data = json.load(f)
-                if time.time() - data['timestamp'] < self.cache_expiry:
-                    self.pool_tokens = {k: set(v) for k, v in data['pool_tokens'].items()}
-                    self.token_pools = {k: set(v) for k, v in data['token_pools'].items()}
-                    self.all_tokens = set(data['all_tokens'])
-                    self.last_update = data['timestamp']
-                    return
-        except FileNotFoundError:
-            pass
-        
-        self.build_cache()
-    
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        print(f"Importing {self.legacy_cache_file}")
+        # No handler counts: the first refresh re-reads every handler's list and keeps only unseen addresses
+        return PoolIndex.build(data['pool_tokens'].items(), {
+            **self._empty_meta(),
+            'block_number': data.get('block_number', 0),
+            'timestamp': data['timestamp'],
+            'full_build': data['timestamp']
+        })
+
     def build_cache(self):
-        """Build cache from chain data"""
+        """Build cache from chain data, from scratch"""
         print("Building pool cache...")
-        
-        # Get total number of pools
-        pool_count = self.registry.functions.pool_count().call()
-        print(f"Found {pool_count} pools")
-        
-        # Iterate through all pools
-        for i in range(pool_count):
-            try:
-                # Get pool address
-                pool_address = self.registry.functions.pool_list(i).call()
-                pool_address = self.w3.to_checksum_address(pool_address)
-                
-                # Get coins (regular and underlying)
-                coins = self.registry.functions.get_coins(pool_address).call()
-                underlying_coins = self.registry.functions.get_underlying_coins(pool_address).call()
-                
-                # Filter out null addresses
-                coins = [self.w3.to_checksum_address(coin) for coin in coins if coin != '0x0000000000000000000000000000000000000000']
-                underlying_coins = [self.w3.to_checksum_address(coin) for coin in underlying_coins if coin != '0x0000000000000000000000000000000000000000']
-                
-                # Combine all tokens for this pool
-                pool_tokens = set(coins + underlying_coins)
-                
-                # Update mappings
-                self.pool_tokens[pool_address] = pool_tokens
-                self.all_tokens.update(pool_tokens)
-                
-                # Update token -> pools mapping
-                for token in pool_tokens:
-                    if token not in self.token_pools:
-                        self.token_pools[token] = set()
-                    self.token_pools[token].add(pool_address)
-                
-                if i % 10 == 0:  # Progress update every 10 pools
-                    print(f"Processed {i}/{pool_count} pools")
-                    
-            except Exception as e:
-                print(f"Error processing pool {i}: {str(e)}")
-                continue
-        
-        print(f"Cache built successfully. Found {len(self.all_tokens)} unique tokens across {len(self.pool_tokens)} pools.")
+        self.index = PoolIndex.build([], {**self._empty_meta(), 'full_build': time.time()})
+        self.refresh()
+        print(f"Cache built successfully. Found {self.index.n_tokens} unique tokens across {self.index.n_pools} pools.")
+
+    def _handler_pool_counts(self, block_number: int) -> Dict[str, int]:
+        """Registry handler -> pool_count() at block_number, for every handler of the MetaRegistry"""
+        registry_length = self.registry.functions.registry_length().call(block_identifier=block_number)
+        handlers = self.multicall.aggregate([
+            Call(self.registry.address, "get_registry(uint256)", (i,), ('address',), key=i)
+            for i in range(registry_length)
+        ], block_number)
+        if handlers.failed:
+            raise ValueError(f"could not read {len(handlers.failed)} of {registry_length} registry handlers")
+        handlers = [checksum(handlers.get(i)) for i in range(registry_length)]
+        counts = self.multicall.aggregate([
+            Call(handler, "pool_count()", (), ('uint256',), key=handler) for handler in handlers
+        ], block_number)
+        if counts.failed:
+            raise ValueError(f"could not read pool_count() of handlers {', '.join(map(str, counts.failed))}")
+        return {handler: counts.get(handler) for handler in handlers}
+
+    def refresh(self) -> int:
+        """Index pools added to any registry handler since the last refresh; returns how many"""
+        block_number = self.multicall.resolve_block()
+        try:
+            pool_counts = self._handler_pool_counts(block_number)
+        except Exception as e:
+            print(f"Error reading registry handlers: {str(e)}")
+            return 0
+        indexed = self.handler_counts
+        new_indices = {handler: range(indexed.get(handler, 0), count)
+                       for handler, count in pool_counts.items() if count > indexed.get(handler, 0)}
+        if not new_indices:
+            return 0
+        print(f"Reading {sum(map(len, new_indices.values()))} new handler entries ({sum(pool_counts.values())} in registry)")
+
+        addresses = self.multicall.aggregate([
+            Call(handler, "pool_list(uint256)", (i,), ('address',), key=(handler, i))
+            for handler, indices in new_indices.items() for i in indices
+        ], block_number)
+        # A pool can be listed by more than one handler, and a legacy import has no handler counts
+        pools = {checksum(address) for address in addresses.results.values() if address}
+        pools = sorted(pool for pool in pools if self.index.pool_id(pool) is None)
+        coins = self.multicall.aggregate(
+            [Call(self.registry.address, "get_coins(address)", (pool,), ('address[8]',), key=(pool, 'coins'))
+             for pool in pools] +
+            [Call(self.registry.address, "get_underlying_coins(address)", (pool,), ('address[8]',), key=(pool, 'underlying'))
+             for pool in pools],
+            block_number
+        )
+
+        # Per handler, stop at the first index whose address or coins couldn't be read so the next refresh retries from there
+        counts = dict(indexed)
+        new_pools = {}
+        for handler, indices in new_indices.items():
+            counts[handler] = indices.stop
+            for i in indices:
+                address = addresses.get((handler, i))
+                if not address:
+                    print(f"Error reading pool {i} from registry handler {handler}")
+                    counts[handler] = i
+                    break
+                pool = checksum(address)
+                if self.index.pool_id(pool) is not None or pool in new_pools:
+                    continue
+                if coins.get((pool, 'coins')) is None:
+                    print(f"Error processing pool {pool}: get_coins failed")
+                    counts[handler] = i
+                    break
+                # Combine regular and underlying coins (which revert for pools without any), dropping null addresses
+                pool_coins = list(coins.get((pool, 'coins'))) + list(coins.get((pool, 'underlying')) or [])
+                new_pools[pool] = [coin for coin in pool_coins if coin != ZERO_ADDRESS]
+
+        self.index = self.index.extend(new_pools.items(), {'handler_counts': counts, 'block_number': block_number,
+                                                           'timestamp': time.time()})
         self.save_cache()
-    
+        if new_pools:
+            print(f"Indexed {len(new_pools)} new pools")
+        return len(new_pools)
+
     def save_cache(self):
         """Save cache to file"""
-        cache_data = {
-            'timestamp': time.time(),
-            'pool_tokens': {k: list(v) for k, v in self.pool_tokens.items()},
-            'token_pools': {k: list(v) for k, v in self.token_pools.items()},
-            'all_tokens': list(self.all_tokens)
-        }
-        
-        with open(self.cache_file, 'w') as f:
-            json.dump(cache_data, f) 
\ No newline at end of file
+        self.index.save(self.cache_file)
+        # Reopen as a memory map rather than keeping the freshly built arrays
+        self.index = PoolIndex.load(self.cache_file)
@@ -0,0 +1,191 @@
+import json
+import mmap
+import os
+import struct
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.token_registry import checksum
+
+MAGIC = b'CRVIDX01'
+ALIGN = 8
+
+def write_arrays(path: str, meta: Dict, arrays: Dict[str, np.ndarray]):
+    """
+    MAGIC, a little-endian uint32 header length, a JSON header (meta and
+    each array's dtype/shape/offset), then the arrays' raw bytes, each
+    8-byte aligned so they can be viewed straight out of an mmap
+    """
+    layout, offset = [], 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        layout.append({'name': name, 'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset})
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    header = json.dumps({'meta': meta, 'arrays': layout}).encode()
+    start = -(-(len(MAGIC) + 4 + len(header)) // ALIGN) * ALIGN
+
+    # Written aside and renamed into place, so maps of the old file stay valid
+    with open(path + '.tmp', 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header)) + header)
+        for entry, array in zip(layout, arrays.values()):
+            f.seek(start + entry['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(start + offset)
+    os.replace(path + '.tmp', path)
+
+def read_arrays(path: str) -> Optional[Tuple[Dict, Dict[str, np.ndarray]]]:
+    """(meta, arrays) from a write_arrays file, the arrays read-only views of an mmap; None if missing, not ours or corrupt"""
+    try:
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+    if buffer[:len(MAGIC)] != MAGIC:
+        return None
+    try:
+        (header_length,) = struct.unpack_from('<I', buffer, len(MAGIC))
+        header = json.loads(buffer[len(MAGIC) + 4:len(MAGIC) + 4 + header_length])
+        start = -(-(len(MAGIC) + 4 + header_length) // ALIGN) * ALIGN
+
+        arrays = {}
+        for entry in header['arrays']:
+            dtype = np.dtype(entry['dtype'])
+            count = int(np.prod(entry['shape']))
+            arrays[entry['name']] = np.frombuffer(buffer, dtype, count, start + entry['offset']).reshape(entry['shape'])
+        return header['meta'], arrays
+    except (struct.error, UnicodeDecodeError, ValueError, KeyError, TypeError) as e:
+        # json.JSONDecodeError is a ValueError, as is frombuffer on a truncated file
+        print(f"Error reading {path}: {str(e)}")
+        return None
+
+def address_bytes(address) -> bytes:
+    """20 raw bytes of a hex address, or of an S20 entry (which numpy hands back without trailing zeros)"""
+    if isinstance(address, str):
+        return bytes.fromhex(address[2:])
+    return bytes(address).ljust(20, b'\0')
+
+class PoolIndex:
+    """
+    Pool <-> token adjacency with integer ids, in CSR form: an address
+    table each for tokens and pools (20 raw bytes per address), offsets
+    plus ids for pool -> tokens and token -> pools, and sorted copies of
+    the address tables to look ids up by binary search. Ids are given in
+    order of first appearance, so extend() keeps every existing id.
+    """
+    def __init__(self, meta: Dict, arrays: Dict[str, np.ndarray]):
+        self.meta = meta  # handler_counts, block_number, timestamp, full_build, built
+        self.tokens = arrays['tokens']  # token id -> address bytes (S20)
+        self.pools = arrays['pools']
+        self.pool_offsets = arrays['pool_offsets']  # pool id -> slice of pool_token_ids
+        self.pool_token_ids = arrays['pool_token_ids']
+        self.token_offsets = arrays['token_offsets']  # token id -> slice of token_pool_ids
+        self.token_pool_ids = arrays['token_pool_ids']
+        self.tokens_sorted = arrays['tokens_sorted']
+        self.tokens_sorted_ids = arrays['tokens_sorted_ids']
+        self.pools_sorted = arrays['pools_sorted']
+        self.pools_sorted_ids = arrays['pools_sorted_ids']
+
+    @classmethod
+    def build(cls, pool_tokens: Iterable[Tuple[str, Sequence[str]]], meta: Optional[Dict] = None) -> 'PoolIndex':
+        """Index (pool, tokens) pairs in order; a pool listed twice keeps its first entry"""
+        token_ids: Dict[bytes, int] = {}
+        pools: List[bytes] = []
+        seen = set()
+        offsets, entries = [0], []
+        for pool, tokens in pool_tokens:
+            pool = address_bytes(pool)
+            if pool in seen:
+                continue
+            seen.add(pool)
+            pools.append(pool)
+            ids = []
+            for token in tokens:
+                token = address_bytes(token)
+                ids.append(token_ids.setdefault(token, len(token_ids)))
+            entries += sorted(set(ids), key=ids.index)
+            offsets.append(len(entries))
+
+        tokens_table = np.array(list(token_ids), dtype='S20') if token_ids else np.zeros(0, dtype='S20')
+        pools_table = np.array(pools, dtype='S20') if pools else np.zeros(0, dtype='S20')
+        pool_offsets = np.array(offsets, dtype=np.uint32)
+        pool_token_ids = np.array(entries, dtype=np.uint32)
+
+        # Transpose: entry k belongs to pool entry_pools[k]; sort entries by token, keeping pool order
+        entry_pools = np.repeat(np.arange(len(pools), dtype=np.uint32), np.diff(pool_offsets))
+        order = np.argsort(pool_token_ids, kind='stable')
+        token_offsets = np.zeros(len(token_ids) + 1, dtype=np.uint32)
+        np.cumsum(np.bincount(pool_token_ids, minlength=len(token_ids)), out=token_offsets[1:])
+
+        tokens_order = np.argsort(tokens_table, kind='stable').astype(np.uint32)
+        pools_order = np.argsort(pools_table, kind='stable').astype(np.uint32)
+        meta = {'built': time.time(), **(meta or {})}
+        return cls(meta, {
+            'tokens': tokens_table, 'pools': pools_table,
+            'pool_offsets': pool_offsets, 'pool_token_ids': pool_token_ids,
+            'token_offsets': token_offsets, 'token_pool_ids': entry_pools[order],
+            'tokens_sorted': tokens_table[tokens_order], 'tokens_sorted_ids': tokens_order,
+            'pools_sorted': pools_table[pools_order], 'pools_sorted_ids': pools_order,
+        })
+
+    @classmethod
+    def load(cls, path: str) -> Optional['PoolIndex']:
+        loaded = read_arrays(path)
+        return cls(*loaded) if loaded else None
+
+    def save(self, path: str):
+        write_arrays(path, self.meta, {
+            'tokens': self.tokens, 'pools': self.pools,
+            'pool_offsets': self.pool_offsets, 'pool_token_ids': self.pool_token_ids,
+            'token_offsets': self.token_offsets, 'token_pool_ids': self.token_pool_ids,
+            'tokens_sorted': self.tokens_sorted, 'tokens_sorted_ids': self.tokens_sorted_ids,
+            'pools_sorted': self.pools_sorted, 'pools_sorted_ids': self.pools_sorted_ids,
+        })
+
+    def extend(self, pool_tokens: Iterable[Tuple[str, Sequence[str]]], meta: Optional[Dict] = None) -> 'PoolIndex':
+        """
+        A new index with these pools appended; ids already given don't change.
+        The built stamp is only carried over when no pools were added, so
+        anything keyed on it (the route cache) sees the new pools.
+        """
+        pool_tokens = list(pool_tokens)
+        existing = [(self.pools[p], [self.tokens[t] for t in self.tokens_of(p)]) for p in range(self.n_pools)]
+        carried = {k: v for k, v in self.meta.items() if k != 'built' or not pool_tokens}
+        return PoolIndex.build(existing + pool_tokens, {**carried, **(meta or {})})
+
+    @property
+    def n_tokens(self) -> int:
+        return len(self.tokens)
+
+    @property
+    def n_pools(self) -> int:
+        return len(self.pools)
+
+    @staticmethod
+    def _lookup(sorted_table: np.ndarray, sorted_ids: np.ndarray, address: str) -> Optional[int]:
+        key = np.array(address_bytes(address), dtype='S20')
+        i = int(np.searchsorted(sorted_table, key))
+        return int(sorted_ids[i]) if i < len(sorted_table) and sorted_table[i] == key else None
+
+    def token_id(self, address: str) -> Optional[int]:
+        return self._lookup(self.tokens_sorted, self.tokens_sorted_ids, address)
+
+    def pool_id(self, address: str) -> Optional[int]:
+        return self._lookup(self.pools_sorted, self.pools_sorted_ids, address)
+
+    @staticmethod
+    def _address(raw: bytes) -> str:
+        return checksum('0x' + address_bytes(raw).hex())
+
+    def token_address(self, token: int) -> str:
+        return self._address(self.tokens[token])
+
+    def pool_address(self, pool: int) -> str:
+        return self._address(self.pools[pool])
+
+    def tokens_of(self, pool: int) -> np.ndarray:
+        return self.pool_token_ids[self.pool_offsets[pool]:self.pool_offsets[pool + 1]]
+
+    def pools_of(self, token: int) -> np.ndarray:
+        return self.token_pool_ids[self.token_offsets[token]:self.token_offsets[token + 1]]
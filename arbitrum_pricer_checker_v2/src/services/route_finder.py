@@ -1,106 +1,96 @@
-from typing import List, Set, Dict, Tuple
+from typing import Callable, List, Optional, Dict, Tuple
 from dataclasses import dataclass
-import json
 import time
 
+import numpy as np
+
+from services.pool_index import read_arrays, write_arrays
+from services.token_graph import TokenGraph
+
+NO_TOKEN = 0xFFFFFFFF  # pads shorter paths in the route table
+
 @dataclass
 class Route:
     path: List[str]
     hops: int
+    cost: float = 0.0  # -log of the estimated rate along the path, lower is better
 
 class RouteFinder:
-    def __init__(self, cache_service):
+    """
+    Ranked routes on the pool cache's token ids. Routes and probed edge
+    rates are cached as id arrays in curve_route_cache.bin, valid for an
+    hour and only against the pool index they were found on.
+    """
+    def __init__(self, cache_service, rate_estimator: Optional[Callable[[List[Tuple[str, str]]], Dict[Tuple[str, str], float]]] = None):
         self.cache = cache_service
         self.max_hops = 3
-        self.route_cache: Dict[Tuple[str, str], List[Route]] = {}
-        self.route_cache_file = "curve_route_cache.json"
+        self.max_routes = 5  # ranked candidates returned for simulation at the real size
+        self.graph = TokenGraph(self.cache.index)
+        self.rate_estimator = rate_estimator  # quotes address edges at a probe size, see CurveRouter._estimate_rates
+        self.route_cache: Dict[Tuple[int, int], List[Tuple[float, List[int]]]] = {}  # id pair -> (cost, id path)
+        self.route_cache_file = "curve_route_cache.bin"
         self.cache_expiry = 3600  # 1 hour
         self.load_route_cache()
     
     def find_possible_routes(self, token_in: str, token_out: str) -> List[Route]:
         """Find routes, using cache if available"""
-        cache_key = (token_in, token_out)
-        
-        # Check cache first
-        if cache_key in self.route_cache:
-            return self.route_cache[cache_key]
+        index = self.cache.index
+        cache_key = (index.token_id(token_in), index.token_id(token_out))
+        if None in cache_key:
+            return []
         
         # Find routes if not cached
-        routes = self._find_routes(token_in, token_out)
-        
-        # Cache the result
-        self.route_cache[cache_key] = routes
-        self.save_route_cache()
-        
-        return routes
-    
-    def _find_routes(self, token_in: str, token_out: str) -> List[Route]:
-        """Find routes with maximum 2 hops"""
-        routes = []
-        
-        # Direct routes (1 hop)
-        if self._tokens_have_common_pool(token_in, token_out):
-            routes.append(Route(
-                path=[token_in, token_out],
-                hops=1
-            ))
+        if cache_key not in self.route_cache:
+            self.route_cache[cache_key] = self._find_routes(*cache_key)
+            self.save_route_cache()
         
-        # 2 hop routes
-        intermediates = self._get_possible_intermediate_tokens(token_in, token_out)
-        for mid in intermediates:
-            if (self._tokens_have_common_pool(token_in, mid) and 
-                self._tokens_have_common_pool(mid, token_out)):
-                routes.append(Route(
-                    path=[token_in, mid, token_out],
-                    hops=2
-                ))
-        
-        return routes
-    
-    def _tokens_have_common_pool(self, token1: str, token2: str) -> bool:
-        """Check if two tokens share any pools"""
-        pools1 = self.cache.token_pools.get(token1, set())
-        pools2 = self.cache.token_pools.get(token2, set())
-        return bool(pools1 & pools2)  # intersection
+        return [Route(path=[index.token_address(t) for t in path], hops=len(path) - 1, cost=cost)
+                for cost, path in self.route_cache[cache_key]]
     
-    def _get_possible_intermediate_tokens(self, token_in: str, token_out: str) -> Set[str]:
-        """Get all tokens that could serve as intermediaries"""
-        pools_with_input = self.cache.token_pools.get(token_in, set())
-        pools_with_output = self.cache.token_pools.get(token_out, set())
-        
-        possible_intermediates = set()
-        for pool in pools_with_input:
-            possible_intermediates.update(self.cache.pool_tokens[pool])
-        for pool in pools_with_output:
-            possible_intermediates.update(self.cache.pool_tokens[pool])
-        
-        # Remove input/output tokens
-        possible_intermediates -= {token_in, token_out}
+    def _find_routes(self, token_in: int, token_out: int) -> List[Tuple[float, List[int]]]:
+        """The max_routes best id paths of up to max_hops, ranked by estimated rate"""
+        edges = self.graph.candidate_edges(token_in, token_out, self.max_hops)
+        missing = [edge for edge in edges if edge not in self.graph.rates]
+        if missing and self.rate_estimator:
+            print(f"Estimating rates for {len(missing)} of {len(edges)} candidate edges")
+            address = self.cache.index.token_address
+            rates = self.rate_estimator([(address(a), address(b)) for a, b in missing])
+            self.graph.rates.update({(a, b): rates.get((address(a), address(b))) or 0.0 for a, b in missing})
+        elif missing:
+            self.graph.rates.update({edge: 1.0 for edge in missing})  # no estimator: rank by hop count
         
-        return possible_intermediates
+        return self.graph.k_best_paths(token_in, token_out, self.max_routes, self.max_hops)
     
     def load_route_cache(self):
-        """Load cached routes from file"""
-        try:
-            with open(self.route_cache_file, 'r') as f:
-                data = json.load(f)
-                if time.time() - data['timestamp'] < self.cache_expiry:
-                    # Convert string tuples back to actual tuples for keys
-                    self.route_cache = {
-                        tuple(k.split('|')): [Route(**r) for r in routes]
-                        for k, routes in data['routes'].items()
-                    }
-        except FileNotFoundError:
-            self.route_cache = {}
+        """Load cached routes and rates from file, if recent and found on the current pool index"""
+        loaded = read_arrays(self.route_cache_file)
+        if loaded is None:
+            return
+        meta, arrays = loaded
+        if time.time() - meta['timestamp'] >= self.cache_expiry or meta['index_built'] != self.cache.index.meta['built']:
+            return
+        
+        self.graph.rates = {(int(a), int(b)): float(r) for (a, b), r in zip(arrays['rate_edges'], arrays['rate_values'])}
+        offsets, paths, costs = arrays['route_offsets'], arrays['route_paths'], arrays['route_costs']
+        self.route_cache = {
+            (int(a), int(b)): [(float(costs[r]), [int(t) for t in paths[r] if t != NO_TOKEN])
+                               for r in range(offsets[i], offsets[i + 1])]
+            for i, (a, b) in enumerate(arrays['route_pairs'])
+        }
     
     def save_route_cache(self):
-        """Save routes to cache file"""
-        cache_data = {
-            'timestamp': time.time(),
-            'routes': {
-                f"{k[0]}|{k[1]}": [{'path': r.path, 'hops': r.hops} for r in routes]
-                for k, routes in self.route_cache.items()
-            }
-        }
-        with open(self.route_cache_file, 'w') as f:
-            json.dump(cache_data, f)
\ No newline at end of file
+        """Save routes and rates to the cache file"""
+        routes = [route for pair_routes in self.route_cache.values() for route in pair_routes]
+        width = max((len(path) for _, path in routes), default=2)
+        paths = np.full((len(routes), width), NO_TOKEN, dtype=np.uint32)
+        for r, (_, path) in enumerate(routes):
+            paths[r, :len(path)] = path
+        
+        write_arrays(self.route_cache_file, {'timestamp': time.time(), 'index_built': self.cache.index.meta['built']}, {
+            'rate_edges': np.array(list(self.graph.rates), dtype=np.uint32).reshape(-1, 2),
+            'rate_values': np.array(list(self.graph.rates.values()), dtype=np.float64),
+            'route_pairs': np.array(list(self.route_cache), dtype=np.uint32).reshape(-1, 2),
+            'route_offsets': np.cumsum([0] + [len(r) for r in self.route_cache.values()]).astype(np.uint32),
+            'route_paths': paths,
+            'route_costs': np.array([cost for cost, _ in routes], dtype=np.float64),
+        })
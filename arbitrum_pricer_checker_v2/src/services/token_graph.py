@@ -0,0 +1,89 @@
+from typing import Dict, List, Optional, Tuple
+import heapq
+import math
+
+import numpy as np
+
+from services.pool_index import PoolIndex
+
+Edge = Tuple[int, int]  # (token_in, token_out) ids
+
+class TokenGraph:
+    """
+    Token ids of a PoolIndex joined by an edge wherever a Curve pool holds
+    both, weighted by -log(rate) with rate = amount_out / amount_in (raw
+    units) at a probe size. Raw units cancel along a path, so the sum of
+    weights from A to B ranks paths by how much B they give for the same A.
+    """
+    def __init__(self, index: PoolIndex):
+        self.index = index
+        self._neighbors: Dict[int, List[int]] = {}  # filled in as the search reaches each token
+        self.rates: Dict[Edge, float] = {}  # 0.0 when the probe got no quote
+
+    def neighbors(self, token: int) -> List[int]:
+        if token not in self._neighbors:
+            pools = self.index.pools_of(token)
+            tokens = np.concatenate([self.index.tokens_of(p) for p in pools]) if len(pools) else np.zeros(0, np.uint32)
+            self._neighbors[token] = [int(t) for t in np.unique(tokens) if t != token]
+        return self._neighbors[token]
+
+    def hops_from(self, source: int, max_hops: int) -> Dict[int, int]:
+        """Breadth-first hop count to every token within max_hops"""
+        hops = {source: 0}
+        frontier = [source]
+        for depth in range(1, max_hops + 1):
+            next_frontier = []
+            for token in frontier:
+                for neighbor in self.neighbors(token):
+                    if neighbor not in hops:
+                        hops[neighbor] = depth
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+        return hops
+
+    def candidate_edges(self, token_in: int, token_out: int, max_hops: int) -> List[Edge]:
+        """Edges that lie on some path of at most max_hops from token_in to token_out"""
+        from_in = self.hops_from(token_in, max_hops)
+        to_out = self.hops_from(token_out, max_hops)  # pools swap both ways
+        edges = []
+        for a, depth in from_in.items():
+            if a == token_out:
+                continue
+            for b in self.neighbors(a):
+                if b != token_in and b in to_out and depth + 1 + to_out[b] <= max_hops:
+                    edges.append((a, b))
+        return edges
+
+    def weight(self, a: int, b: int) -> Optional[float]:
+        """-log(rate), None for an edge that couldn't be quoted or wasn't probed (its cost is unknown, not zero)"""
+        rate = self.rates.get((a, b))
+        return -math.log(rate) if rate else None
+
+    def k_best_paths(self, token_in: int, token_out: int, k: int, max_hops: int,
+                     beam_width: Optional[int] = None) -> List[Tuple[float, List[int]]]:
+        """
+        Up to k cheapest simple paths of at most max_hops, as (cost, path),
+        over probed edges only (see RouteFinder._find_routes). A beam search by hop count: each level extends every kept partial
+        path by one edge and keeps the beam_width cheapest ending at each
+        token. Only paths ending at the same token share units, so that is
+        where they are compared.
+        """
+        beam_width = beam_width or k
+        labels: Dict[int, List[Tuple[float, List[int]]]] = {token_in: [(0.0, [token_in])]}
+        found: List[Tuple[float, List[int]]] = []
+        for _ in range(max_hops):
+            extended: Dict[int, List[Tuple[float, List[int]]]] = {}
+            for token, paths in labels.items():
+                for neighbor in self.neighbors(token):
+                    w = self.weight(token, neighbor)
+                    if w is None:
+                        continue
+                    for cost, path in paths:
+                        if neighbor not in path:
+                            extended.setdefault(neighbor, []).append((cost + w, path + [neighbor]))
+            found += extended.pop(token_out, [])
+            labels = {token: heapq.nsmallest(beam_width, paths, key=lambda p: p[0])
+                      for token, paths in extended.items()}
+            if not labels:
+                break
+        return heapq.nsmallest(k, found, key=lambda p: p[0])
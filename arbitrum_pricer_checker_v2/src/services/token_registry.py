@@ -0,0 +1,100 @@
+from web3 import Web3
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+import json
+import sys
+
+from pricer_core.multicall import Call, Multicall
+from pricer_core.pool_metadata import NATIVE_ETH
+
+# Bump when the on-disk layout changes; older files are discarded and re-read
+SCHEMA_VERSION = 1
+
+@lru_cache(maxsize=None)
+def checksum(address: str) -> str:
+    """Web3.to_checksum_address, computed once per distinct address and interned"""
+    return sys.intern(Web3.to_checksum_address(address))
+
+@dataclass
+class TokenMetadata:
+    address: str
+    decimals: int
+    symbol: str
+
+class TokenRegistry:
+    """
+    Persistent decimals/symbol for every token the router touches, stored
+    next to curve_pool_cache.json. Token metadata never changes, so entries
+    never expire; warm() reads only tokens that aren't already known, in
+    one multicall.
+    """
+    def __init__(self, multicall: Multicall, cache_file: str = "curve_token_cache.json"):
+        self.multicall = multicall
+        self.cache_file = cache_file
+        self.tokens: Dict[str, TokenMetadata] = {
+            NATIVE_ETH: TokenMetadata(address=NATIVE_ETH, decimals=18, symbol='ETH')
+        }
+        self.failed = set()  # tokens without a readable decimals(), not retried this run
+        self.load_cache()
+
+    def get(self, token: str) -> Optional[TokenMetadata]:
+        token = checksum(token)
+        if token not in self.tokens:
+            self.warm([token])
+        return self.tokens.get(token)
+
+    def decimals(self, token: str) -> int:
+        metadata = self.get(token)
+        return metadata.decimals if metadata else 18  # Default to 18 like the old per-call lookup
+
+    def symbol(self, token: str) -> str:
+        metadata = self.get(token)
+        return metadata.symbol if metadata else token[:8]
+
+    def load_cache(self):
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if data.get('version') != SCHEMA_VERSION:
+            return
+        self.tokens.update({checksum(k): TokenMetadata(**v) for k, v in data['tokens'].items()})
+
+    def save_cache(self):
+        with open(self.cache_file, 'w') as f:
+            json.dump({'version': SCHEMA_VERSION, 'tokens': {k: asdict(v) for k, v in self.tokens.items()}}, f)
+
+    def warm(self, tokens: Iterable[str]):
+        """Read decimals() and symbol() for unknown tokens in one multicall, bytes32 symbols in a second"""
+        new_tokens = {checksum(t) for t in tokens} - self.tokens.keys() - self.failed
+        if not new_tokens:
+            return
+
+        calls = []
+        for token in new_tokens:
+            calls += [Call(token, "decimals()", output_types=('uint8',), key=(token, 'decimals')),
+                      Call(token, "symbol()", output_types=('string',), key=(token, 'symbol'))]
+        reads = self.multicall.aggregate(calls)
+
+        # Older tokens (MKR-style) return symbol() as bytes32
+        legacy = [t for t in new_tokens if reads.get((t, 'symbol')) is None]
+        if legacy:
+            legacy_reads = self.multicall.aggregate([
+                Call(token, "symbol()", output_types=('bytes32',), key=(token, 'symbol')) for token in legacy
+            ])
+            for token in legacy:
+                raw = legacy_reads.get((token, 'symbol'))
+                reads.results[(token, 'symbol')] = raw.rstrip(b'\0').decode(errors='ignore') if raw else None
+
+        for token in new_tokens:
+            decimals = reads.get((token, 'decimals'))
+            if decimals is None:
+                print(f"Error getting decimals for {token}")
+                self.failed.add(token)
+                continue
+            self.tokens[token] = TokenMetadata(address=token, decimals=decimals,
+                                               symbol=reads.get((token, 'symbol')) or token[:8])
+        print(f"Loaded metadata for {len(new_tokens - self.failed)} tokens")
+        self.save_cache()
@@ -0,0 +1,110 @@
+import asyncio
+import sys
+import threading
+import time
+from typing import Dict, List, Tuple
+
+import uniswap
+from pricer_core.arb import find_arbitrage_opportunities
+from historical_arb_graph import prices_from_states
+from pricer_core.backtest import iter_batches, iter_batches_in_processes
+from services.pool_events import FixtureLogSource, PoolStateReplayer, fixture_replayer, read_log_fixture
+
+# Samples spread evenly over the fixture's block range, and samples per chunk
+SAMPLES = 2000
+CHUNK_SIZE = 50
+
+# Per-process fixture and simulated RPC round trip, set by init_worker()
+_fixture: Dict = {}
+_latency = 0.0
+_local = threading.local()
+
+class SlowFixtureSource(FixtureLogSource):
+    """Recorded logs served after a fixed delay per page, standing in for eth_getLogs"""
+    def __init__(self, logs: List[Dict], latency: float):
+        super().__init__(logs)
+        self.latency = latency
+
+    def get_logs(self, addresses, topics, from_block: int, to_block: int) -> List[Dict]:
+        if self.latency:
+            time.sleep(self.latency)
+        return super().get_logs(addresses, topics, from_block, to_block)
+
+def init_worker(path: str, latency: float):
+    global _fixture, _latency
+    _fixture = read_log_fixture(path, uniswap.pool_metadata)
+    _latency = latency
+
+def sample_batches(fixture: Dict, samples: int = SAMPLES, chunk_size: int = CHUNK_SIZE) -> List[Tuple[int, List[int]]]:
+    """(chunk, blocks) batches over the fixture's range, as run_backtest hands out timestamps"""
+    first = fixture['block_number']
+    last = max([log['blockNumber'] for log in fixture['logs']] + [first])
+    blocks = sorted({first + (last - first) * k // max(samples - 1, 1) for k in range(samples)})
+    return [(i // chunk_size, blocks[i:i + chunk_size]) for i in range(0, len(blocks), chunk_size)]
+
+def count_opportunities(replayer: PoolStateReplayer, blocks: List[int]) -> List[Tuple[int, int]]:
+    return [(block, len(find_arbitrage_opportunities(prices_from_states(block, uniswap_states, curve_states))))
+            for block, uniswap_states, curve_states in replayer.states_at(blocks)]
+
+def replay_chunk(blocks: List[int]) -> List[Tuple[int, int]]:
+    """
+    (block, opportunities) per block. Like historical_arb_graph.process_chunk
+    the thread keeps its replayer, so a later chunk rolls forward from it
+    """
+    replayer = getattr(_local, 'replayer', None)
+    if replayer is None or replayer.block_number > blocks[0]:
+        time.sleep(_latency)  # the seed read
+        replayer = fixture_replayer(_fixture, SlowFixtureSource(_fixture['logs'], _latency))
+        _local.replayer = replayer
+    return count_opportunities(replayer, blocks)
+
+async def replay_lane(batches: List[Tuple[int, List[int]]]) -> List[Tuple[int, List]]:
+    """One contiguous range of chunks on the event loop: waits are awaited, the replay itself blocks the loop"""
+    results = []
+    await asyncio.sleep(_latency)  # the seed read
+    replayer = fixture_replayer(_fixture)
+    for chunk, blocks in batches:
+        # Fetch the chunk's log pages up front so the only awaits are the round trips
+        pages = (blocks[-1] - replayer.block_number) // replayer.page_blocks + 1
+        await asyncio.sleep(_latency * pages)
+        results.append((chunk, count_opportunities(replayer, blocks)))
+    return results
+
+async def replay_async(batches: List[Tuple[int, List[int]]], lanes: int) -> List[Tuple[int, List]]:
+    size = -(-len(batches) // lanes)
+    done = await asyncio.gather(*(replay_lane(batches[i:i + size]) for i in range(0, len(batches), size)))
+    return [item for lane in done for item in lane]
+
+def run_mode(mode: str, path: str, batches: List[Tuple[int, List[int]]], workers: int, latency: float):
+    _local.replayer = None
+    start = time.perf_counter()
+    if mode == 'thread':
+        results = list(iter_batches(replay_chunk, batches, per_chunk=True, max_workers=workers))
+    elif mode == 'process':
+        results = list(iter_batches_in_processes(replay_chunk, batches, True, workers,
+                                                 initializer=init_worker, initargs=(path, latency)))
+    else:
+        results = asyncio.run(replay_async(batches, workers))
+    return sorted(results), time.perf_counter() - start
+
+def main():
+    # e.g. python benchmark_backtest.py fixture.json 4 50  (workers, simulated RPC latency in ms)
+    path = sys.argv[1]
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    latency = float(sys.argv[3]) / 1000 if len(sys.argv) > 3 else 0.0
+    init_worker(path, latency)
+    batches = sample_batches(_fixture)
+    samples = sum(len(blocks) for _, blocks in batches)
+    print(f"{samples} samples in {len(batches)} chunks, {len(_fixture['logs'])} logs, "
+          f"{workers} workers, {latency * 1000:.0f}ms per RPC")
+
+    reference = None
+    for mode in ('thread', 'process', 'async'):
+        results, seconds = run_mode(mode, path, batches, workers, latency)
+        opportunities = sum(n for _, chunk_results in results for _, n in chunk_results)
+        reference = reference if reference is not None else results
+        print(f"  {mode:8s} {seconds:7.2f}s  {samples / seconds:9.1f} samples/s  "
+              f"{opportunities} opportunities{'' if results == reference else ' (MISMATCH)'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import time
+
+from pricer_core.multicall import Multicall
+from curve_get_price import w3, get_quote_plan, load_pool_states
+
+# Number of quotes per mode; the RPC baseline is slow, keep it modest
+RPC_QUOTES = 50
+LOCAL_QUOTES = 5000
+
+def quote_sizes(base: int, count: int):
+    """Sizes from 0.1x to 10x of the default quote, so the solver sees varied inputs"""
+    return [base * (1 + (k * 99) // max(count - 1, 1)) // 10 for k in range(count)]
+
+def benchmark_rpc(pool: str, block_number: int, sizes):
+    """One eth_call per quote, the way get_curve_prices() quotes today"""
+    plan = get_quote_plan(pool)
+    contract = w3.eth.contract(address=pool, abi=[{
+        "name": "get_dy", "outputs": [{"type": "uint256", "name": ""}],
+        "inputs": [{"type": "uint256", "name": "i"}, {"type": "uint256", "name": "j"},
+                   {"type": "uint256", "name": "dx"}],
+        "stateMutability": "view", "type": "function"
+    }])
+    start = time.perf_counter()
+    results = [contract.functions.get_dy(plan['eth'], plan['stable'], dx).call(block_identifier=block_number)
+               for dx in sizes]
+    return results, time.perf_counter() - start
+
+def benchmark_local(state, pool: str, sizes):
+    plan = get_quote_plan(pool)
+    start = time.perf_counter()
+    results = [state.get_dy(plan['eth'], plan['stable'], dx) for dx in sizes]
+    return results, time.perf_counter() - start
+
+def main():
+    multicall = Multicall(w3)
+    block_number = multicall.resolve_block()
+
+    start = time.perf_counter()
+    states = load_pool_states(multicall, block_number)
+    load_time = time.perf_counter() - start
+    print(f"Loaded {len(states)} pool states at block {block_number} in {load_time * 1000:.0f}ms")
+
+    for pool, state in states.items():
+        plan = get_quote_plan(pool)
+        rpc_sizes = quote_sizes(plan['eth_input'], RPC_QUOTES)
+
+        rpc_results, rpc_time = benchmark_rpc(pool, block_number, rpc_sizes)
+        local_results, _ = benchmark_local(state, pool, rpc_sizes)
+        _, local_time = benchmark_local(state, pool, quote_sizes(plan['eth_input'], LOCAL_QUOTES))
+
+        matches = sum(1 for a, b in zip(rpc_results, local_results) if a == b)
+        print(f"\nPool {pool} ({state.n_coins} coins), ETH -> stable get_dy")
+        print(f"  RPC:   {RPC_QUOTES / rpc_time:10.1f} quotes/s ({RPC_QUOTES} quotes)")
+        print(f"  Local: {LOCAL_QUOTES / local_time:10.1f} quotes/s ({LOCAL_QUOTES} quotes, "
+              f"+{load_time * 1000:.0f}ms state load)")
+        print(f"  Exact matches vs on-chain get_dy: {matches}/{RPC_QUOTES}")
+
+if __name__ == "__main__":
+    main()
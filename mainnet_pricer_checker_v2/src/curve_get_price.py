@@ -1,17 +1,20 @@
 from web3 import Web3
-from typing import Dict, Optional
-from dotenv import load_dotenv
-import os
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError
+from typing import Dict, List, Optional, Sequence
 
-# Load environment variables
-load_dotenv()
+from pricer_core.chains import MAINNET
+from pricer_core.multicall import Call, Multicall, MulticallResult
+from pricer_core.pool_metadata import get_pool_metadata_store
+from services.cryptoswap_pool import CryptoSwapPool, load_pools
+from services.size_optimizer import SampledCurve
 
-# Get Alchemy API URL from environment variables
-ALCHEMY_API_URL = os.getenv('ALCHEMY_API_URL')
-w3 = Web3(Web3.HTTPProvider(ALCHEMY_API_URL))
+# RPC comes from the mainnet chain profile
+w3 = MAINNET.web3()
+
+CHAIN_ID = MAINNET.chain_id
 
 # Token addresses for verification
-USDC = Web3.to_checksum_address("0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48")
+USDC = MAINNET.usdc
 WBTC = Web3.to_checksum_address("0x2260FAC5E5542a773Aa44fBCfeDf7C193bc2C599")
 ETH = Web3.to_checksum_address("0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE")
 
@@ -34,72 +37,199 @@ pool_abi = [{
     "type": "function"
 }]
 
-def get_curve_prices() -> Dict[str, Dict[str, float]]:
+# Pool addresses and their coin indices
+CURVE_POOLS = {
+    Web3.to_checksum_address('0x7f86bf177dd4f3494b841a37e810a34dd56c829b'): {
+        'USDC': 0,
+        'WBTC': 1, 
+        'ETH': 2
+    },
+    Web3.to_checksum_address('0xd51a44d3fae010294c616388b506acda1bfaae46'): {
+        'USDT': 0,
+        'WBTC': 1,
+        'ETH': 2
+    }
+}
+
+# Pools that run the Tricrypto-NG/Twocrypto-NG math and can be quoted locally
+# (pool -> number of coins). tricrypto2 (0xd51a...) is the older v1 cryptoswap
+# with different math and no precisions() getter, so it stays on get_dy.
+CRYPTO_NG_POOLS = {
+    Web3.to_checksum_address('0x7f86bf177dd4f3494b841a37e810a34dd56c829b'): 3
+}
+
+# Quote sizes in whole tokens, scaled by each coin's decimals
+ETH_AMOUNT = 1  # 1 ETH
+USDC_AMOUNT = 3000  # 3000 USDC
+WBTC_AMOUNT = 0.05  # 0.05 WBTC
+
+GET_DY_SIGNATURE = "get_dy(uint256,uint256,uint256)"
+
+# Static pool data (coins, decimals) is read once and persisted
+pool_metadata = get_pool_metadata_store(CHAIN_ID)
+
+def warm_pool_metadata(multicall: Multicall = None):
+    """Load coins/decimals for every pool so the hot loop only issues get_dy"""
+    pool_metadata.warm(multicall or Multicall(w3),
+                       curve_pools={pool: len(indices) for pool, indices in CURVE_POOLS.items()})
+
+def get_quote_plan(pool_address: str) -> Dict[str, int]:
+    """Coin indices, decimals and raw input sizes for the stable/WBTC/ETH legs of a pool"""
+    indices = CURVE_POOLS[pool_address]
+    decimals = pool_metadata.get(pool_address).decimals
+    stable = indices['USDC'] if 'USDC' in indices else indices['USDT']
+    wbtc, eth = indices['WBTC'], indices['ETH']
+    return {
+        'stable': stable, 'wbtc': wbtc, 'eth': eth,
+        'stable_decimals': decimals[stable], 'wbtc_decimals': decimals[wbtc], 'eth_decimals': decimals[eth],
+        'eth_input': ETH_AMOUNT * 10**decimals[eth],
+        'usdc_input': USDC_AMOUNT * 10**decimals[stable],
+        'wbtc_input': int(WBTC_AMOUNT * 10**decimals[wbtc])
+    }
+
+def get_curve_prices(block_identifier=None) -> Dict[str, Dict[str, float]]:
     """
     Get prices from Curve pools and return a dictionary of pool prices
+    Args:
+        block_identifier: block to price at, 'latest' when None
     Returns:
         Dict with pool addresses as keys and price info as values
     """
-    # Pool addresses and their coin indices
-    pools = {
-        Web3.to_checksum_address('0x7f86bf177dd4f3494b841a37e810a34dd56c829b'): {
-            'USDC': 0,
-            'WBTC': 1, 
-            'ETH': 2
-        },
-        Web3.to_checksum_address('0xd51a44d3fae010294c616388b506acda1bfaae46'): {
-            'USDT': 0,
-            'WBTC': 1,
-            'ETH': 2
-        }
-    }
-
     # Create contract instances for each pool
     pool_contracts = {
         addr: w3.eth.contract(address=addr, abi=pool_abi)
-        for addr in pools.keys()
+        for addr in CURVE_POOLS.keys()
     }
 
     pool_prices = {}
+    warm_pool_metadata()
 
     for pool_address, pool_contract in pool_contracts.items():
+        if pool_metadata.get(pool_address) is None:
+            print(f"Error with pool {pool_address}: no pool metadata")
+            continue
         try:
-            # Get coin addresses from pool and verify
-            coin0 = pool_contract.functions.coins(0).call()
-            coin1 = pool_contract.functions.coins(1).call()
-            coin2 = pool_contract.functions.coins(2).call()
+            plan = get_quote_plan(pool_address)
 
             # ETH prices
-            eth_input = 1 * 10**18  # 1 ETH
-            usdc_amount = pool_contract.functions.get_dy(2, 0, eth_input).call()
-            eth_sell_price = usdc_amount / (10**6)
-
-            usdc_amount = 3000 * 10**6  # 3000 USDC
-            eth_amount = pool_contract.functions.get_dy(0, 2, usdc_amount).call()
-            eth_buy_price = (3000 / (eth_amount / 10**18))
+            usdc_for_eth = pool_contract.functions.get_dy(plan['eth'], plan['stable'], plan['eth_input']).call(block_identifier=block_identifier)
+            eth_for_usdc = pool_contract.functions.get_dy(plan['stable'], plan['eth'], plan['usdc_input']).call(block_identifier=block_identifier)
 
             # WBTC prices
-            wbtc_input = int(0.05 * 10**8)  # 0.05 WBTC
-            usdc_amount = pool_contract.functions.get_dy(1, 0, wbtc_input).call()
-            wbtc_sell_price = (0.05 / (usdc_amount / (10**6)))
-
-            usdc_amount = 3000 * 10**6  # 3000 USDC
-            wbtc_amount = pool_contract.functions.get_dy(0, 1, usdc_amount).call()
-            wbtc_buy_price = (3000 / (wbtc_amount / 10**8))
-
-            pool_prices[pool_address] = {
-                'eth_buy': eth_buy_price,
-                'eth_sell': eth_sell_price,
-                'wbtc_buy': wbtc_buy_price,
-                'wbtc_sell': wbtc_sell_price
-            }
-
-        except Exception as e:
+            usdc_for_wbtc = pool_contract.functions.get_dy(plan['wbtc'], plan['stable'], plan['wbtc_input']).call(block_identifier=block_identifier)
+            wbtc_for_usdc = pool_contract.functions.get_dy(plan['stable'], plan['wbtc'], plan['usdc_input']).call(block_identifier=block_identifier)
+
+            pool_prices[pool_address] = prices_from_amounts(
+                plan, usdc_for_eth, eth_for_usdc, usdc_for_wbtc, wbtc_for_usdc
+            )
+
+        # Only a revert drops the pool; RPC and rate limiter errors propagate to the caller
+        except (ContractLogicError, BadFunctionCallOutput) as e:
             print(f"Error with pool {pool_address}: {str(e)}")
             continue
 
     return pool_prices
 
+def prices_from_amounts(plan: Dict[str, int], usdc_for_eth: int, eth_for_usdc: int,
+                        usdc_for_wbtc: Optional[int] = None,
+                        wbtc_for_usdc: Optional[int] = None) -> Dict[str, float]:
+    """Convert raw get_dy outputs into per-unit buy/sell prices"""
+    prices = {
+        'eth_buy': (USDC_AMOUNT / (eth_for_usdc / 10**plan['eth_decimals'])),
+        'eth_sell': usdc_for_eth / (10**plan['stable_decimals']) / ETH_AMOUNT
+    }
+    # WBTC legs are optional so a failed WBTC quote doesn't drop the ETH prices
+    if usdc_for_wbtc and wbtc_for_usdc:
+        prices['wbtc_buy'] = (USDC_AMOUNT / (wbtc_for_usdc / 10**plan['wbtc_decimals']))
+        prices['wbtc_sell'] = usdc_for_wbtc / (10**plan['stable_decimals']) / WBTC_AMOUNT
+    return prices
+
+def get_curve_quote_calls() -> List[Call]:
+    """Quote calls for every Curve pool with warmed metadata, for batching through Multicall3"""
+    calls = []
+    for pool_address in CURVE_POOLS:
+        if pool_metadata.get(pool_address) is None:
+            print(f"Error with pool {pool_address}: no pool metadata")
+            continue
+        plan = get_quote_plan(pool_address)
+        calls += [
+            Call(pool_address, GET_DY_SIGNATURE, (plan['eth'], plan['stable'], plan['eth_input']),
+                 key=(pool_address, 'usdc_for_eth')),
+            Call(pool_address, GET_DY_SIGNATURE, (plan['stable'], plan['eth'], plan['usdc_input']),
+                 key=(pool_address, 'eth_for_usdc')),
+            Call(pool_address, GET_DY_SIGNATURE, (plan['wbtc'], plan['stable'], plan['wbtc_input']),
+                 key=(pool_address, 'usdc_for_wbtc')),
+            Call(pool_address, GET_DY_SIGNATURE, (plan['stable'], plan['wbtc'], plan['usdc_input']),
+                 key=(pool_address, 'wbtc_for_usdc')),
+        ]
+    return calls
+
+def curve_prices_from_results(results: MulticallResult) -> Dict[str, Dict[str, float]]:
+    """Build the same structure as get_curve_prices() from a multicall result"""
+    pool_prices = {}
+    for pool_address in CURVE_POOLS:
+        amounts = [results.get((pool_address, name)) for name in
+                   ('usdc_for_eth', 'eth_for_usdc', 'usdc_for_wbtc', 'wbtc_for_usdc')]
+        if not amounts[0] or not amounts[1]:
+            print(f"Error with pool {pool_address}: missing ETH quotes at block {results.block_number}")
+            continue
+        pool_prices[pool_address] = prices_from_amounts(get_quote_plan(pool_address), *amounts)
+    return pool_prices
+
+def get_curve_sample_calls(eth_sizes: Sequence[float], usdc_sizes: Sequence[float]) -> List[Call]:
+    """get_dy calls sampling each pool's ETH -> stable and stable -> ETH output at several whole-token sizes"""
+    calls = []
+    for pool_address in CURVE_POOLS:
+        if pool_metadata.get(pool_address) is None:
+            continue
+        plan = get_quote_plan(pool_address)
+        calls += [Call(pool_address, GET_DY_SIGNATURE,
+                       (plan['eth'], plan['stable'], int(size * 10**plan['eth_decimals'])),
+                       key=(pool_address, 'sell', k)) for k, size in enumerate(eth_sizes)]
+        calls += [Call(pool_address, GET_DY_SIGNATURE,
+                       (plan['stable'], plan['eth'], int(size * 10**plan['stable_decimals'])),
+                       key=(pool_address, 'buy', k)) for k, size in enumerate(usdc_sizes)]
+    return calls
+
+def curve_output_curves(results: MulticallResult, eth_sizes: Sequence[float],
+                        usdc_sizes: Sequence[float]) -> Dict[str, Dict[str, SampledCurve]]:
+    """Per pool 'sell' (ETH -> stable) and 'buy' (stable -> ETH) curves in whole tokens"""
+    curves = {}
+    for pool_address in CURVE_POOLS:
+        if pool_metadata.get(pool_address) is None:
+            continue
+        plan = get_quote_plan(pool_address)
+        sell = [results.get((pool_address, 'sell', k)) for k in range(len(eth_sizes))]
+        buy = [results.get((pool_address, 'buy', k)) for k in range(len(usdc_sizes))]
+        curves[pool_address] = {
+            'sell': SampledCurve(eth_sizes, [out / 10**plan['stable_decimals'] if out else None for out in sell]),
+            'buy': SampledCurve(usdc_sizes, [out / 10**plan['eth_decimals'] if out else None for out in buy])
+        }
+    return curves
+
+def load_pool_states(multicall: Multicall = None, block_identifier=None) -> Dict[str, CryptoSwapPool]:
+    """Local swap models of every NG pool at one block, for quoting any size without RPCs"""
+    multicall = multicall or Multicall(w3)
+    warm_pool_metadata(multicall)
+    return load_pools(multicall, CRYPTO_NG_POOLS, block_identifier)
+
+def curve_prices_from_states(states: Dict[str, CryptoSwapPool]) -> Dict[str, Dict[str, float]]:
+    """Build the same structure as get_curve_prices() from local pool models"""
+    pool_prices = {}
+    for pool_address, state in states.items():
+        try:
+            plan = get_quote_plan(pool_address)
+            pool_prices[pool_address] = prices_from_amounts(
+                plan,
+                state.get_dy(plan['eth'], plan['stable'], plan['eth_input']),
+                state.get_dy(plan['stable'], plan['eth'], plan['usdc_input']),
+                state.get_dy(plan['wbtc'], plan['stable'], plan['wbtc_input']),
+                state.get_dy(plan['stable'], plan['wbtc'], plan['usdc_input'])
+            )
+        except (ValueError, ArithmeticError) as e:
+            print(f"Error with pool {pool_address}: {str(e)}")
+    return pool_prices
+
 def check_arbitrage(pool_prices: Dict[str, Dict[str, float]]) -> None:
     """Check for arbitrage opportunities between pools"""
     for pool_address, prices in pool_prices.items():
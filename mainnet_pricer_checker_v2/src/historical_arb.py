@@ -1,68 +1,88 @@
 from web3 import Web3
 from datetime import datetime, timedelta
 import time
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Tuple
 import json
-from curve_get_price import get_curve_prices
+import curve_get_price
+import uniswap
+from curve_get_price import get_curve_prices, ETH_AMOUNT, USDC_AMOUNT, WBTC_AMOUNT
 from uniswap import get_uniswap_prices
-from arb import find_arbitrage_opportunities
-from dotenv import load_dotenv
-import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from pricer_core.arb import find_arbitrage_opportunities
+from pricer_core.chains import MAINNET
+from pricer_core.block_index import BlockTimestampIndex
+from pricer_core.opportunity_stats import OpportunityStats
+from pricer_core.backtest import BacktestStore, run_backtest
+from pricer_core.price_store import PriceHistoryStore
+from pricer_core.rpc_cache import RpcResponseCache, cache_web3
+from pricer_core.rpc_guard import get_rpc_guard, share_rpc_rate
 
-# Load environment variables
-load_dotenv()
+# RPC comes from the mainnet chain profile
+w3 = MAINNET.web3()
 
-# Get Alchemy API URL from environment variables
-ALCHEMY_API_URL = os.getenv('ALCHEMY_API_URL')
-w3 = Web3(Web3.HTTPProvider(ALCHEMY_API_URL))
+# Set by install_rpc_cache() when a backtest starts
+rpc_cache: Optional[RpcResponseCache] = None
+
+# Completed backtest chunks are checkpointed here
+BACKTEST_STORE = "backtest.sqlite"
+
+# Every price fetched during a backtest is kept here, so analysis can be re-run offline
+PRICE_HISTORY = "price_history"
+
+# Seconds between running opportunity summaries while a backtest streams results
+STATS_INTERVAL = 60
+
+# Quote sizes behind each asset's prices: (asset in on the sell side, USDC in on the buy side)
+QUOTE_SIZES = {'eth': (ETH_AMOUNT, USDC_AMOUNT), 'wbtc': (WBTC_AMOUNT, USDC_AMOUNT)}
+
+# Block number -> timestamp samples persisted across runs, so lookups are mostly local
+block_index = BlockTimestampIndex(w3, MAINNET.chain_id, block_time=MAINNET.block_time)
+
+def install_rpc_cache() -> RpcResponseCache:
+    """
+    Calls pinned to a past block never change, so every backtest client
+    answers repeats from rpc_cache_1.sqlite and a rerun over the same window
+    makes no network calls. Opened once per process, when a backtest (or a
+    backtest worker) starts rather than on import.
+    """
+    global rpc_cache
+    if rpc_cache is None:
+        rpc_cache = RpcResponseCache(MAINNET.chain_id)
+        for client in (w3, curve_get_price.w3, uniswap.w3):
+            cache_web3(client, rpc_cache)
+    return rpc_cache
 
 def get_block_by_timestamp(timestamp: int) -> int:
-    """Get the closest block number for a given timestamp"""
-    latest = w3.eth.block_number
-    earliest = latest - 1_000_000  # Look back ~1M blocks
-    
-    while earliest <= latest:
-        mid = (earliest + latest) // 2
-        block = w3.eth.get_block(mid)
-        
-        if block.timestamp == timestamp:
-            return mid
-        elif block.timestamp < timestamp:
-            earliest = mid + 1
-        else:
-            latest = mid - 1
-            
-    return earliest
+    """Get the first block at or after a timestamp, from the persistent block-timestamp index"""
+    return block_index.block_at(timestamp)
 
 def get_prices_at_block(block_number: int) -> List[Dict]:
-    """Get all pool prices at a specific block"""
-    # Set block number for web3 calls
-    w3.eth.default_block = block_number
-    
+    """
+    Get all pool prices at a specific block; safe to call from many threads
+    at once. RPC errors propagate and a block missing any configured pool
+    raises, so the backtest counts the sample as failed and retries it rather
+    than storing a partial snapshot.
+    """
     all_pools = []
-    
-    try:
-        # Get Curve prices
-        curve_prices = get_curve_prices()
-        if curve_prices:
-            for pool_address, prices in curve_prices.items():
-                prices['name'] = 'Curve'
-                prices['block'] = block_number
-                all_pools.append(prices)
-        
-        # Get Uniswap prices
-        uniswap_prices = get_uniswap_prices()
-        if uniswap_prices:
-            for pool_address, prices in uniswap_prices.items():
-                prices['block'] = block_number
-                all_pools.append(prices)
-                
-    except Exception as e:
-        print(f"Error getting prices for block {block_number}: {str(e)}")
-    
-    # Reset default block
-    w3.eth.default_block = 'latest'
+
+    # Get Curve prices
+    curve_prices = get_curve_prices(block_identifier=block_number)
+    for pool_address, prices in curve_prices.items():
+        prices['name'] = 'Curve'
+        prices['pool_address'] = pool_address
+        prices['block'] = block_number
+        all_pools.append(prices)
+
+    # Get Uniswap prices
+    uniswap_prices = get_uniswap_prices(block_identifier=block_number)
+    for pool_address, prices in uniswap_prices.items():
+        prices['pool_address'] = pool_address
+        prices['block'] = block_number
+        all_pools.append(prices)
+
+    missing = (set(curve_get_price.CURVE_POOLS) - set(curve_prices)) | (set(uniswap.UNISWAP_POOLS) - set(uniswap_prices))
+    if missing:
+        raise ValueError(f"no prices for pools {', '.join(sorted(missing))} at block {block_number}")
+
     return all_pools
 
 def fetch_block_data(timestamp):
@@ -70,78 +90,144 @@ def fetch_block_data(timestamp):
         block = get_block_by_timestamp(timestamp)
         prices = get_prices_at_block(block)
         opportunities = find_arbitrage_opportunities(prices)
-        return (timestamp, block, opportunities)
+        for opp in opportunities:
+            opp['timestamp'] = timestamp
+            opp['block'] = block
+        return (timestamp, block, opportunities, prices)
     except Exception as e:
         print(f"Error processing timestamp {timestamp}: {str(e)}")
         return None
 
-def analyze_historical_arbitrage_parallel(days=3, interval_minutes=30):
-    end_time = int(time.time())
-    start_time = end_time - (days * 24 * 60 * 60)
-    current_time = start_time
-
-    timestamps = []
-    while current_time <= end_time:
-        timestamps.append(current_time)
-        current_time += interval_minutes * 60
-
-    all_opportunities = []
-
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_timestamp = {executor.submit(fetch_block_data, ts): ts for ts in timestamps}
-        for future in as_completed(future_to_timestamp):
-            result = future.result()
-            if result:
-                timestamp, block, opportunities = result
-                if opportunities:
-                    for opp in opportunities:
-                        opp['timestamp'] = timestamp
-                        opp['block'] = block
-                        all_opportunities.append(opp)
-                        print(f"Arbitrage found at block {block} ({datetime.fromtimestamp(timestamp)})")
-                        print(f"Buy from {opp['buy_pool']} at {opp['buy_price']:.2f} USDC")
-                        print(f"Sell to {opp['sell_pool']} at {opp['sell_price']:.2f} USDC")
-                        print(f"Profit per ETH: {opp['profit_per_eth']:.2f} USDC ({opp['profit_percentage']:.2f}%)")
-                else:
-                    print(f"No arbitrage opportunities found at block {block} ({datetime.fromtimestamp(timestamp)})")
+def print_block_result(timestamp: int, block: int, opportunities: List[Dict]):
+    if opportunities:
+        for opp in opportunities:
+            print(f"Arbitrage found at block {block} ({datetime.fromtimestamp(timestamp)})")
+            print(f"Buy from {opp['buy_pool']} at {opp['buy_price']:.2f} USDC")
+            print(f"Sell to {opp['sell_pool']} at {opp['sell_price']:.2f} USDC")
+            print(f"Profit per ETH: {opp['profit_per_eth']:.2f} USDC ({opp['profit_percentage']:.2f}%)")
+    else:
+        print(f"No arbitrage opportunities found at block {block} ({datetime.fromtimestamp(timestamp)})")
+
+def init_worker(workers: int):
+    """
+    Setup for a backtest worker process (mode='process'). Spawned workers
+    import this module afresh, so they already own their providers and
+    block index; they open their own RPC cache connection and take their
+    share of the plan.
+    """
+    install_rpc_cache()
+    share_rpc_rate(1 / workers)
+
+def run_historical_backtest(name: str, process, days=3, interval_minutes=30, chunk_size=50,
+                            store_path=BACKTEST_STORE, resume=True, price_history_path=PRICE_HISTORY,
+                            max_workers=10, per_chunk=False, end_time: Optional[int] = None,
+                            mode='thread', threads_per_worker=1):
+    """
+    Backtest the `days` days up to end_time (default now) in chunks of
+    chunk_size samples with process (see run_backtest), as the job
+    name_{days}d_{interval}s. Each
+    finished chunk is committed to the SQLite store at store_path, so an
+    interrupted run picks up at the first unfinished chunk of the same job
+    when resume is True. The prices behind every sample are written to the
+    price history at price_history_path, for replay_historical_arbitrage().
+    With mode='process', max_workers processes of threads_per_worker threads
+    each take a contiguous range of chunks; process must then be a
+    module-level function.
+    Returns (store, job); read results back with store.opportunities(job).
+    """
+    interval = max(1, int(interval_minutes * 60))
+    end_time = int(end_time or time.time())
+    start_time = end_time - int(days * 24 * 60 * 60)
+
+    rpc_cache = install_rpc_cache()
+    store = BacktestStore(store_path)
+    job = store.job(f"{name}_{days}d_{interval}s", start_time, end_time, interval, chunk_size, resume)
+
+    # Resolve every pending sample's block up front, in time order, so each lookup starts from a tight bracket
+    completed = store.completed_chunks(job)
+    block_index.blocks_at(ts for k, chunk in enumerate(job.chunks()) if k not in completed for ts in chunk)
+    print(block_index.report())
+
+    price_history = PriceHistoryStore(price_history_path, MAINNET.chain_id)
+
+    def save_prices(chunk: int, results: List[Tuple]):
+        for timestamp, block, _, prices in results:
+            price_history.append_pools(block, timestamp, prices, QUOTE_SIZES)
+        price_history.flush()
+
+    stats = OpportunityStats()
+
+    def on_result(timestamp: int, block: int, opportunities: List[Dict]):
+        print_block_result(timestamp, block, opportunities)
+        stats.observe(block, timestamp, opportunities)
+        if stats.report_due(STATS_INTERVAL):
+            print(stats.summary())
+
+    summary = run_backtest(store, job, process, max_workers=max_workers, on_result=on_result,
+                           on_chunk=save_prices, per_chunk=per_chunk, mode=mode,
+                           threads_per_worker=threads_per_worker, initializer=init_worker,
+                           initargs=(max_workers,))
+    price_history.compact()
+    print(get_rpc_guard(MAINNET.rpc_url).report())
+    print(rpc_cache.report())
 
     # Save results to file
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"arbitrage_opportunities_{timestamp}.json"
-    
-    with open(filename, 'w') as f:
-        json.dump(all_opportunities, f, indent=2)
-        
-    print(f"Analysis complete. Found {len(all_opportunities)} opportunities.")
-    print(f"Results saved to {filename}")
-
-    return all_opportunities
-
-def analyze_results(opportunities: List[Dict]):
-    """Analyze and print statistics about the opportunities found"""
-    if not opportunities:
-        print("No opportunities found to analyze")
-        return
-        
-    total_opps = len(opportunities)
-    total_profit = sum(opp['profit_per_eth'] for opp in opportunities)
-    avg_profit = total_profit / total_opps
-    max_profit = max(opportunities, key=lambda x: x['profit_per_eth'])
-    
-    print("\n=== Arbitrage Analysis ===")
-    print(f"Total opportunities found: {total_opps}")
-    print(f"Total potential profit: {total_profit:.2f} USDC")
-    print(f"Average profit per trade: {avg_profit:.2f} USDC")
-    print("\nBest opportunity:")
-    print(f"Block: {max_profit['block']}")
-    print(f"Time: {datetime.fromtimestamp(max_profit['timestamp'])}")
-    print(f"Buy from: {max_profit['buy_pool']} at {max_profit['buy_price']:.2f} USDC")
-    print(f"Sell to: {max_profit['sell_pool']} at {max_profit['sell_price']:.2f} USDC")
-    print(f"Profit: {max_profit['profit_per_eth']:.2f} USDC ({max_profit['profit_percentage']:.2f}%)")
+    count = store.export_json(job, filename)
+
+    if summary['failed_chunks']:
+        print(f"{summary['failed_chunks']} of {summary['chunks']} chunks failed, run again to retry them.")
+    else:
+        print("Analysis complete.")
+    print(f"Found {count} opportunities so far. Results saved to {filename} and {store_path}")
+
+    return store, job
+
+def analyze_historical_arbitrage_parallel(days=3, interval_minutes=30, chunk_size=50,
+                                          store_path=BACKTEST_STORE, resume=True,
+                                          price_history_path=PRICE_HISTORY, end_time=None,
+                                          mode='thread', max_workers=10, threads_per_worker=1):
+    """
+    Backtest by pricing every sample block with eth_calls, max_workers
+    samples at a time, or with mode='process' in max_workers processes of
+    threads_per_worker threads each
+    """
+    return run_historical_backtest("mainnet", fetch_block_data, days, interval_minutes, chunk_size,
+                                   store_path, resume, price_history_path, max_workers, end_time=end_time,
+                                   mode=mode, threads_per_worker=threads_per_worker)
+
+def replay_historical_arbitrage(block_range: Optional[Tuple[int, int]] = None,
+                                venues: Optional[Iterable[str]] = None,
+                                min_profit_pct: float = 0.0,
+                                price_history_path: str = PRICE_HISTORY) -> List[Dict]:
+    """
+    Re-run find_arbitrage_opportunities over stored prices without any RPC,
+    e.g. with a different min_profit_pct. block_range (inclusive) and venues
+    (e.g. ['Curve', 'Uniswap']) are pushed down to the price history, so
+    only matching partitions are read.
+    """
+    price_history = PriceHistoryStore(price_history_path, MAINNET.chain_id)
+    opportunities = []
+    for block, timestamp, pools in price_history.replay(block_range, venues):
+        for opp in find_arbitrage_opportunities(pools, min_profit_pct=min_profit_pct):
+            opp['timestamp'] = timestamp
+            opp['block'] = block
+            opportunities.append(opp)
+    return opportunities
+
+def analyze_results(results: Iterable[Tuple]) -> OpportunityStats:
+    """
+    Print statistics about a stream of (timestamp, block, opportunities)
+    samples, e.g. store.results(job), without holding them in memory
+    """
+    stats = OpportunityStats().observe_all(results)
+    print(stats.report())
+    return stats
 
 if __name__ == "__main__":
     # Run analysis for past 3 days, checking every 30 minutes
-    opportunities = analyze_historical_arbitrage_parallel(days=1, interval_minutes=0.5)
+    store, job = analyze_historical_arbitrage_parallel(days=1, interval_minutes=0.5)
     
     # Analyze results
-    analyze_results(opportunities) 
\ No newline at end of file
+    analyze_results(store.results(job))
@@ -1,147 +1,149 @@
-from web3 import Web3
-from datetime import datetime, timedelta
-import time
-from typing import Dict, List
-import json
-from curve_get_price import get_curve_prices
-from uniswap import get_uniswap_prices
-from arb import find_arbitrage_opportunities
-from dotenv import load_dotenv
-import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-# Load environment variables
-load_dotenv()
-
-# Get Alchemy API URL from environment variables
-ALCHEMY_API_URL = os.getenv('ALCHEMY_API_URL')
-w3 = Web3(Web3.HTTPProvider(ALCHEMY_API_URL))
-
-def get_block_by_timestamp(timestamp: int) -> int:
-    """Get the closest block number for a given timestamp"""
-    latest = w3.eth.block_number
-    earliest = latest - 1_000_000  # Look back ~1M blocks
-    
-    while earliest <= latest:
-        mid = (earliest + latest) // 2
-        block = w3.eth.get_block(mid)
-        
-        if block.timestamp == timestamp:
-            return mid
-        elif block.timestamp < timestamp:
-            earliest = mid + 1
-        else:
-            latest = mid - 1
-            
-    return earliest
-
-def get_prices_at_block(block_number: int) -> List[Dict]:
-    """Get all pool prices at a specific block"""
-    # Set block number for web3 calls
-    w3.eth.default_block = block_number
-    
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import threading
+
+import curve_get_price
+import uniswap
+from pricer_core.arb import find_arbitrage_opportunities
+from historical_arb import (
+    w3, block_index, get_prices_at_block, run_historical_backtest, analyze_results,
+    BACKTEST_STORE, PRICE_HISTORY
+)
+from pricer_core.multicall import Multicall
+from services.cryptoswap_pool import CryptoSwapPool
+from services.pool_events import PoolStateReplayer, RpcLogSource, record_log_fixture, load_log_fixture
+from services.uniswap_v3_pool import UniswapV3Pool
+
+# Pool state is rolled forward through eth_getLogs pages instead of eth_calls at every sample.
+# Only pools with a local model are replayed: the Uniswap pools and Curve's NG pools
+# (curve_get_price.CRYPTO_NG_POOLS); tricrypto2 is only in the eth_call backtest.
+log_source = RpcLogSource(w3)
+
+# A thread rolls its last chunk's pool states forward into the next chunk when that starts at most
+# this many blocks later, instead of reading fresh seed states
+REUSE_MAX_GAP = 2000
+
+_local = threading.local()
+
+def load_seed_states(block_number: int) -> Tuple[Dict[str, UniswapV3Pool], Dict[str, CryptoSwapPool]]:
+    """Local models of every replayed pool at one block, from a few multicalls"""
+    multicall = Multicall(w3)
+    return (uniswap.load_pool_states(multicall, block_number),
+            curve_get_price.load_pool_states(multicall, block_number))
+
+def reload_curve_pool(pool_address: str, block_number: int) -> Optional[CryptoSwapPool]:
+    return curve_get_price.load_pool_states(Multicall(w3), block_number).get(pool_address)
+
+def prices_from_states(block_number: int, uniswap_states: Dict[str, UniswapV3Pool],
+                       curve_states: Dict[str, CryptoSwapPool]) -> List[Dict]:
+    """Same pool list as historical_arb.get_prices_at_block(), priced from local models"""
     all_pools = []
-    
-    try:
-        # Get Curve prices
-        curve_prices = get_curve_prices()
-        if curve_prices:
-            for pool_address, prices in curve_prices.items():
-                prices['name'] = 'Curve'
-                prices['block'] = block_number
-                all_pools.append(prices)
-        
-        # Get Uniswap prices
-        uniswap_prices = get_uniswap_prices()
-        if uniswap_prices:
-            for pool_address, prices in uniswap_prices.items():
-                prices['block'] = block_number
-                all_pools.append(prices)
-                
-    except Exception as e:
-        print(f"Error getting prices for block {block_number}: {str(e)}")
-    
-    # Reset default block
-    w3.eth.default_block = 'latest'
+    for pool_address, prices in curve_get_price.curve_prices_from_states(curve_states).items():
+        prices['name'] = 'Curve'
+        prices['pool_address'] = pool_address
+        prices['block'] = block_number
+        all_pools.append(prices)
+    for pool_address, prices in uniswap.uniswap_prices_from_states(uniswap_states).items():
+        prices['pool_address'] = pool_address
+        prices['block'] = block_number
+        all_pools.append(prices)
     return all_pools
 
-def fetch_block_data(timestamp):
+def replay_prices(replayer: PoolStateReplayer, blocks: Iterable[int]) -> Iterator[Tuple[int, List[Dict]]]:
+    """(block, pools) for each block, in block order"""
+    for block, uniswap_states, curve_states in replayer.states_at(blocks):
+        yield block, prices_from_states(block, uniswap_states, curve_states)
+
+def chunk_replayer(seed: int) -> PoolStateReplayer:
+    """
+    This thread's replayer from its previous chunk if it can roll forward to
+    seed within REUSE_MAX_GAP blocks, otherwise one seeded at seed. In
+    process mode each worker's chunks are contiguous, so most chunks reuse.
+    """
+    replayer = getattr(_local, 'replayer', None)
+    if replayer is None or not 0 <= seed - replayer.block_number <= REUSE_MAX_GAP:
+        replayer = PoolStateReplayer(*load_seed_states(seed), seed, log_source, reload=reload_curve_pool)
+        _local.replayer = replayer
+    return replayer
+
+def process_chunk(timestamps: List[int]) -> List[Optional[Tuple]]:
+    """
+    Price a chunk of samples from seed states at its first block (or the
+    previous chunk's, see chunk_replayer) plus the logs up to its last,
+    returning (timestamp, block, opportunities, prices) per sample as
+    run_backtest expects
+    """
     try:
-        block = get_block_by_timestamp(timestamp)
-        prices = get_prices_at_block(block)
-        opportunities = find_arbitrage_opportunities(prices)
-        return (timestamp, block, opportunities)
+        blocks = {timestamp: block_index.block_at(timestamp) for timestamp in timestamps}
+        replayer = chunk_replayer(min(blocks.values()))
+        priced = dict(replay_prices(replayer, blocks.values()))
+
+        results = []
+        for timestamp, block in blocks.items():
+            opportunities = find_arbitrage_opportunities(priced[block])
+            for opp in opportunities:
+                opp['timestamp'] = timestamp
+                opp['block'] = block
+            results.append((timestamp, block, opportunities, priced[block]))
+        return results
     except Exception as e:
-        print(f"Error processing timestamp {timestamp}: {str(e)}")
-        return None
-
-def analyze_historical_arbitrage_parallel(days=3, interval_minutes=30):
-    end_time = int(time.time())
-    start_time = end_time - (days * 24 * 60 * 60)
-    current_time = start_time
-
-    timestamps = []
-    while current_time <= end_time:
-        timestamps.append(current_time)
-        current_time += interval_minutes * 60
-
-    all_opportunities = []
-
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_timestamp = {executor.submit(fetch_block_data, ts): ts for ts in timestamps}
-        for future in as_completed(future_to_timestamp):
-            result = future.result()
-            if result:
-                timestamp, block, opportunities = result
-                if opportunities:
-                    for opp in opportunities:
-                        opp['timestamp'] = timestamp
-                        opp['block'] = block
-                        all_opportunities.append(opp)
-                        print(f"Arbitrage found at block {block} ({datetime.fromtimestamp(timestamp)})")
-                        print(f"Buy from {opp['buy_pool']} at {opp['buy_price']:.2f} USDC")
-                        print(f"Sell to {opp['sell_pool']} at {opp['sell_price']:.2f} USDC")
-                        print(f"Profit per ETH: {opp['profit_per_eth']:.2f} USDC ({opp['profit_percentage']:.2f}%)")
-                else:
-                    print(f"No arbitrage opportunities found at block {block} ({datetime.fromtimestamp(timestamp)})")
-
-    # Save results to file
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"arbitrage_opportunities_{timestamp}.json"
-    
-    with open(filename, 'w') as f:
-        json.dump(all_opportunities, f, indent=2)
-        
-    print(f"Analysis complete. Found {len(all_opportunities)} opportunities.")
-    print(f"Results saved to {filename}")
-
-    return all_opportunities
-
-def analyze_results(opportunities: List[Dict]):
-    """Analyze and print statistics about the opportunities found"""
-    if not opportunities:
-        print("No opportunities found to analyze")
-        return
-        
-    total_opps = len(opportunities)
-    total_profit = sum(opp['profit_per_eth'] for opp in opportunities)
-    avg_profit = total_profit / total_opps
-    max_profit = max(opportunities, key=lambda x: x['profit_per_eth'])
-    
-    print("\n=== Arbitrage Analysis ===")
-    print(f"Total opportunities found: {total_opps}")
-    print(f"Total potential profit: {total_profit:.2f} USDC")
-    print(f"Average profit per trade: {avg_profit:.2f} USDC")
-    print("\nBest opportunity:")
-    print(f"Block: {max_profit['block']}")
-    print(f"Time: {datetime.fromtimestamp(max_profit['timestamp'])}")
-    print(f"Buy from: {max_profit['buy_pool']} at {max_profit['buy_price']:.2f} USDC")
-    print(f"Sell to: {max_profit['sell_pool']} at {max_profit['sell_price']:.2f} USDC")
-    print(f"Profit: {max_profit['profit_per_eth']:.2f} USDC ({max_profit['profit_percentage']:.2f}%)")
+        # The models may be half way through a block, never roll them forward again
+        _local.replayer = None
+        print(f"Error replaying chunk starting at {timestamps[0]}: {str(e)}")
+        return [None] * len(timestamps)
+
+def analyze_historical_arbitrage_events(days=3, interval_minutes=30, chunk_size=50,
+                                        store_path=BACKTEST_STORE, resume=True,
+                                        price_history_path=PRICE_HISTORY, max_workers=4, end_time=None,
+                                        mode='thread'):
+    """
+    Backtest like historical_arb.analyze_historical_arbitrage_parallel, but
+    each chunk costs at most one seed read and a few log pages instead of
+    eth_calls per sample; up to max_workers chunks replay at once, in
+    threads or, with mode='process', in processes so the pool simulations
+    aren't held back by the GIL
+    """
+    return run_historical_backtest("mainnet_events", process_chunk, days, interval_minutes, chunk_size,
+                                   store_path, resume, price_history_path, max_workers, per_chunk=True,
+                                   end_time=end_time, mode=mode)
+
+def record_fixture(path: str, from_block: int, to_block: int, check_blocks: Iterable[int] = ()):
+    """
+    Record seed states at from_block, every replayed event up to to_block and
+    eth_call prices at check_blocks, for offline runs with check_log_fixture()
+    """
+    uniswap_states, curve_states = load_seed_states(from_block)
+    replayer = PoolStateReplayer(uniswap_states, curve_states, from_block, log_source)
+    logs = replayer.fetch_logs(from_block + 1, to_block)
+
+    replayed = set(uniswap_states) | set(curve_states)
+    prices = {block: {pool['pool_address']: pool for pool in get_prices_at_block(block)
+                      if pool['pool_address'] in replayed}
+              for block in check_blocks}
+    record_log_fixture(path, from_block, uniswap_states, curve_states, logs, uniswap.pool_metadata, prices)
+    print(f"Recorded {len(logs)} logs for blocks {from_block}-{to_block} to {path}")
+
+def check_log_fixture(path: str, tolerance: float = 1e-6) -> List[Dict]:
+    """
+    Replay a recorded fixture without any RPC and compare against its eth_call
+    prices; returns every price off by more than tolerance (relative)
+    """
+    replayer, expected = load_log_fixture(path, uniswap.pool_metadata)
+    mismatches = []
+    for block, pools in replay_prices(replayer, expected):
+        replayed = {pool['pool_address']: pool for pool in pools}
+        for pool_address, reference in expected[block].items():
+            for key in ('eth_buy', 'eth_sell', 'wbtc_buy', 'wbtc_sell'):
+                if key not in reference:
+                    continue
+                local = replayed.get(pool_address, {}).get(key)
+                if local is None or abs(local - reference[key]) > tolerance * abs(reference[key]):
+                    mismatches.append({'block': block, 'pool': pool_address, 'price': key,
+                                       'expected': reference[key], 'local': local})
+    return mismatches
 
 if __name__ == "__main__":
-    # Run analysis for past 3 days, checking every 30 minutes
-    opportunities = analyze_historical_arbitrage_parallel(days=1, interval_minutes=0.5)
-    
+    # Run analysis for past day, checking every 30 seconds
+    store, job = analyze_historical_arbitrage_events(days=1, interval_minutes=0.5)
+
     # Analyze results
-    analyze_results(opportunities) 
\ No newline at end of file
+    analyze_results(store.results(job))
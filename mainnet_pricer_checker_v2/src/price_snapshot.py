@@ -0,0 +1,69 @@
+from web3 import Web3
+from typing import Dict, List, Optional
+
+from pricer_core.arb import snapshot_pools
+from pricer_core.multicall import Call, Multicall, MulticallResult
+from services.size_optimizer import find_sized_opportunities
+import curve_get_price
+import uniswap
+from curve_get_price import w3 as default_w3, get_curve_quote_calls, curve_prices_from_results
+from curve_get_price import get_curve_sample_calls, curve_output_curves
+from uniswap import get_uniswap_quote_calls, uniswap_prices_from_results
+from uniswap import get_uniswap_sample_calls, uniswap_output_curves
+
+# ETH sizes each output curve is sampled at; USDC sizes are the same notional
+# at the reference quote price
+ETH_SAMPLE_SIZES = [0.1, 0.3, 1, 3, 10, 30, 100]
+USDC_SAMPLE_SIZES = [size * curve_get_price.USDC_AMOUNT / curve_get_price.ETH_AMOUNT for size in ETH_SAMPLE_SIZES]
+
+class PriceSnapshot:
+    """
+    Prices every Curve and Uniswap pool from the same block using Multicall3.
+    Static pool metadata is warmed once up front, so each cycle is a single
+    aggregate3 round trip of price-bearing calls.
+    """
+    def __init__(self, w3: Web3 = None, batch_size: int = 100):
+        self.multicall = Multicall(w3 or default_w3, batch_size=batch_size)
+        warm_pool_metadata(self.multicall)
+
+    def take(self, block_identifier=None, sized: bool = False) -> Dict:
+        """
+        Fixed-size prices for every pool; with sized=True the output curves
+        are sampled in the same aggregate and 'sized' holds the optimal
+        trade per venue pair
+        """
+        calls = get_curve_quote_calls() + get_uniswap_quote_calls()
+        if sized:
+            calls += size_sample_calls()
+        results = self.multicall.aggregate(calls, block_identifier)
+
+        snapshot = {
+            'block': results.block_number,
+            'venues': {
+                'Curve': curve_prices_from_results(results),
+                'Uniswap': uniswap_prices_from_results(results)
+            },
+            'failed': results.failed
+        }
+        if sized:
+            snapshot['sized'] = sized_opportunities_from_results(results)
+        return snapshot
+
+def warm_pool_metadata(multicall: Multicall):
+    """Read token/fee/decimals for every configured pool before the hot loop starts"""
+    curve_get_price.warm_pool_metadata(multicall)
+    uniswap.warm_pool_metadata(multicall)
+
+def size_sample_calls() -> List[Call]:
+    """Every pool's output curve samples, to batch into a single multicall"""
+    return (get_curve_sample_calls(ETH_SAMPLE_SIZES, USDC_SAMPLE_SIZES) +
+            get_uniswap_sample_calls(ETH_SAMPLE_SIZES, USDC_SAMPLE_SIZES))
+
+def sized_opportunities_from_results(results: MulticallResult, max_usdc: Optional[float] = None) -> List[Dict]:
+    """Profit-maximizing USDC size for every buy/sell pool pair from sampled output curves"""
+    curves = {}
+    for name, venue_curves in (('Curve', curve_output_curves(results, ETH_SAMPLE_SIZES, USDC_SAMPLE_SIZES)),
+                               ('Uniswap', uniswap_output_curves(results, ETH_SAMPLE_SIZES, USDC_SAMPLE_SIZES))):
+        for pool_address, pool_curves in venue_curves.items():
+            curves[f"{name} {pool_address}"] = pool_curves
+    return find_sized_opportunities(curves, max_in=max_usdc)
@@ -0,0 +1 @@
+# This file intentionally left empty to mark the directory as a Python package 
\ No newline at end of file
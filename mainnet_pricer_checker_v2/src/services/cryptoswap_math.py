@@ -0,0 +1,520 @@
+"""
+Integer-exact ports of CurveCryptoMathOptimized3.vy (Tricrypto-NG) and
+CurveCryptoMathOptimized2.vy (Twocrypto-NG). Signed divisions truncate
+toward zero like Vyper's int256 division, unsigned ones floor, and the
+contract's range asserts raise ValueError so a quote the pool would revert
+on fails here too.
+"""
+from math import isqrt
+from typing import List, Sequence
+
+A_MULTIPLIER = 10000
+MAX_UINT256 = 2**256 - 1
+
+# Range limits the math contracts assert on
+MIN_GAMMA = 10**10
+MAX_GAMMA_3 = 5 * 10**16
+MAX_GAMMA_2 = 2 * 10**15
+MIN_A_3 = 3**3 * A_MULTIPLIER // 100
+MAX_A_3 = 3**3 * A_MULTIPLIER * 1000
+MIN_A_2 = 2**2 * A_MULTIPLIER // 10
+MAX_A_2 = 2**2 * A_MULTIPLIER * 1000
+
+def _require(condition: bool, message: str):
+    if not condition:
+        raise ValueError(message)
+
+def _sdiv(a: int, b: int) -> int:
+    """int256 division, truncating toward zero"""
+    q = abs(a) // abs(b)
+    return q if (a >= 0) == (b >= 0) else -q
+
+# ------------------------------ Math utils ----------------------------------
+
+def snekmate_log_2(x: int, roundup: bool = False) -> int:
+    """log2(x) rounded down (or up), 0 for 0"""
+    result = x.bit_length() - 1 if x else 0
+    if roundup and (1 << result) < x:
+        result += 1
+    return result
+
+def cbrt(x: int) -> int:
+    """Cube root in 1e18 precision, with the contract's initial guess and 7 Newton steps"""
+    if x >= 115792089237316195423570985008687907853269 * 10**18:
+        xx = x
+    elif x >= 115792089237316195423570985008687907853269:
+        xx = x * 10**18
+    else:
+        xx = x * 10**36
+
+    log2x = snekmate_log_2(xx)
+    remainder = log2x % 3
+    a = (2**(log2x // 3) * 1260**remainder) // 1000**remainder
+
+    for _ in range(7):
+        a = (2 * a + xx // (a * a)) // 3
+
+    if x >= 115792089237316195423570985008687907853269 * 10**18:
+        a *= 10**12
+    elif x >= 115792089237316195423570985008687907853269:
+        a *= 10**6
+    return a
+
+def wad_exp(x: int) -> int:
+    """e**x with 1e18 precision (snekmate)"""
+    if x <= -42139678854452767551:
+        return 0
+    _require(x < 135305999368893231589, "wad_exp overflow")
+
+    value = _sdiv(x << 78, 5**18)
+    k = (_sdiv(value << 96, 54916777467707473351141471128) + 2**95) >> 96
+    value = value - k * 54916777467707473351141471128
+
+    y = (((value + 1346386616545796478920950773328) * value) >> 96) + 57155421227552351082224309758442
+    p = ((((y + value - 94201549194550492254356042504812) * y) >> 96) +
+         28719021644029726153956944680412240) * value + (4385272521454847904659076985693276 << 96)
+
+    q = (((value - 2855989394907223263936484059900) * value) >> 96) + 50020603652535783019961831881945
+    q = ((q * value) >> 96) - 533845033583426703283633433725380
+    q = ((q * value) >> 96) + 3604857256930695427073651918091429
+    q = ((q * value) >> 96) - 14423608567350463180887372962807573
+    q = ((q * value) >> 96) + 26449188498355588339934803723976023
+
+    r = _sdiv(p, q)
+    # r is reinterpreted as uint256 and multiplied with wrap-around, as in the contract
+    return ((r & MAX_UINT256) * 3822833074963236453042738258902158003155416615667 & MAX_UINT256) >> (195 - k)
+
+def sort3(x: Sequence[int]) -> List[int]:
+    """Three numbers sorted high to low"""
+    return sorted(x, reverse=True)
+
+def geometric_mean3(x: Sequence[int]) -> int:
+    prod = x[0] * x[1] // 10**18 * x[2] // 10**18
+    if prod == 0:
+        return 0
+    return cbrt(prod)
+
+def reduction_coefficient3(x: Sequence[int], fee_gamma: int) -> int:
+    """fee_gamma / (fee_gamma + (1 - K)), K = prod(x) / (sum(x) / N)**N"""
+    S = x[0] + x[1] + x[2]
+    K = 10**18 * 3 * x[0] // S
+    K = K * 3 * x[1] // S
+    K = K * 3 * x[2] // S
+    if fee_gamma > 0:
+        K = fee_gamma * 10**18 // (fee_gamma + 10**18 - K)
+    return K
+
+def reduction_coefficient2(x: Sequence[int], fee_gamma: int) -> int:
+    """The same coefficient as Twocrypto-NG's _fee computes inline"""
+    f = x[0] + x[1]
+    return fee_gamma * 10**18 // (fee_gamma + 10**18 - (10**18 * 4) * x[0] // f * x[1] // f)
+
+def fee_from_params(reduction_coefficient: int, mid_fee: int, out_fee: int) -> int:
+    """Swap fee in 1e10 precision, between mid_fee (balanced) and out_fee"""
+    return (mid_fee * reduction_coefficient + out_fee * (10**18 - reduction_coefficient)) // 10**18
+
+# ------------------------------ Tricrypto-NG ---------------------------------
+
+def newton_y3(ANN: int, gamma: int, x: Sequence[int], D: int, i: int) -> int:
+    """Calculate x[i] from the other balances and D with Newton's method"""
+    for k in range(3):
+        if k != i:
+            frac = x[k] * 10**18 // D
+            _require(10**16 - 1 < frac < 10**20 + 1, "Unsafe values x[i]")
+
+    y = D // 3
+    K0_i = 10**18
+    S_i = 0
+
+    x_sorted = list(x)
+    x_sorted[i] = 0
+    x_sorted = sort3(x_sorted)  # From high to low
+
+    convergence_limit = max(max(x_sorted[0] // 10**14, D // 10**14), 100)
+
+    for j in range(2, 4):
+        _x = x_sorted[3 - j]
+        y = y * D // (_x * 3)  # Small _x first
+        S_i += _x
+
+    for j in range(2):
+        K0_i = K0_i * x_sorted[j] * 3 // D  # Large _x first
+
+    for _ in range(255):
+        y_prev = y
+
+        K0 = K0_i * y * 3 // D
+        S = S_i + y
+
+        _g1k0 = gamma + 10**18
+        _g1k0 = _g1k0 - K0 + 1 if _g1k0 > K0 else K0 - _g1k0 + 1
+
+        mul1 = 10**18 * D // gamma * _g1k0 // gamma * _g1k0 * A_MULTIPLIER // ANN
+        mul2 = 10**18 + (2 * 10**18) * K0 // _g1k0
+
+        yfprime = 10**18 * y + S * mul2 + mul1
+        _dyfprime = D * mul2
+        if yfprime < _dyfprime:
+            y = y_prev // 2
+            continue
+        yfprime -= _dyfprime
+
+        fprime = yfprime // y
+
+        y_minus = mul1 // fprime
+        y_plus = (yfprime + 10**18 * D) // fprime + y_minus * 10**18 // K0
+        y_minus += 10**18 * S // fprime
+
+        y = y_prev // 2 if y_plus < y_minus else y_plus - y_minus
+
+        if abs(y - y_prev) < max(convergence_limit, y // 10**14):
+            frac = y * 10**18 // D
+            _require(10**16 - 1 < frac < 10**20 + 1, "Unsafe value for y")
+            return y
+
+    raise ArithmeticError("Did not converge")
+
+def get_y3(ANN: int, gamma: int, x: Sequence[int], D: int, i: int) -> List[int]:
+    """
+    Calculate x[i] given the other balances and D with the analytical cubic
+    solution, falling back to newton_y3. Returns [y, K0].
+    """
+    _require(MIN_A_3 - 1 < ANN < MAX_A_3 + 1, "unsafe values A")
+    _require(MIN_GAMMA - 1 < gamma < MAX_GAMMA_3 + 1, "unsafe values gamma")
+    _require(10**17 - 1 < D < 10**15 * 10**18 + 1, "unsafe values D")
+
+    for k in range(3):
+        if k != i:
+            frac = x[k] * 10**18 // D
+            _require(10**16 - 1 < frac < 10**20 + 1, "Unsafe values x[i]")
+
+    j, k = {0: (1, 2), 1: (0, 2), 2: (0, 1)}[i]
+    x_j, x_k = x[j], x[k]
+    gamma2 = gamma * gamma
+
+    a = 10**36 // 27
+
+    # 10**36/9 + 2*10**18*gamma/27 - D**2/x_j*gamma**2*ANN/27**2/A_MULTIPLIER/x_k
+    b = (10**36 // 9 + 2 * 10**18 * gamma // 27
+         - D * D // x_j * gamma2 * ANN // 27**2 // A_MULTIPLIER // x_k)
+
+    # 10**36/9 + gamma*(gamma + 4*10**18)/27 + gamma**2*(x_j+x_k-D)/D*ANN/27/A_MULTIPLIER
+    c = (10**36 // 9 + gamma * (gamma + 4 * 10**18) // 27
+         + _sdiv(_sdiv(_sdiv(gamma2 * (x_j + x_k - D), D) * ANN, 27), A_MULTIPLIER))
+
+    # (10**18 + gamma)**2/27
+    d = (10**18 + gamma)**2 // 27
+
+    # abs(3*a*c/b - b)
+    d0 = abs(_sdiv(3 * a * c, b) - b)
+
+    divider = 1
+    for threshold, value in ((10**48, 10**30), (10**44, 10**26), (10**40, 10**22), (10**36, 10**18),
+                             (10**32, 10**14), (10**28, 10**10), (10**24, 10**6), (10**20, 10**2)):
+        if d0 > threshold:
+            divider = value
+            break
+
+    if abs(a) > abs(b):
+        additional_prec = abs(_sdiv(a, b))
+        a = _sdiv(a * additional_prec, divider)
+        b = _sdiv(b * additional_prec, divider)
+        c = _sdiv(c * additional_prec, divider)
+        d = _sdiv(d * additional_prec, divider)
+    else:
+        additional_prec = abs(_sdiv(b, a))
+        a = _sdiv(_sdiv(a, additional_prec), divider)
+        b = _sdiv(_sdiv(b, additional_prec), divider)
+        c = _sdiv(_sdiv(c, additional_prec), divider)
+        d = _sdiv(_sdiv(d, additional_prec), divider)
+
+    # 3*a*c/b - b
+    _3ac = 3 * a * c
+    delta0 = _sdiv(_3ac, b) - b
+
+    # 9*a*c/b - 2*b - 27*a**2/b*d/b
+    delta1 = _sdiv(3 * _3ac, b) - 2 * b - _sdiv(_sdiv(27 * a**2, b) * d, b)
+
+    # delta1**2 + 4*delta0**2/b*delta0
+    sqrt_arg = delta1**2 + _sdiv(4 * delta0**2, b) * delta0
+    if sqrt_arg <= 0:
+        return [newton_y3(ANN, gamma, x, D, i), 0]
+    sqrt_val = isqrt(sqrt_arg)
+
+    b_cbrt = cbrt(b) if b >= 0 else -cbrt(-b)
+
+    if delta1 > 0:
+        second_cbrt = cbrt((delta1 + sqrt_val) // 2)
+    else:
+        second_cbrt = -cbrt(-(delta1 - sqrt_val) // 2)
+
+    # b_cbrt*b_cbrt/10**18*second_cbrt/10**18
+    C1 = _sdiv(_sdiv(b_cbrt * b_cbrt, 10**18) * second_cbrt, 10**18)
+
+    # (b + b*delta0/C1 - C1)/3
+    root_K0 = _sdiv(b + _sdiv(b * delta0, C1) - C1, 3)
+
+    # D*D/27/x_k*D/x_j*root_K0/a
+    root = _sdiv(_sdiv(D * D // 27 // x_k * D, x_j) * root_K0, a)
+
+    out = [root, _sdiv(10**18 * root_K0, a)]
+    _require(out[0] >= 0 and out[1] >= 0, "Unsafe value for y")  # convert(..., uint256)
+    frac = out[0] * 10**18 // D
+    _require(10**16 - 1 <= frac < 10**20 + 1, "Unsafe value for y")
+    return out
+
+def newton_D3(ANN: int, gamma: int, x_unsorted: Sequence[int], K0_prev: int = 0) -> int:
+    """Invariant D by Newton's method, with the contract's initial guesses"""
+    x = sort3(x_unsorted)
+    _require(x[0] < MAX_UINT256 // 10**18 * 3**3, "out of limits")
+    _require(x[0] > 0, "empty pool")
+
+    S = x[0] + x[1] + x[2]
+    if K0_prev == 0:
+        D = 3 * geometric_mean3(x)
+    elif S > 10**36:
+        D = cbrt(x[0] * x[1] // 10**36 * x[2] // K0_prev * 27 * 10**12)
+    elif S > 10**24:
+        D = cbrt(x[0] * x[1] // 10**24 * x[2] // K0_prev * 27 * 10**6)
+    else:
+        D = cbrt(x[0] * x[1] // 10**18 * x[2] // K0_prev * 27)
+
+    for _ in range(255):
+        D_prev = D
+
+        # K0 = 10**18 * x[0] * N_COINS / D * x[1] * N_COINS / D * x[2] * N_COINS / D
+        K0 = 10**18 * x[0] * 3 // D * x[1] * 3 // D * x[2] * 3 // D
+
+        _g1k0 = gamma + 10**18
+        _g1k0 = _g1k0 - K0 + 1 if _g1k0 > K0 else K0 - _g1k0 + 1
+
+        # D / (A * N**N) * _g1k0**2 / gamma**2
+        mul1 = 10**18 * D // gamma * _g1k0 // gamma * _g1k0 * A_MULTIPLIER // ANN
+
+        # 2*N*K0 / _g1k0
+        mul2 = 2 * 10**18 * 3 * K0 // _g1k0
+
+        neg_fprime = (S + S * mul2 // 10**18) + mul1 * 3 // K0 - mul2 * D // 10**18
+
+        D_plus = D * (neg_fprime + S) // neg_fprime
+        D_minus = D * D // neg_fprime
+        if 10**18 > K0:
+            D_minus += D * (mul1 // neg_fprime) // 10**18 * (10**18 - K0) // K0
+        else:
+            D_minus -= D * (mul1 // neg_fprime) // 10**18 * (K0 - 10**18) // K0
+
+        D = D_plus - D_minus if D_plus > D_minus else (D_minus - D_plus) // 2
+
+        if abs(D - D_prev) * 10**14 < max(10**16, D):
+            for _x in x:
+                frac = _x * 10**18 // D
+                _require(10**16 - 1 <= frac < 10**20 + 1, "Unsafe values x[i]")
+            return D
+
+    raise ArithmeticError("Did not converge")
+
+def get_p3(xp: Sequence[int], D: int, A_gamma: Sequence[int]) -> List[int]:
+    """dx0/dx1 and dx0/dx2 in 1e18 precision; multiply by price_scale for real prices"""
+    _require(10**17 - 1 < D < 10**15 * 10**18 + 1, "unsafe D values")
+    A, gamma = A_gamma
+
+    # K0 = P * N**N / D**N, in 10**36 precision
+    K0 = 27 * xp[0] * xp[1] // D * xp[2] // D * 10**36 // D
+
+    GK0 = (2 * K0 * K0 // 10**36 * K0 // 10**36
+           + (gamma + 10**18)**2
+           - K0**2 // 10**36 * (2 * gamma + 3 * 10**18) // 10**18)
+
+    # NNAG2 = N**N * A * gamma**2
+    NNAG2 = A * gamma**2 // A_MULTIPLIER
+
+    denominator = GK0 + NNAG2 * xp[0] // D * K0 // 10**36
+    return [
+        xp[0] * (GK0 + NNAG2 * xp[k] // D * K0 // 10**36) // xp[k] * 10**18 // denominator
+        for k in (1, 2)
+    ]
+
+# ------------------------------ Twocrypto-NG ---------------------------------
+
+def newton_y2(ANN: int, gamma: int, x: Sequence[int], D: int, i: int) -> int:
+    """Calculate x[i] from the other balance and D with Newton's method"""
+    x_j = x[1 - i]
+    y = D**2 // (x_j * 2**2)
+    K0_i = (10**18 * 2) * x_j // D
+    _require(10**16 * 2 - 1 < K0_i < 10**20 * 2 + 1, "unsafe values x[i]")
+
+    convergence_limit = max(max(x_j // 10**14, D // 10**14), 100)
+
+    for _ in range(255):
+        y_prev = y
+
+        K0 = K0_i * y * 2 // D
+        S = x_j + y
+
+        _g1k0 = gamma + 10**18
+        _g1k0 = _g1k0 - K0 + 1 if _g1k0 > K0 else K0 - _g1k0 + 1
+
+        mul1 = 10**18 * D // gamma * _g1k0 // gamma * _g1k0 * A_MULTIPLIER // ANN
+        mul2 = 10**18 + (2 * 10**18) * K0 // _g1k0
+
+        yfprime = 10**18 * y + S * mul2 + mul1
+        _dyfprime = D * mul2
+        if yfprime < _dyfprime:
+            y = y_prev // 2
+            continue
+        yfprime -= _dyfprime
+        fprime = yfprime // y
+
+        y_minus = mul1 // fprime
+        y_plus = (yfprime + 10**18 * D) // fprime + y_minus * 10**18 // K0
+        y_minus += 10**18 * S // fprime
+
+        y = y_prev // 2 if y_plus < y_minus else y_plus - y_minus
+
+        if abs(y - y_prev) < max(convergence_limit, y // 10**14):
+            return y
+
+    raise ArithmeticError("Did not converge")
+
+def get_y2(ANN: int, gamma: int, x: Sequence[int], D: int, i: int) -> List[int]:
+    """
+    Calculate x[i] given the other balance and D with the analytical cubic
+    solution, falling back to newton_y2. Returns [y, K0].
+    """
+    _require(MIN_A_2 - 1 < ANN < MAX_A_2 + 1, "unsafe values A")
+    _require(MIN_GAMMA - 1 < gamma < MAX_GAMMA_2 + 1, "unsafe values gamma")
+    _require(10**17 - 1 < D < 10**15 * 10**18 + 1, "unsafe values D")
+
+    x_j = x[1 - i]
+    gamma2 = gamma * gamma
+
+    K0_i = 10**18 * 2 * x_j // D
+    _require(10**16 * 2 - 1 < K0_i < 10**20 * 2 + 1, "unsafe values x[i]")
+
+    ann_gamma2 = ANN * gamma2
+
+    # a = 10**36 / N_COINS**2
+    a = 10**32
+
+    # b = ANN*D*gamma2/4/10000/x_j/10**4 - 10**32*3 - 2*gamma*10**14
+    b = D * ann_gamma2 // 400000000 // x_j - 10**32 * 3 - 2 * gamma * 10**14
+
+    # c = 10**32*3 + 4*gamma*10**14 + gamma2/10**4 + 4*ANN*gamma2*x_j/D/10000/4/10**4 - 4*ANN*gamma2/10000/4/10**4
+    c = (10**32 * 3 + 4 * gamma * 10**14 + gamma2 // 10**4
+         + 4 * ann_gamma2 // 400000000 * x_j // D
+         - 4 * ann_gamma2 // 400000000)
+
+    # d = -(10**18+gamma)**2 / 10**4
+    d = -((10**18 + gamma)**2 // 10**4)
+
+    delta0 = _sdiv(3 * a * c, b) - b
+    delta1 = 3 * delta0 + b - _sdiv(_sdiv(27 * a**2, b) * d, b)
+
+    divider = 1
+    threshold = min(min(abs(delta0), abs(delta1)), a)
+    for limit, value in ((10**48, 10**30), (10**46, 10**28), (10**44, 10**26), (10**42, 10**24),
+                         (10**40, 10**22), (10**38, 10**20), (10**36, 10**18), (10**34, 10**16),
+                         (10**32, 10**14), (10**30, 10**12), (10**28, 10**10), (10**26, 10**8),
+                         (10**24, 10**6), (10**20, 10**2)):
+        if threshold > limit:
+            divider = value
+            break
+
+    a = _sdiv(a, divider)
+    b = _sdiv(b, divider)
+    c = _sdiv(c, divider)
+    d = _sdiv(d, divider)
+
+    delta0 = _sdiv(3 * a * c, b) - b
+    delta1 = 3 * delta0 + b - _sdiv(_sdiv(27 * a**2, b) * d, b)
+
+    sqrt_arg = delta1**2 + _sdiv(4 * delta0**2, b) * delta0
+    if sqrt_arg <= 0:
+        return [newton_y2(ANN, gamma, x, D, i), 0]
+    sqrt_val = isqrt(sqrt_arg)
+
+    b_cbrt = cbrt(b) if b > 0 else -cbrt(-b)
+
+    if delta1 > 0:
+        second_cbrt = cbrt((delta1 + sqrt_val) // 2)
+    else:
+        second_cbrt = -cbrt((sqrt_val - delta1) // 2)
+
+    C1 = _sdiv(_sdiv(b_cbrt**2, 10**18) * second_cbrt, 10**18)
+
+    # (10**18*C1 - 10**18*b - 10**18*b*delta0/C1)/(3*a)
+    root = _sdiv(10**18 * C1 - 10**18 * b - _sdiv(10**18 * b, C1) * delta0, 3 * a)
+
+    y = _sdiv(_sdiv(_sdiv(D**2, x_j) * root, 4), 10**18)
+    _require(y >= 0 and root >= 0, "unsafe value for y")
+    frac = y * 10**18 // D
+    _require(10**16 - 1 <= frac < 10**20 + 1, "unsafe value for y")
+    return [y, root]
+
+def newton_D2(ANN: int, gamma: int, x_unsorted: Sequence[int], K0_prev: int = 0) -> int:
+    """Invariant D by Newton's method, starting from the constant-product D"""
+    _require(MIN_A_2 - 1 < ANN < MAX_A_2 + 1, "unsafe values A")
+    _require(MIN_GAMMA - 1 < gamma < MAX_GAMMA_2 + 1, "unsafe values gamma")
+
+    x = list(x_unsorted)
+    if x[0] < x[1]:
+        x = [x_unsorted[1], x_unsorted[0]]
+
+    _require(10**9 - 1 < x[0] < 10**15 * 10**18 + 1, "unsafe values x[0]")
+    _require(x[1] * 10**18 // x[0] > 10**14 - 1, "unsafe values x[i] (input)")
+
+    S = x[0] + x[1]
+    if K0_prev == 0:
+        D = 2 * isqrt(x[0] * x[1])
+    else:
+        D = isqrt(4 * x[0] * x[1] // K0_prev * 10**18)
+        if S < D:
+            D = S
+
+    __g1k0 = gamma + 10**18
+
+    for _ in range(255):
+        D_prev = D
+        _require(D > 0, "D is zero")
+
+        K0 = (10**18 * 2**2) * x[0] // D * x[1] // D
+
+        _g1k0 = __g1k0 - K0 + 1 if __g1k0 > K0 else K0 - __g1k0 + 1
+
+        mul1 = 10**18 * D // gamma * _g1k0 // gamma * _g1k0 * A_MULTIPLIER // ANN
+        mul2 = ((2 * 10**18) * 2) * K0 // _g1k0
+
+        neg_fprime = (S + S * mul2 // 10**18) + mul1 * 2 // K0 - mul2 * D // 10**18
+
+        D_plus = D * (neg_fprime + S) // neg_fprime
+        D_minus = D * D // neg_fprime
+        if 10**18 > K0:
+            D_minus += D * (mul1 // neg_fprime) // 10**18 * (10**18 - K0) // K0
+        else:
+            D_minus -= D * (mul1 // neg_fprime) // 10**18 * (K0 - 10**18) // K0
+
+        D = D_plus - D_minus if D_plus > D_minus else (D_minus - D_plus) // 2
+
+        if abs(D - D_prev) * 10**14 < max(10**16, D):
+            for _x in x:
+                frac = _x * 10**18 // D
+                _require(10**16 - 1 <= frac < 10**20 + 1, "unsafe values x[i]")
+            return D
+
+    raise ArithmeticError("Did not converge")
+
+def get_p2(xp: Sequence[int], D: int, A_gamma: Sequence[int]) -> int:
+    """dx0/dx1 in 1e18 precision; multiply by price_scale for the real price"""
+    _require(10**17 - 1 < D < 10**15 * 10**18 + 1, "unsafe D values")
+    A, gamma = A_gamma
+
+    # K0 = P * N**N / D**N, in 10**36 precision
+    K0 = 4 * xp[0] * xp[1] // D * 10**36 // D
+
+    GK0 = (2 * K0 * K0 // 10**36 * K0 // 10**36
+           + (gamma + 10**18)**2
+           - K0**2 // 10**36 * (2 * gamma + 3 * 10**18) // 10**18)
+
+    NNAG2 = A * gamma**2 // A_MULTIPLIER
+    denominator = GK0 + NNAG2 * xp[0] // D * K0 // 10**36
+    return xp[0] * (GK0 + NNAG2 * xp[1] // D * K0 // 10**36) // xp[1] * 10**18 // denominator
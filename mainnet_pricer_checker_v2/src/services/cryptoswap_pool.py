@@ -0,0 +1,238 @@
+from web3 import Web3
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import json
+
+from pricer_core.multicall import Call, Multicall, MULTICALL3_ADDRESS
+from services import cryptoswap_math as math
+
+PRECISION = 10**18
+
+@dataclass
+class CryptoSwapPool:
+    """
+    Local copy of everything CurveCryptoViews{2,3}Optimized reads for a swap
+    quote on a Twocrypto-NG or Tricrypto-NG pool. get_dy/get_dx replay the
+    Views contract with the ported math, so they match the pool's own
+    get_dy/get_dx at block_number.
+    """
+    address: str
+    balances: List[int]
+    precisions: List[int]
+    price_scale: List[int]  # coin k+1 priced in coin 0, 1e18
+    D: int
+    A: int
+    gamma: int
+    mid_fee: int
+    out_fee: int
+    fee_gamma: int
+    future_A_gamma_time: int
+    timestamp: int  # block timestamp, D is recomputed while A/gamma are ramping
+    block_number: int
+
+    @property
+    def n_coins(self) -> int:
+        return len(self.balances)
+
+    def _newton_D(self, xp: List[int]) -> int:
+        return (math.newton_D3 if self.n_coins == 3 else math.newton_D2)(self.A, self.gamma, xp, 0)
+
+    def _get_y(self, xp: List[int], D: int, i: int) -> List[int]:
+        return (math.get_y3 if self.n_coins == 3 else math.get_y2)(self.A, self.gamma, xp, D, i)
+
+    def xp(self, balances: List[int]) -> List[int]:
+        """Balances in 18 decimals, priced in coin 0"""
+        xp = [balances[0] * self.precisions[0]]
+        for k in range(self.n_coins - 1):
+            xp.append(balances[k + 1] * self.price_scale[k] * self.precisions[k + 1] // PRECISION)
+        return xp
+
+    def current_D(self) -> int:
+        """Stored D, or a fresh newton_D while A/gamma are ramping (Views._calc_D_ramp)"""
+        if self.future_A_gamma_time > self.timestamp:
+            return self._newton_D(self.xp(self.balances))
+        return self.D
+
+    def fee_calc(self, xp: List[int]) -> int:
+        """Pool fee for a post-trade xp, 1e10 precision"""
+        if self.n_coins == 3:
+            f = math.reduction_coefficient3(xp, self.fee_gamma)
+        else:
+            f = math.reduction_coefficient2(xp, self.fee_gamma)
+        return math.fee_from_params(f, self.mid_fee, self.out_fee)
+
+    def _check_indices(self, i: int, j: int):
+        if i == j or not 0 <= i < self.n_coins or not 0 <= j < self.n_coins:
+            raise ValueError("coin index out of range")
+
+    def _get_dy_nofee(self, i: int, j: int, dx: int):
+        self._check_indices(i, j)
+        if dx <= 0:
+            raise ValueError("do not exchange 0 coins")
+
+        D = self.current_D()
+        balances = list(self.balances)
+        balances[i] += dx
+        xp = self.xp(balances)
+
+        y = self._get_y(xp, D, j)[0]
+        dy = xp[j] - y - 1
+        if dy < 0:
+            raise ValueError("uint256 underflow")
+        xp[j] = y
+        if j > 0:
+            dy = dy * PRECISION // self.price_scale[j - 1]
+        dy //= self.precisions[j]
+        return dy, xp
+
+    def _get_dx_fee(self, i: int, j: int, dy: int):
+        self._check_indices(i, j)
+        if dy <= 0:
+            raise ValueError("do not exchange out 0 coins")
+
+        D = self.current_D()
+        balances = list(self.balances)
+        balances[j] -= dy
+        xp = self.xp(balances)
+
+        x = self._get_y(xp, D, i)[0]
+        dx = x - xp[i]
+        xp[i] = x
+        if i > 0:
+            dx = dx * PRECISION // self.price_scale[i - 1]
+        dx //= self.precisions[i]
+        return dx, xp
+
+    def get_dy(self, i: int, j: int, dx: int) -> int:
+        """Output of coin j for dx of coin i, after the dynamic fee"""
+        dy, xp = self._get_dy_nofee(i, j, dx)
+        return dy - self.fee_calc(xp) * dy // 10**10
+
+    def get_dx(self, i: int, j: int, dy: int) -> int:
+        """Input of coin i for dy of coin j; approximate like the Views contract (5 passes)"""
+        dx, _dy = 0, dy
+        for _ in range(5):
+            dx, xp = self._get_dx_fee(i, j, _dy)
+            _dy = dy + self.fee_calc(xp) * _dy // 10**10 + 1
+        return dx
+
+    def last_prices(self) -> List[int]:
+        """Marginal price of each coin k > 0 in coin 0 at the current state, 1e18 precision"""
+        xp = self.xp(self.balances)
+        D = self.current_D()
+        if self.n_coins == 3:
+            p = math.get_p3(xp, D, [self.A, self.gamma])
+        else:
+            p = [math.get_p2(xp, D, [self.A, self.gamma])]
+        return [p[k] * self.price_scale[k] // PRECISION for k in range(self.n_coins - 1)]
+
+    def spot_price(self, i: int, j: int) -> float:
+        """Marginal price of coin i in units of coin j, before fees"""
+        prices = [PRECISION] + self.last_prices()
+        return prices[i] / prices[j]
+
+    def apply_balances(self, deltas: List[int], block_number: int, packed_price_scale: Optional[int] = None,
+                       timestamp: Optional[int] = None):
+        """
+        Move to the state after an exchange or liquidity event: balances
+        change by deltas (native units), price_scale comes from the event's
+        packed_price_scale when it has one and D is recomputed with newton_D.
+        The pool's own D can differ from that by a few wei (it starts Newton
+        from the previous K0), far below the precision prices are read at.
+        """
+        self.balances = [balance + delta for balance, delta in zip(self.balances, deltas)]
+        if packed_price_scale is not None:
+            self.price_scale = unpack_prices(packed_price_scale, self.n_coins)
+        if timestamp is not None:
+            self.timestamp = timestamp
+        self.D = self._newton_D(self.xp(self.balances))
+        self.block_number = block_number
+
+    def to_dict(self) -> Dict:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CryptoSwapPool':
+        return cls(**data)
+
+def unpack_prices(packed: int, n_coins: int) -> List[int]:
+    """price_scale from an event: one uint256 on 2-coin pools, two 128-bit halves on 3-coin pools"""
+    if n_coins == 2:
+        return [packed]
+    mask = (1 << 128) - 1
+    return [(packed >> (128 * k)) & mask for k in range(n_coins - 1)]
+
+def state_calls(pool: str, n_coins: int) -> List[Call]:
+    """The reads needed to hydrate one pool, keyed by (pool, getter)"""
+    calls = [Call(pool, "balances(uint256)", (k,), key=(pool, 'balances', k)) for k in range(n_coins)]
+    if n_coins == 3:
+        calls += [Call(pool, "price_scale(uint256)", (k,), key=(pool, 'price_scale', k)) for k in range(2)]
+    else:
+        calls.append(Call(pool, "price_scale()", key=(pool, 'price_scale', 0)))
+    calls += [
+        Call(pool, "precisions()", output_types=(f'uint256[{n_coins}]',), key=(pool, 'precisions')),
+        Call(pool, "D()", key=(pool, 'D')),
+        Call(pool, "A()", key=(pool, 'A')),
+        Call(pool, "gamma()", key=(pool, 'gamma')),
+        Call(pool, "mid_fee()", key=(pool, 'mid_fee')),
+        Call(pool, "out_fee()", key=(pool, 'out_fee')),
+        Call(pool, "fee_gamma()", key=(pool, 'fee_gamma')),
+        Call(pool, "future_A_gamma_time()", key=(pool, 'future_A_gamma_time')),
+    ]
+    return calls
+
+def load_pools(multicall: Multicall, pools: Dict[str, int], block_identifier=None) -> Dict[str, CryptoSwapPool]:
+    """
+    Hydrate several Twocrypto-NG/Tricrypto-NG pools at one block in a single
+    multicall round. pools maps pool address -> number of coins (2 or 3).
+    """
+    block_number = multicall.resolve_block(block_identifier)
+
+    calls = [Call(MULTICALL3_ADDRESS, "getCurrentBlockTimestamp()", key='timestamp')]
+    for pool, n_coins in pools.items():
+        calls += state_calls(pool, n_coins)
+    state = multicall.aggregate(calls, block_number)
+
+    loaded = {}
+    for pool, n_coins in pools.items():
+        pool_calls = state_calls(pool, n_coins)
+        if state.get('timestamp') is None or any(state.get(call.key) is None for call in pool_calls):
+            print(f"Error loading state for pool {pool} at block {block_number}")
+            continue
+        loaded[pool] = CryptoSwapPool(
+            address=Web3.to_checksum_address(pool),
+            balances=[state.get((pool, 'balances', k)) for k in range(n_coins)],
+            precisions=list(state.get((pool, 'precisions'))),
+            price_scale=[state.get((pool, 'price_scale', k)) for k in range(n_coins - 1)],
+            D=state.get((pool, 'D')),
+            A=state.get((pool, 'A')),
+            gamma=state.get((pool, 'gamma')),
+            mid_fee=state.get((pool, 'mid_fee')),
+            out_fee=state.get((pool, 'out_fee')),
+            fee_gamma=state.get((pool, 'fee_gamma')),
+            future_A_gamma_time=state.get((pool, 'future_A_gamma_time')),
+            timestamp=state.get('timestamp'),
+            block_number=block_number
+        )
+    return loaded
+
+def record_fixture(path: str, pool: CryptoSwapPool, quotes: List[Dict]):
+    """
+    Save a pool state with on-chain get_dy results from the same block,
+    e.g. [{'i': 0, 'j': 2, 'dx': ..., 'dy': ...}], for offline validation.
+    """
+    with open(path, 'w') as f:
+        json.dump({'pool': pool.to_dict(), 'quotes': quotes}, f, indent=2)
+
+def check_fixture(path: str) -> List[Dict]:
+    """Re-run every recorded quote against the local model; returns the mismatches"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    pool = CryptoSwapPool.from_dict(data['pool'])
+
+    mismatches = []
+    for quote in data['quotes']:
+        local = pool.get_dy(quote['i'], quote['j'], int(quote['dx']))
+        if local != int(quote['dy']):
+            mismatches.append({**quote, 'local': local})
+    return mismatches
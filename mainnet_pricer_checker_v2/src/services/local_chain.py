@@ -0,0 +1,130 @@
+from web3 import Web3
+from web3.providers.base import BaseProvider
+from web3.providers.async_base import AsyncBaseProvider
+import asyncio
+from eth_abi import encode, decode
+import json
+import requests
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from pricer_core.multicall import MULTICALL3_ADDRESS, AGGREGATE3_SELECTOR
+
+class LocalChainProvider(BaseProvider):
+    """
+    In-process stand-in for an RPC node so batching and pricing code can run
+    without a network. Contract reads are answered either by Python handlers
+    registered per (address, signature) or by recorded (to, calldata) -> returndata
+    pairs. Multicall3.aggregate3 is emulated on top of the same lookups.
+    eth_calls at a block in failing_blocks raise a connection error, like a
+    node dropping the request.
+    """
+    def __init__(self, block_number: int = 1, chain_id: int = 1):
+        super().__init__()
+        self.block_number = block_number
+        self.chain_id = chain_id
+        self.handlers: Dict[Tuple[str, bytes], Tuple[Callable, List[str], List[str]]] = {}
+        self.recorded: Dict[Tuple[str, str], str] = {}
+        self.requests: List[Tuple[str, Any]] = []  # every RPC seen, for round-trip counting
+        self.failing_blocks: Set[int] = set()
+
+    def register(self, address: str, signature: str, output_types: List[str], handler: Callable):
+        """handler(block_number, *args) returns the (tuple of) values to encode"""
+        inner = signature[signature.index('(') + 1:-1]
+        input_types = [t for t in inner.split(',') if t]
+        selector = bytes(Web3.keccak(text=signature)[:4])
+        self.handlers[(address.lower(), selector)] = (handler, input_types, list(output_types))
+
+    def load_recording(self, path: str):
+        """Load recorded responses: {"block_number": n, "calls": [{"to", "data", "result"}]}"""
+        with open(path, 'r') as f:
+            data = json.load(f)
+        self.block_number = data.get('block_number', self.block_number)
+        for call in data['calls']:
+            self.recorded[(call['to'].lower(), call['data'].lower())] = call['result']
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+    def make_request(self, method, params):
+        self.requests.append((method, params))
+        if method == 'eth_call' and params[1] in {hex(block) for block in self.failing_blocks}:
+            raise requests.ConnectionError(f"connection dropped calling at block {int(params[1], 16)}")
+        try:
+            if method == 'eth_blockNumber':
+                return {'jsonrpc': '2.0', 'id': 1, 'result': hex(self.block_number)}
+            if method == 'eth_chainId':
+                return {'jsonrpc': '2.0', 'id': 1, 'result': hex(self.chain_id)}
+            if method == 'eth_call':
+                tx, block = params[0], params[1]
+                block_number = int(block, 16) if isinstance(block, str) and block.startswith('0x') else self.block_number
+                data = bytes.fromhex(tx['data'][2:]) if isinstance(tx['data'], str) else bytes(tx['data'])
+                result = self._call(tx['to'], data, block_number)
+                return {'jsonrpc': '2.0', 'id': 1, 'result': '0x' + result.hex()}
+        except Exception as e:
+            return {'jsonrpc': '2.0', 'id': 1, 'error': {'code': 3, 'message': f"execution reverted: {e}"}}
+        return {'jsonrpc': '2.0', 'id': 1, 'error': {'code': -32601, 'message': f"{method} not supported"}}
+
+    def _call(self, to: str, data: bytes, block_number: int) -> bytes:
+        if to.lower() == MULTICALL3_ADDRESS.lower() and data[:4] == AGGREGATE3_SELECTOR:
+            calls = decode(['(address,bool,bytes)[]'], data[4:])[0]
+            results = []
+            for target, allow_failure, call_data in calls:
+                try:
+                    results.append((True, self._call(target, call_data, block_number)))
+                except Exception:
+                    if not allow_failure:
+                        raise
+                    results.append((False, b''))
+            return encode(['(bool,bytes)[]'], [results])
+
+        recorded = self.recorded.get((to.lower(), '0x' + data.hex()))
+        if recorded is not None:
+            return bytes.fromhex(recorded[2:])
+
+        entry = self.handlers.get((to.lower(), bytes(data[:4])))
+        if entry is None:
+            raise ValueError(f"no handler for {to} selector 0x{data[:4].hex()}")
+        handler, input_types, output_types = entry
+        args = decode(input_types, data[4:]) if input_types else ()
+        values = handler(block_number, *args)
+        if not isinstance(values, (tuple, list)):
+            values = (values,)
+        return encode(output_types, list(values))
+
+    def rpc_count(self, method: str = None) -> int:
+        return sum(1 for m, _ in self.requests if method is None or m == method)
+
+class AsyncLocalChainProvider(AsyncBaseProvider):
+    """AsyncWeb3 front for a LocalChainProvider, with optional per-request latency"""
+    def __init__(self, chain: LocalChainProvider, latency: float = 0.0):
+        super().__init__()
+        self.chain = chain
+        self.latency = latency
+
+    async def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
+
+    async def make_request(self, method, params):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.chain.make_request(method, params)
+
+class FakeHeadFeed:
+    """
+    Scripted head feed for the block scheduler: yields start_block,
+    start_block + 1, ... every block_time seconds. If a chain is given its
+    block_number follows the feed so eth_blockNumber/eth_call agree with it.
+    """
+    def __init__(self, start_block: int, count: int, block_time: float = 0.0,
+                 chain: LocalChainProvider = None):
+        self.start_block = start_block
+        self.count = count
+        self.block_time = block_time
+        self.chain = chain
+
+    async def __aiter__(self):
+        for block in range(self.start_block, self.start_block + self.count):
+            if self.chain is not None:
+                self.chain.block_number = block
+            yield block
+            await asyncio.sleep(self.block_time)
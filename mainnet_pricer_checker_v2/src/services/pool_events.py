@@ -0,0 +1,290 @@
+from web3 import Web3
+from eth_abi import decode
+from dataclasses import asdict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import json
+
+from pricer_core.pool_metadata import PoolMetadata, PoolMetadataStore
+from services.uniswap_v3_pool import UniswapV3Pool
+from services.cryptoswap_pool import CryptoSwapPool
+
+def _topic(signature: str) -> str:
+    return '0x' + Web3.keccak(text=signature).hex().removeprefix('0x')
+
+# Uniswap V3 pool events that change swap state
+UNISWAP_SWAP = _topic("Swap(address,address,int256,int256,uint160,uint128,int24)")
+UNISWAP_MINT = _topic("Mint(address,address,int24,int24,uint128,uint256,uint256)")
+UNISWAP_BURN = _topic("Burn(address,int24,int24,uint128,uint256,uint256)")
+UNISWAP_TOPICS = [UNISWAP_SWAP, UNISWAP_MINT, UNISWAP_BURN]
+
+def curve_topics(n_coins: int) -> Dict[str, str]:
+    """Tricrypto-NG/Twocrypto-NG events that change balances, by name"""
+    amounts = f"uint256[{n_coins}]"
+    return {
+        'TokenExchange': _topic("TokenExchange(address,uint256,uint256,uint256,uint256,uint256,uint256)"),
+        'AddLiquidity': _topic(f"AddLiquidity(address,{amounts},uint256,uint256,uint256)"),
+        'RemoveLiquidity': _topic(f"RemoveLiquidity(address,{amounts},uint256)"),
+        'RemoveLiquidityOne': _topic("RemoveLiquidityOne(address,uint256,uint256,uint256,uint256,uint256)"),
+        'ClaimAdminFee': _topic(f"ClaimAdminFee(address,{amounts})"),
+    }
+
+# Curve events whose effect isn't in the log (the WETH pools' admin fee claim
+# gulps token balances, ramps and new parameters change A/gamma/fees): the
+# pool has to be read again at that block
+CURVE_RESYNC_TOPICS = {
+    _topic("ClaimAdminFee(address,uint256)"),
+    _topic("RampAgamma(uint256,uint256,uint256,uint256,uint256,uint256)"),
+    _topic("StopRampA(uint256,uint256,uint256)"),
+    _topic("NewParameters(uint256,uint256,uint256,uint256,uint256,uint256)"),
+}
+
+def normalize_log(log) -> Dict:
+    """A web3 log (or recorded one) as plain JSON: hex strings and ints"""
+    def to_hex(value) -> str:
+        if isinstance(value, str):
+            return value.lower() if value.startswith('0x') else '0x' + value.lower()
+        return '0x' + bytes(value).hex()
+
+    return {
+        'address': Web3.to_checksum_address(log['address']),
+        'topics': [to_hex(topic) for topic in log['topics']],
+        'data': to_hex(log['data']),
+        'blockNumber': int(log['blockNumber']),
+        'logIndex': int(log['logIndex']),
+        'blockTimestamp': int(log['blockTimestamp'], 16) if isinstance(log.get('blockTimestamp'), str)
+                          else log.get('blockTimestamp'),
+    }
+
+def _data(log: Dict, types: List[str]) -> Tuple:
+    return decode(types, bytes.fromhex(log['data'][2:]))
+
+def _indexed_int24(topic: str) -> int:
+    return decode(['int24'], bytes.fromhex(topic[2:]))[0]
+
+def apply_uniswap_log(pool: UniswapV3Pool, log: Dict):
+    topic0, block_number = log['topics'][0], log['blockNumber']
+    if topic0 == UNISWAP_SWAP:
+        _, _, sqrt_price_x96, liquidity, tick = _data(log, ['int256', 'int256', 'uint160', 'uint128', 'int24'])
+        pool.apply_swap(sqrt_price_x96, liquidity, tick, block_number)
+    elif topic0 == UNISWAP_MINT:
+        _, amount, _, _ = _data(log, ['address', 'uint128', 'uint256', 'uint256'])
+        pool.apply_position(_indexed_int24(log['topics'][2]), _indexed_int24(log['topics'][3]), amount, block_number)
+    elif topic0 == UNISWAP_BURN:
+        amount, _, _ = _data(log, ['uint128', 'uint256', 'uint256'])
+        if amount:  # zero-amount burns only poke fees
+            pool.apply_position(_indexed_int24(log['topics'][2]), _indexed_int24(log['topics'][3]), -amount, block_number)
+
+def apply_curve_log(pool: CryptoSwapPool, log: Dict) -> bool:
+    """Apply one event to the local model; False when the pool must be reloaded instead"""
+    if log['topics'][0] in CURVE_RESYNC_TOPICS:
+        return False
+    n = pool.n_coins
+    topics = curve_topics(n)
+    topic0, block_number, timestamp = log['topics'][0], log['blockNumber'], log.get('blockTimestamp')
+    deltas = [0] * n
+    if topic0 == topics['TokenExchange']:
+        sold_id, tokens_sold, bought_id, tokens_bought, _, packed = _data(log, ['uint256'] * 6)
+        deltas[sold_id] += tokens_sold
+        deltas[bought_id] -= tokens_bought  # already net of the fee, which stays in the pool
+        pool.apply_balances(deltas, block_number, packed, timestamp)
+    elif topic0 == topics['AddLiquidity']:
+        amounts, _, _, packed = _data(log, [f'uint256[{n}]', 'uint256', 'uint256', 'uint256'])
+        pool.apply_balances(list(amounts), block_number, packed, timestamp)
+    elif topic0 == topics['RemoveLiquidity']:
+        amounts, _ = _data(log, [f'uint256[{n}]', 'uint256'])
+        pool.apply_balances([-a for a in amounts], block_number, None, timestamp)
+    elif topic0 == topics['RemoveLiquidityOne']:
+        _, coin_index, coin_amount, _, packed = _data(log, ['uint256'] * 5)
+        deltas[coin_index] -= coin_amount
+        pool.apply_balances(deltas, block_number, packed, timestamp)
+    elif topic0 == topics['ClaimAdminFee']:
+        (amounts,) = _data(log, [f'uint256[{n}]'])
+        pool.apply_balances([-a for a in amounts], block_number, None, timestamp)
+    return True
+
+# How providers reject an eth_getLogs page for being too big: -32005 "query returned more than 10000
+# results" (Infura, Geth), Alchemy's "Log response size exceeded", "block range is too wide" and the like
+LOG_LIMIT_CODES = {-32005}
+LOG_LIMIT_MESSAGES = ('more than', 'max results', 'response size', 'block range', 'range is too', 'limit exceeded')
+
+def is_log_limit_error(error: Exception) -> bool:
+    """True when a getLogs error means the page was too big, as opposed to a failed or throttled request"""
+    response = getattr(error, 'rpc_response', None) or {}
+    if (response.get('error') or {}).get('code') in LOG_LIMIT_CODES:
+        return True
+    message = str(error).lower()
+    return any(phrase in message for phrase in LOG_LIMIT_MESSAGES)
+
+class RpcLogSource:
+    """
+    eth_getLogs in pages of at most max_blocks, halving a page whenever the
+    provider rejects it for returning too many results. Any other error is
+    raised rather than retried as smaller pages.
+    """
+    def __init__(self, w3: Web3, max_blocks: int = 2000):
+        self.w3 = w3
+        self.max_blocks = max_blocks
+        self.requests = 0
+
+    def get_logs(self, addresses: Sequence[str], topics: Sequence[str], from_block: int, to_block: int) -> List[Dict]:
+        logs = []
+        start = from_block
+        while start <= to_block:
+            end = min(to_block, start + self.max_blocks - 1)
+            logs += self._get_range(addresses, topics, start, end)
+            start = end + 1
+        return logs
+
+    def _get_range(self, addresses: Sequence[str], topics: Sequence[str], from_block: int, to_block: int) -> List[Dict]:
+        try:
+            self.requests += 1
+            return [normalize_log(log) for log in self.w3.eth.get_logs({
+                'address': list(addresses), 'topics': [list(topics)],
+                'fromBlock': from_block, 'toBlock': to_block
+            })]
+        except Exception as e:
+            if from_block == to_block or not is_log_limit_error(e):
+                raise
+            print(f"Error getting logs for blocks {from_block}-{to_block}, splitting the range: {str(e)}")
+            mid = (from_block + to_block) // 2
+            return (self._get_range(addresses, topics, from_block, mid) +
+                    self._get_range(addresses, topics, mid + 1, to_block))
+
+class FixtureLogSource:
+    """Serves recorded logs with the same filtering as eth_getLogs, for offline runs"""
+    def __init__(self, logs: List[Dict]):
+        self.logs = logs
+        self.requests = 0
+
+    def get_logs(self, addresses: Sequence[str], topics: Sequence[str], from_block: int, to_block: int) -> List[Dict]:
+        self.requests += 1
+        addresses = {Web3.to_checksum_address(a) for a in addresses}
+        topics = set(topics)
+        return [log for log in self.logs
+                if log['address'] in addresses and log['topics'][0] in topics
+                and from_block <= log['blockNumber'] <= to_block]
+
+class PoolStateReplayer:
+    """
+    Rolls local pool models forward through their event logs, so any number
+    of blocks after the seed can be priced from one pass over the logs
+    instead of eth_calls per block. Models are mutated in place.
+    reload(address, block_number) re-reads a Curve pool after an event that
+    can't be replayed; without it such a pool is dropped from then on.
+    """
+    def __init__(self, uniswap_pools: Dict[str, UniswapV3Pool], curve_pools: Dict[str, CryptoSwapPool],
+                 block_number: int, source, page_blocks: int = 2000,
+                 reload: Optional[Callable[[str, int], Optional[CryptoSwapPool]]] = None):
+        self.uniswap_pools = uniswap_pools
+        self.curve_pools = curve_pools
+        self.block_number = block_number  # every log up to and including this block is applied
+        self.source = source  # anything with get_logs(addresses, topics, from_block, to_block)
+        self.page_blocks = page_blocks
+        self.reload = reload
+        self.applied = 0
+        self.reloads = 0
+        self._reloaded: Dict[str, int] = {}  # pool -> block its reloaded state already includes
+
+    def _topics(self) -> List[str]:
+        topics = list(UNISWAP_TOPICS)
+        for n_coins in {pool.n_coins for pool in self.curve_pools.values()}:
+            topics += curve_topics(n_coins).values()
+        if self.curve_pools:
+            topics += CURVE_RESYNC_TOPICS
+        return topics
+
+    def fetch_logs(self, from_block: int, to_block: int) -> List[Dict]:
+        addresses = list(self.uniswap_pools) + list(self.curve_pools)
+        if not addresses:
+            return []  # an empty address filter would match every contract
+        logs = self.source.get_logs(addresses, self._topics(), from_block, to_block)
+        return sorted(logs, key=lambda log: (log['blockNumber'], log['logIndex']))
+
+    def apply(self, log: Dict):
+        address = Web3.to_checksum_address(log['address'])
+        if self._reloaded.get(address, -1) >= log['blockNumber']:
+            return
+        if address in self.uniswap_pools:
+            apply_uniswap_log(self.uniswap_pools[address], log)
+        elif address in self.curve_pools and not apply_curve_log(self.curve_pools[address], log):
+            pool = self.reload(address, log['blockNumber']) if self.reload else None
+            if pool is None:
+                print(f"Error replaying pool {address}: can't apply event at block {log['blockNumber']}, dropping it")
+                del self.curve_pools[address]
+            else:
+                # Reads at a block see its end state, so the rest of this block's events are already in it
+                self.curve_pools[address] = pool
+                self._reloaded[address] = log['blockNumber']
+                self.reloads += 1
+        self.applied += 1
+
+    def states_at(self, blocks: Iterable[int]) -> Iterator[Tuple[int, Dict[str, UniswapV3Pool], Dict[str, CryptoSwapPool]]]:
+        """
+        (block, uniswap_pools, curve_pools) as of the end of each block, in
+        block order. The models are the replayer's own, so read or copy them
+        before advancing to the next block.
+        """
+        targets = sorted(b for b in set(blocks) if b >= self.block_number)
+        pending: List[Dict] = []
+        fetched_to = self.block_number
+        for target in targets:
+            # Pull logs a page at a time, never further than needed for the next target
+            while fetched_to < target:
+                page_end = min(target + self.page_blocks - 1, targets[-1])
+                pending += self.fetch_logs(fetched_to + 1, page_end)
+                fetched_to = page_end
+
+            applied = 0
+            for log in pending:
+                if log['blockNumber'] > target:
+                    break
+                self.apply(log)
+                applied += 1
+            pending = pending[applied:]
+            self.block_number = target
+            yield target, self.uniswap_pools, self.curve_pools
+
+def record_log_fixture(path: str, block_number: int, uniswap_pools: Dict[str, UniswapV3Pool],
+                       curve_pools: Dict[str, CryptoSwapPool], logs: List[Dict],
+                       metadata: Optional[PoolMetadataStore] = None, prices: Optional[Dict] = None):
+    """
+    Save seed states at block_number, the logs that follow them, the static
+    metadata pricing needs and optionally reference prices by block (e.g.
+    from eth_call) so a replay can be checked offline (historical_arb_graph.check_log_fixture)
+    """
+    pools = list(uniswap_pools) + list(curve_pools)
+    with open(path, 'w') as f:
+        json.dump({
+            'block_number': block_number,
+            'uniswap': {address: pool.to_dict() for address, pool in uniswap_pools.items()},
+            'curve': {address: pool.to_dict() for address, pool in curve_pools.items()},
+            'metadata': {p: asdict(metadata.get(p)) for p in pools if metadata and metadata.get(p)},
+            'logs': logs,
+            'prices': {str(block): value for block, value in (prices or {}).items()}
+        }, f, indent=2)
+
+def read_log_fixture(path: str, metadata: Optional[PoolMetadataStore] = None) -> Dict:
+    """A recorded fixture as saved, with its pool metadata added to the metadata store when one is given"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if metadata:
+        for address, entry in data.get('metadata', {}).items():
+            metadata.pools.setdefault(address, PoolMetadata(**entry))
+    return data
+
+def fixture_replayer(data: Dict, source=None) -> PoolStateReplayer:
+    """A replayer at a fixture's seed block with fresh pool models, over its logs unless another source is given"""
+    return PoolStateReplayer(
+        {address: UniswapV3Pool.from_dict(pool) for address, pool in data['uniswap'].items()},
+        {address: CryptoSwapPool.from_dict(pool) for address, pool in data['curve'].items()},
+        data['block_number'],
+        source or FixtureLogSource(data['logs'])
+    )
+
+def load_log_fixture(path: str, metadata: Optional[PoolMetadataStore] = None) -> Tuple[PoolStateReplayer, Dict[int, Dict]]:
+    """
+    A replayer over a recorded fixture and its reference prices by block.
+    Recorded pool metadata is added to the metadata store when one is given.
+    """
+    data = read_log_fixture(path, metadata)
+    return fixture_replayer(data), {int(block): value for block, value in data.get('prices', {}).items()}
@@ -0,0 +1,127 @@
+import numpy as np
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 1/phi, the interval shrink factor of golden-section search
+INV_PHI = (np.sqrt(5) - 1) / 2
+
+class SampledCurve:
+    """
+    Output-amount curve of one venue direction built from a few quotes at one
+    block. The effective rate out/in is interpolated against log(amount in),
+    which is close to linear for AMM price impact, and the curve is only
+    defined up to the largest sampled size.
+    """
+    def __init__(self, amounts_in: Sequence[float], amounts_out: Sequence[Optional[float]]):
+        points = sorted((a, b) for a, b in zip(amounts_in, amounts_out) if a > 0 and b)
+        self.amounts_in = np.array([a for a, _ in points], dtype=float)
+        self.rates = np.array([b / a for a, b in points], dtype=float)
+
+    @property
+    def max_in(self) -> float:
+        return float(self.amounts_in[-1]) if len(self.amounts_in) else 0.0
+
+    def __call__(self, amount_in: float) -> float:
+        if amount_in <= 0 or not len(self.amounts_in):
+            return 0.0
+        if amount_in > self.max_in:
+            return float('nan')
+        rate = np.interp(np.log(amount_in), np.log(self.amounts_in), self.rates)
+        return float(amount_in * rate)
+
+class SimulatorCurve:
+    """Output-amount curve backed by an exact local simulator, e.g. UniswapV3Pool or CryptoSwapPool"""
+    def __init__(self, quote: Callable[[int], int], decimals_in: int, decimals_out: int, max_in: float):
+        self.quote = quote  # raw amount in -> raw amount out
+        self.decimals_in = decimals_in
+        self.decimals_out = decimals_out
+        self.max_in = max_in
+
+    def __call__(self, amount_in: float) -> float:
+        if amount_in <= 0:
+            return 0.0
+        if amount_in > self.max_in:
+            return float('nan')
+        try:
+            return self.quote(int(amount_in * 10**self.decimals_in)) / 10**self.decimals_out
+        except Exception:
+            # Ran past loaded ticks or the pool's safe range: treat as not fillable
+            return float('nan')
+
+def golden_section_max(f: Callable[[float], float], lo: float, hi: float,
+                       tol: float = 1e-4, max_iter: int = 60) -> Tuple[float, float]:
+    """Maximize a unimodal f on [lo, hi]; returns (x, f(x)). tol is relative to hi"""
+    a, b = lo, hi
+    c, d = b - INV_PHI * (b - a), a + INV_PHI * (b - a)
+    fc, fd = f(c), f(d)
+    for _ in range(max_iter):
+        if b - a <= tol * hi:
+            break
+        if fc >= fd:
+            b, d, fd = d, c, fc
+            c = b - INV_PHI * (b - a)
+            fc = f(c)
+        else:
+            a, c, fc = c, d, fd
+            d = a + INV_PHI * (b - a)
+            fd = f(d)
+    return (c, fc) if fc >= fd else (d, fd)
+
+def max_feasible_input(buy, sell, iterations: int = 40) -> float:
+    """Largest quote-token input whose bought amount the sell curve can still price"""
+    hi = buy.max_in
+    if not np.isnan(buy(hi)) and buy(hi) <= sell.max_in:
+        return hi
+    lo = 0.0
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        out = buy(mid)
+        if np.isnan(out) or out > sell.max_in:
+            hi = mid
+        else:
+            lo = mid
+    return lo
+
+def optimal_trade(buy, sell, max_in: Optional[float] = None) -> Optional[Dict[str, float]]:
+    """
+    Profit-maximizing size for buying on one venue and selling on another.
+    buy maps quote in -> asset out, sell maps asset in -> quote out; profit
+    is sell(buy(x)) - x, which is concave for AMM curves.
+    """
+    hi = max_feasible_input(buy, sell)
+    if max_in is not None:
+        hi = min(hi, max_in)
+    if hi <= 0:
+        return None
+
+    def profit(x: float) -> float:
+        value = sell(buy(x)) - x
+        return -np.inf if np.isnan(value) else value
+
+    size, best = golden_section_max(profit, 0.0, hi)
+    if best <= 0:
+        return None
+    bought = buy(size)
+    return {
+        'amount_in': float(size),
+        'asset_amount': float(bought),
+        'amount_out': float(sell(bought)),
+        'profit': float(best),
+        'profit_percentage': float(best / size * 100)
+    }
+
+def find_sized_opportunities(curves: Dict[str, Dict[str, object]], max_in: Optional[float] = None,
+                             min_profit: float = 0.0) -> List[Dict]:
+    """
+    Optimal size for every ordered pair of venues. curves maps a venue label
+    to {'buy': quote -> asset curve, 'sell': asset -> quote curve}.
+    Returns opportunities with profit above min_profit, best first.
+    """
+    opportunities = []
+    for buy_name, buy_curves in curves.items():
+        for sell_name, sell_curves in curves.items():
+            if buy_name == sell_name or 'buy' not in buy_curves or 'sell' not in sell_curves:
+                continue
+            trade = optimal_trade(buy_curves['buy'], sell_curves['sell'], max_in)
+            if trade and trade['profit'] > min_profit:
+                opportunities.append({'buy_pool': buy_name, 'sell_pool': sell_name, **trade})
+    return sorted(opportunities, key=lambda opp: opp['profit'], reverse=True)
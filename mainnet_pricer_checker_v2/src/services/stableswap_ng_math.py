@@ -0,0 +1,132 @@
+"""
+Integer-exact ports of CurveStableSwapNGMath.vy (get_y, get_D, get_y_D) and
+the swap helpers of CurveStableSwapNGViews.vy (get_dy, get_dx, dynamic_fee).
+Every division is floor division in the same order as the Vyper source and
+any uint256 underflow raises instead of wrapping, like the contract reverts.
+"""
+from typing import List, Sequence
+
+A_PRECISION = 100
+MAX_COINS = 8
+PRECISION = 10**18
+FEE_DENOMINATOR = 10**10
+
+def _sub(a: int, b: int) -> int:
+    """uint256 subtraction, reverting on underflow"""
+    if b > a:
+        raise ValueError("uint256 underflow")
+    return a - b
+
+def _newton_y(b: int, c: int, D: int, y: int) -> int:
+    for _ in range(255):
+        y_prev = y
+        y = (y * y + c) // _sub(2 * y + b, D)
+        # Equality with the precision of 1
+        if abs(y - y_prev) <= 1:
+            return y
+    raise ArithmeticError("get_y did not converge")
+
+def get_y(i: int, j: int, x: int, xp: Sequence[int], amp: int, D: int, n_coins: int) -> int:
+    """Calculate x[j] if one makes x[i] = x. amp is A * A_PRECISION"""
+    if i == j or not 0 <= j < n_coins or not 0 <= i < n_coins:
+        raise ValueError(f"bad coin indices {i}, {j}")
+
+    S_ = 0
+    c = D
+    Ann = amp * n_coins
+    for k in range(n_coins):
+        if k == i:
+            _x = x
+        elif k != j:
+            _x = xp[k]
+        else:
+            continue
+        S_ += _x
+        c = c * D // (_x * n_coins)
+
+    c = c * D * A_PRECISION // (Ann * n_coins)
+    b = S_ + D * A_PRECISION // Ann  # - D
+    return _newton_y(b, c, D, D)
+
+def get_D(xp: Sequence[int], amp: int, n_coins: int) -> int:
+    """D invariant, iterating until two successive values differ by at most 1"""
+    S = sum(xp[:n_coins])
+    if S == 0:
+        return 0
+
+    D = S
+    Ann = amp * n_coins
+    for _ in range(255):
+        D_P = D
+        for x in xp[:n_coins]:
+            D_P = D_P * D // x
+        D_P //= n_coins ** n_coins
+        D_prev = D
+
+        D = ((Ann * S // A_PRECISION + D_P * n_coins) * D //
+             ((Ann - A_PRECISION) * D // A_PRECISION + (n_coins + 1) * D_P))
+        # Equality with the precision of 1
+        if abs(D - D_prev) <= 1:
+            return D
+    raise ArithmeticError("get_D did not converge")
+
+def get_y_D(amp: int, i: int, xp: Sequence[int], D: int, n_coins: int) -> int:
+    """Calculate x[i] if one reduces D from being calculated for xp to D"""
+    if not 0 <= i < n_coins:
+        raise ValueError(f"bad coin index {i}")
+
+    S_ = 0
+    c = D
+    Ann = amp * n_coins
+    for k in range(n_coins):
+        if k == i:
+            continue
+        S_ += xp[k]
+        c = c * D // (xp[k] * n_coins)
+
+    c = c * D * A_PRECISION // (Ann * n_coins)
+    b = S_ + D * A_PRECISION // Ann
+    return _newton_y(b, c, D, D)
+
+def dynamic_fee(xpi: int, xpj: int, fee: int, fee_multiplier: int) -> int:
+    """Fee in 1e10 precision, raised when the pair is off peg"""
+    if fee_multiplier <= FEE_DENOMINATOR:
+        return fee
+
+    xps2 = (xpi + xpj) ** 2
+    return ((fee_multiplier * fee) //
+            ((fee_multiplier - FEE_DENOMINATOR) * 4 * xpi * xpj // xps2 + FEE_DENOMINATOR))
+
+def xp_mem(rates: Sequence[int], balances: Sequence[int]) -> List[int]:
+    """Balances scaled by their stored rates to 18-decimal 'virtual' units"""
+    return [rate * balance // PRECISION for rate, balance in zip(rates, balances)]
+
+def get_dy(i: int, j: int, dx: int, rates: Sequence[int], balances: Sequence[int],
+           A: int, fee: int, fee_multiplier: int) -> int:
+    """Views.get_dy: output of coin j for dx of coin i. A is the pool's A(), not A_precise()"""
+    n_coins = len(balances)
+    xp = xp_mem(rates, balances)
+    amp = A * A_PRECISION
+    D = get_D(xp, amp, n_coins)
+
+    x = xp[i] + dx * rates[i] // PRECISION
+    y = get_y(i, j, x, xp, amp, D, n_coins)
+    dy = _sub(_sub(xp[j], y), 1)
+
+    fee_amount = dynamic_fee((xp[i] + x) // 2, (xp[j] + y) // 2, fee, fee_multiplier) * dy // FEE_DENOMINATOR
+    return _sub(dy, fee_amount) * PRECISION // rates[j]
+
+def get_dx(i: int, j: int, dy: int, rates: Sequence[int], balances: Sequence[int],
+           A: int, fee: int, fee_multiplier: int) -> int:
+    """Views.get_dx: input of coin i needed to receive dy of coin j"""
+    n_coins = len(balances)
+    xp = xp_mem(rates, balances)
+    amp = A * A_PRECISION
+    D = get_D(xp, amp, n_coins)
+
+    dy_with_fee = dy * rates[j] // PRECISION + 1
+    swap_fee = dynamic_fee(xp[i], xp[j], fee, fee_multiplier)
+
+    y = _sub(xp[j], dy_with_fee * FEE_DENOMINATOR // _sub(FEE_DENOMINATOR, swap_fee))
+    x = get_y(j, i, y, xp, amp, D, n_coins)
+    return _sub(x, xp[i]) * PRECISION // rates[i]
@@ -0,0 +1,105 @@
+from web3 import Web3
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List
+import json
+
+from pricer_core.multicall import Call, Multicall
+from services import stableswap_ng_math as math
+
+@dataclass
+class StableSwapNGPool:
+    """
+    Local copy of everything CurveStableSwapNGViews reads for a swap quote:
+    stored rates, balances, A, fee and offpeg fee multiplier. get_dy/get_dx
+    give the same result as the pool's own get_dy/get_dx at block_number.
+    """
+    address: str
+    rates: List[int]
+    balances: List[int]
+    A: int  # A(), the Views contract scales it by A_PRECISION itself
+    fee: int
+    offpeg_fee_multiplier: int
+    block_number: int
+
+    @property
+    def n_coins(self) -> int:
+        return len(self.balances)
+
+    def get_dy(self, i: int, j: int, dx: int) -> int:
+        return math.get_dy(i, j, dx, self.rates, self.balances, self.A, self.fee, self.offpeg_fee_multiplier)
+
+    def get_dx(self, i: int, j: int, dy: int) -> int:
+        return math.get_dx(i, j, dy, self.rates, self.balances, self.A, self.fee, self.offpeg_fee_multiplier)
+
+    def dynamic_fee(self, i: int, j: int) -> int:
+        xp = math.xp_mem(self.rates, self.balances)
+        return math.dynamic_fee(xp[i], xp[j], self.fee, self.offpeg_fee_multiplier)
+
+    def to_dict(self) -> Dict:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'StableSwapNGPool':
+        return cls(**data)
+
+def state_calls(pool: str) -> List[Call]:
+    """The reads needed to hydrate one pool, keyed by (pool, getter)"""
+    return [
+        Call(pool, "stored_rates()", output_types=('uint256[]',), key=(pool, 'stored_rates')),
+        Call(pool, "get_balances()", output_types=('uint256[]',), key=(pool, 'get_balances')),
+        Call(pool, "A()", key=(pool, 'A')),
+        Call(pool, "fee()", key=(pool, 'fee')),
+        Call(pool, "offpeg_fee_multiplier()", key=(pool, 'offpeg_fee_multiplier')),
+    ]
+
+def load_pools(multicall: Multicall, pools: Iterable[str], block_identifier=None) -> Dict[str, StableSwapNGPool]:
+    """Hydrate several StableSwap-NG pools at one block with a single multicall round"""
+    pools = [Web3.to_checksum_address(p) for p in pools]
+    block_number = multicall.resolve_block(block_identifier)
+
+    calls = []
+    for pool in pools:
+        calls += state_calls(pool)
+    state = multicall.aggregate(calls, block_number)
+
+    loaded = {}
+    for pool in pools:
+        values = {call.key[1]: state.get(call.key) for call in state_calls(pool)}
+        if any(v is None for v in values.values()):
+            print(f"Error loading state for pool {pool} at block {block_number}")
+            continue
+        loaded[pool] = StableSwapNGPool(
+            address=pool,
+            rates=list(values['stored_rates']),
+            balances=list(values['get_balances']),
+            A=values['A'],
+            fee=values['fee'],
+            offpeg_fee_multiplier=values['offpeg_fee_multiplier'],
+            block_number=block_number
+        )
+    return loaded
+
+def record_fixture(path: str, pool: StableSwapNGPool, quotes: List[Dict]):
+    """
+    Save a pool state with on-chain get_dy/get_dx results from the same block,
+    e.g. [{'i': 0, 'j': 1, 'dx': ..., 'dy': ...}], for offline validation.
+    """
+    with open(path, 'w') as f:
+        json.dump({'pool': pool.to_dict(), 'quotes': quotes}, f, indent=2)
+
+def check_fixture(path: str) -> List[Dict]:
+    """Re-run every recorded quote against the local model; returns the mismatches"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    pool = StableSwapNGPool.from_dict(data['pool'])
+
+    mismatches = []
+    for quote in data['quotes']:
+        i, j, dx, dy = quote['i'], quote['j'], int(quote['dx']), int(quote['dy'])
+        if quote.get('exact_output'):
+            local, expected = pool.get_dx(i, j, dy), dx
+        else:
+            local, expected = pool.get_dy(i, j, dx), dy
+        if local != expected:
+            mismatches.append({**quote, 'local': local})
+    return mismatches
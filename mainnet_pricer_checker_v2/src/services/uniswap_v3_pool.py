@@ -0,0 +1,282 @@
+from web3 import Web3
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+
+from pricer_core.multicall import Call, Multicall
+from services.uniswap_v3_math import (
+    MIN_TICK, MAX_TICK, MIN_SQRT_RATIO, MAX_SQRT_RATIO, MAX_UINT256,
+    compute_swap_step, get_sqrt_ratio_at_tick, get_tick_at_sqrt_ratio,
+    tick_position, most_significant_bit, least_significant_bit
+)
+
+SLOT0_OUTPUTS = ('uint160', 'int24', 'uint16', 'uint16', 'uint16', 'uint8', 'bool')
+TICKS_OUTPUTS = ('uint128', 'int128', 'uint256', 'uint256', 'int56', 'uint160', 'uint32', 'bool')
+
+class TickRangeError(Exception):
+    """The swap walked past the bitmap words that were loaded for the pool"""
+
+@dataclass
+class UniswapV3Pool:
+    """
+    Local copy of the pool state that UniswapV3Pool.swap reads: slot0 price and
+    tick, active liquidity, the tick bitmap words around the current tick and
+    liquidityNet of every initialized tick in them. quote_exact_input/output
+    replay swap() exactly, so they match QuoterV1 for the same block.
+    """
+    address: str
+    token0: str
+    token1: str
+    fee: int
+    tick_spacing: int
+    sqrt_price_x96: int
+    tick: int
+    liquidity: int
+    block_number: int
+    bitmap: Dict[int, int] = field(default_factory=dict)  # word position -> 256-bit word
+    liquidity_net: Dict[int, int] = field(default_factory=dict)  # initialized tick -> liquidityNet
+    liquidity_gross: Dict[int, int] = field(default_factory=dict)  # initialized tick -> liquidityGross
+
+    def _next_initialized_tick(self, tick: int, lte: bool) -> Tuple[int, bool]:
+        """TickBitmap.nextInitializedTickWithinOneWord over the loaded words"""
+        compressed = tick // self.tick_spacing
+
+        if lte:
+            word_pos, bit_pos = tick_position(compressed)
+            if word_pos not in self.bitmap:
+                raise TickRangeError(f"word {word_pos} not loaded for pool {self.address}")
+            mask = (1 << bit_pos) - 1 + (1 << bit_pos)
+            masked = self.bitmap[word_pos] & mask
+            if masked:
+                return (compressed - (bit_pos - most_significant_bit(masked))) * self.tick_spacing, True
+            return (compressed - bit_pos) * self.tick_spacing, False
+
+        word_pos, bit_pos = tick_position(compressed + 1)
+        if word_pos not in self.bitmap:
+            raise TickRangeError(f"word {word_pos} not loaded for pool {self.address}")
+        mask = ~((1 << bit_pos) - 1) & MAX_UINT256
+        masked = self.bitmap[word_pos] & mask
+        if masked:
+            return (compressed + 1 + (least_significant_bit(masked) - bit_pos)) * self.tick_spacing, True
+        return (compressed + 1 + (255 - bit_pos)) * self.tick_spacing, False
+
+    def swap(self, zero_for_one: bool, amount_specified: int,
+             sqrt_price_limit_x96: int = 0) -> Tuple[int, int]:
+        """
+        Simulate UniswapV3Pool.swap without mutating the pool. Positive
+        amount_specified is exact input, negative is exact output.
+        Returns (amount0, amount1) from the pool's perspective.
+        """
+        if amount_specified == 0:
+            raise ValueError("amount_specified must be non-zero")
+        if sqrt_price_limit_x96 == 0:
+            sqrt_price_limit_x96 = MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+
+        exact_input = amount_specified > 0
+        remaining = amount_specified
+        calculated = 0
+        sqrt_price = self.sqrt_price_x96
+        tick = self.tick
+        liquidity = self.liquidity
+
+        while remaining != 0 and sqrt_price != sqrt_price_limit_x96:
+            sqrt_price_start = sqrt_price
+            tick_next, initialized = self._next_initialized_tick(tick, zero_for_one)
+            tick_next = max(MIN_TICK, min(MAX_TICK, tick_next))
+            sqrt_price_next = get_sqrt_ratio_at_tick(tick_next)
+
+            if zero_for_one:
+                target = sqrt_price_limit_x96 if sqrt_price_next < sqrt_price_limit_x96 else sqrt_price_next
+            else:
+                target = sqrt_price_limit_x96 if sqrt_price_next > sqrt_price_limit_x96 else sqrt_price_next
+
+            sqrt_price, amount_in, amount_out, fee_amount = compute_swap_step(
+                sqrt_price, target, liquidity, remaining, self.fee
+            )
+
+            if exact_input:
+                remaining -= amount_in + fee_amount
+                calculated -= amount_out
+            else:
+                remaining += amount_out
+                calculated += amount_in + fee_amount
+
+            if sqrt_price == sqrt_price_next:
+                if initialized:
+                    net = self.liquidity_net.get(tick_next, 0)
+                    liquidity += -net if zero_for_one else net
+                tick = tick_next - 1 if zero_for_one else tick_next
+            elif sqrt_price != sqrt_price_start:
+                tick = get_tick_at_sqrt_ratio(sqrt_price)
+
+        if zero_for_one == exact_input:
+            return amount_specified - remaining, calculated
+        return calculated, amount_specified - remaining
+
+    def apply_swap(self, sqrt_price_x96: int, liquidity: int, tick: int, block_number: int):
+        """Move to the post-swap state a Swap event reports"""
+        self.sqrt_price_x96 = sqrt_price_x96
+        self.liquidity = liquidity
+        self.tick = tick
+        self.block_number = block_number
+
+    def apply_position(self, tick_lower: int, tick_upper: int, liquidity_delta: int, block_number: int):
+        """
+        Replay Pool._modifyPosition for a Mint (positive delta) or Burn
+        (negative delta): update both ticks, flip them in the bitmap when
+        their gross liquidity crosses zero and adjust active liquidity when
+        the range covers the current tick. Ticks in words that weren't loaded
+        are skipped; a swap that reaches them raises TickRangeError anyway.
+        """
+        for tick, net in ((tick_lower, liquidity_delta), (tick_upper, -liquidity_delta)):
+            word_pos, bit_pos = tick_position(tick // self.tick_spacing)
+            if word_pos not in self.bitmap:
+                continue
+            gross_before = self.liquidity_gross.get(tick, 0)
+            gross_after = gross_before + liquidity_delta
+            if (gross_before == 0) != (gross_after == 0):
+                self.bitmap[word_pos] ^= 1 << bit_pos
+            if gross_after:
+                self.liquidity_gross[tick] = gross_after
+                self.liquidity_net[tick] = self.liquidity_net.get(tick, 0) + net
+            else:
+                self.liquidity_gross.pop(tick, None)
+                self.liquidity_net.pop(tick, None)
+
+        if tick_lower <= self.tick < tick_upper:
+            self.liquidity += liquidity_delta
+        self.block_number = block_number
+
+    def zero_for_one(self, token_in: str) -> bool:
+        return Web3.to_checksum_address(token_in) == self.token0
+
+    def quote_exact_input(self, token_in: str, amount_in: int, sqrt_price_limit_x96: int = 0) -> int:
+        """Same result as Quoter.quoteExactInputSingle"""
+        zero_for_one = self.zero_for_one(token_in)
+        amount0, amount1 = self.swap(zero_for_one, amount_in, sqrt_price_limit_x96)
+        return -(amount1 if zero_for_one else amount0)
+
+    def quote_exact_output(self, token_in: str, amount_out: int, sqrt_price_limit_x96: int = 0) -> int:
+        """Same result as Quoter.quoteExactOutputSingle"""
+        zero_for_one = self.zero_for_one(token_in)
+        amount0, amount1 = self.swap(zero_for_one, -amount_out, sqrt_price_limit_x96)
+        amount_received = -(amount1 if zero_for_one else amount0)
+        if sqrt_price_limit_x96 == 0 and amount_received != amount_out:
+            raise ValueError("not enough liquidity for exact output")
+        return amount0 if zero_for_one else amount1
+
+    def to_dict(self) -> Dict:
+        data = dict(self.__dict__)
+        data['bitmap'] = {str(k): hex(v) for k, v in self.bitmap.items()}
+        data['liquidity_net'] = {str(k): v for k, v in self.liquidity_net.items()}
+        data['liquidity_gross'] = {str(k): v for k, v in self.liquidity_gross.items()}
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'UniswapV3Pool':
+        data = dict(data)
+        data['bitmap'] = {int(k): int(v, 16) for k, v in data['bitmap'].items()}
+        data['liquidity_net'] = {int(k): int(v) for k, v in data['liquidity_net'].items()}
+        data['liquidity_gross'] = {int(k): int(v) for k, v in data.get('liquidity_gross', {}).items()}
+        return cls(**data)
+
+def load_pools(multicall: Multicall, pools: Dict[str, Tuple[str, str, int]],
+               block_identifier=None, word_radius: int = 2) -> Dict[str, UniswapV3Pool]:
+    """
+    Load swap state for several pools at one block in three multicall rounds:
+    slot0/liquidity/tickSpacing, then the bitmap words within word_radius of
+    the current tick, then ticks() for every initialized tick in those words.
+    pools maps pool address -> (token0, token1, fee), e.g. from PoolMetadataStore.
+    """
+    block_number = multicall.resolve_block(block_identifier)
+
+    calls = []
+    for pool in pools:
+        calls += [
+            Call(pool, "slot0()", output_types=SLOT0_OUTPUTS, key=(pool, 'slot0')),
+            Call(pool, "liquidity()", output_types=('uint128',), key=(pool, 'liquidity')),
+            Call(pool, "tickSpacing()", output_types=('int24',), key=(pool, 'tickSpacing')),
+        ]
+    state = multicall.aggregate(calls, block_number)
+
+    word_calls = []
+    for pool in pools:
+        slot0, spacing = state.get((pool, 'slot0')), state.get((pool, 'tickSpacing'))
+        if slot0 is None or spacing is None or state.get((pool, 'liquidity')) is None:
+            print(f"Error loading state for pool {pool} at block {block_number}")
+            continue
+        center, _ = tick_position(slot0[1] // spacing)
+        word_calls += [Call(pool, "tickBitmap(int16)", (w,), key=(pool, 'word', w))
+                       for w in range(center - word_radius, center + word_radius + 1)]
+    words = multicall.aggregate(word_calls, block_number)
+
+    bitmaps: Dict[str, Dict[int, int]] = {}
+    tick_calls = []
+    for call in word_calls:
+        pool, _, word_pos = call.key
+        word = words.get(call.key)
+        if word is None:
+            continue
+        bitmaps.setdefault(pool, {})[word_pos] = word
+        spacing = state.get((pool, 'tickSpacing'))
+        bit = word
+        while bit:
+            bit_pos = least_significant_bit(bit)
+            bit &= bit - 1
+            tick = ((word_pos << 8) + bit_pos) * spacing
+            tick_calls.append(Call(pool, "ticks(int24)", (tick,), output_types=TICKS_OUTPUTS,
+                                   key=(pool, 'tick', tick)))
+    ticks = multicall.aggregate(tick_calls, block_number) if tick_calls else None
+
+    loaded = {}
+    for pool, (token0, token1, fee) in pools.items():
+        if pool not in bitmaps:
+            continue
+        liquidity_net, liquidity_gross = {}, {}
+        for call in tick_calls:
+            if call.key[0] == pool and ticks.get(call.key) is not None:
+                liquidity_gross[call.key[2]] = ticks.get(call.key)[0]
+                liquidity_net[call.key[2]] = ticks.get(call.key)[1]
+        slot0 = state.get((pool, 'slot0'))
+        loaded[pool] = UniswapV3Pool(
+            address=pool,
+            token0=Web3.to_checksum_address(token0),
+            token1=Web3.to_checksum_address(token1),
+            fee=fee,
+            tick_spacing=state.get((pool, 'tickSpacing')),
+            sqrt_price_x96=slot0[0],
+            tick=slot0[1],
+            liquidity=state.get((pool, 'liquidity')),
+            block_number=block_number,
+            bitmap=bitmaps[pool],
+            liquidity_net=liquidity_net,
+            liquidity_gross=liquidity_gross
+        )
+    return loaded
+
+def record_fixture(path: str, pool: UniswapV3Pool, quoter_outputs: List[Dict]):
+    """
+    Save a pool state with Quoter results from the same block, e.g.
+    [{'token_in': ..., 'amount_in': ..., 'amount_out': ..., 'exact_output': False}],
+    for offline validation.
+    """
+    with open(path, 'w') as f:
+        json.dump({'pool': pool.to_dict(), 'quotes': quoter_outputs}, f, indent=2)
+
+def check_fixture(path: str) -> List[Dict]:
+    """Re-run every recorded quote against the local model; returns the mismatches"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    pool = UniswapV3Pool.from_dict(data['pool'])
+
+    mismatches = []
+    for quote in data['quotes']:
+        if quote.get('exact_output'):
+            local = pool.quote_exact_output(quote['token_in'], int(quote['amount_out']))
+            expected = int(quote['amount_in'])
+        else:
+            local = pool.quote_exact_input(quote['token_in'], int(quote['amount_in']))
+            expected = int(quote['amount_out'])
+        if local != expected:
+            mismatches.append({**quote, 'local': local})
+    return mismatches
@@ -1,20 +1,22 @@
-from web3 import Web3
 from eth_typing import HexAddress
-from typing import Dict
-from dotenv import load_dotenv
-import os
+from web3.exceptions import BadFunctionCallOutput, ContractLogicError
+from typing import Dict, List, Sequence, Tuple
 
-# Load environment variables
-load_dotenv()
+from pricer_core.chains import MAINNET
+from pricer_core.multicall import Call, Multicall, MulticallResult
+from pricer_core.pool_metadata import get_pool_metadata_store
+from pricer_core.uniswap import UniswapQuoter, ETH_AMOUNT, USDC_AMOUNT, QUOTE_SIGNATURE, prices_from_amounts
+from services.uniswap_v3_pool import UniswapV3Pool, TickRangeError, load_pools, record_fixture
+from services.size_optimizer import SampledCurve
 
-# Get Alchemy API URL from environment variables
-ALCHEMY_API_URL = os.getenv('ALCHEMY_API_URL')
-w3 = Web3(Web3.HTTPProvider(ALCHEMY_API_URL))
+# RPC, addresses and pools come from the mainnet chain profile
+w3 = MAINNET.web3()
 
 # Constants
-QUOTER_ADDRESS = "0xb27308f9F90D607463bb33eA1BeBb41C27CE5AB6"
-USDC = Web3.to_checksum_address("0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48")
-WETH = Web3.to_checksum_address("0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2")
+CHAIN_ID = MAINNET.chain_id
+QUOTER_ADDRESS = MAINNET.quoter
+USDC = MAINNET.usdc
+WETH = MAINNET.weth
 
 # ABIs remain the same as in original file
 QUOTER_ABI = [{
@@ -31,94 +33,153 @@ QUOTER_ABI = [{
     "type": "function"
 }]
 
-POOL_ABI = [
-    {
-        "inputs": [],
-        "name": "token0",
-        "outputs": [{"type": "address", "name": ""}],
-        "stateMutability": "view",
-        "type": "function"
-    },
-    {
-        "inputs": [],
-        "name": "token1",
-        "outputs": [{"type": "address", "name": ""}],
-        "stateMutability": "view",
-        "type": "function"
-    },
-    {
-        "inputs": [],
-        "name": "fee",
-        "outputs": [{"type": "uint24", "name": ""}],
-        "stateMutability": "view",
-        "type": "function"
-    }
-]
-
-def get_uniswap_prices() -> Dict[str, Dict[str, float]]:
+UNISWAP_POOLS = MAINNET.uniswap_pools
+
+# Static pool data (tokens, decimals, fee tier) is read once and persisted
+pool_metadata = get_pool_metadata_store(CHAIN_ID)
+quoter = UniswapQuoter(MAINNET, pool_metadata)
+
+def warm_pool_metadata(multicall: Multicall = None):
+    """Load token/fee/decimals for every pool so the hot loop only issues quotes"""
+    quoter.warm(multicall or Multicall(w3))
+
+def get_uniswap_prices(block_identifier=None) -> Dict[str, Dict[str, float]]:
     """
     Get prices from Uniswap pools and return a dictionary of pool prices
+    Args:
+        block_identifier: block to price at, 'latest' when None
     Returns:
         Dict with pool addresses as keys and price info as values
     """
-    pools = {
-        Web3.to_checksum_address("0x8ad599c3A0ff1De082011EFDDc58f1908eb6e6D8"): "0.3% fee pool",
-        Web3.to_checksum_address("0x88e6A0c2dDD26FEEb64F039a2c41296FcB3f5640"): "0.05% fee pool"
-    }
-    
     quoter_contract = w3.eth.contract(address=QUOTER_ADDRESS, abi=QUOTER_ABI)
     pool_prices = {}
+    warm_pool_metadata()
 
-    for pool_address in pools.keys():
+    for pool_address in UNISWAP_POOLS.keys():
         try:
-            token0, token1, fee = get_pool_info(pool_address)
-            
-            # Determine token ordering
-            is_usdc_token0 = token0.lower() == USDC.lower()
-            usdc_token = token0 if is_usdc_token0 else token1
-            weth_token = token1 if is_usdc_token0 else token0
+            weth_token, usdc_token, fee, eth_decimals, usdc_decimals = get_quote_params(pool_address)
             
             # Get ETH sell price (ETH -> USDC)
-            eth_input = 1 * 10**18  # 1 ETH
             usdc_amount = quoter_contract.functions.quoteExactInputSingle(
                 weth_token,
                 usdc_token,
                 fee,
-                eth_input,
+                ETH_AMOUNT * 10**eth_decimals,
                 0
-            ).call()
-            eth_sell_price = usdc_amount / (10**6)
+            ).call(block_identifier=block_identifier)
             
             # Get ETH buy price (USDC -> ETH)
-            usdc_input = 3000 * 10**6  # 1000 USDC
             eth_amount = quoter_contract.functions.quoteExactInputSingle(
                 usdc_token,
                 weth_token,
                 fee,
-                usdc_input,
+                USDC_AMOUNT * 10**usdc_decimals,
                 0
-            ).call()
-            eth_buy_price = (3000 / (eth_amount / 10**18))
+            ).call(block_identifier=block_identifier)
             
-            pool_prices[pool_address] = {
-                'eth_buy': eth_buy_price,
-                'eth_sell': eth_sell_price,
-                'name': 'Uniswap'
-            }
+            pool_prices[pool_address] = prices_from_amounts(usdc_amount, eth_amount, usdc_decimals, eth_decimals)
 
-        except Exception as e:
+        # Only a revert drops the pool; RPC and rate limiter errors propagate to the caller
+        except (ContractLogicError, BadFunctionCallOutput) as e:
             print(f"Error with pool {pool_address}: {str(e)}")
             continue
             
     return pool_prices
 
 def get_pool_info(pool_address: HexAddress):
-    """Get token addresses and fee from pool contract"""
-    pool_contract = w3.eth.contract(address=pool_address, abi=POOL_ABI)
-    token0 = pool_contract.functions.token0().call()
-    token1 = pool_contract.functions.token1().call()
-    fee = pool_contract.functions.fee().call()
-    return token0, token1, fee
+    """Get token addresses and fee for a pool, only reading the chain the first time"""
+    metadata = pool_metadata.get(pool_address)
+    if metadata is None:
+        pool_metadata.warm(Multicall(w3), uniswap_pools=[pool_address])
+        metadata = pool_metadata.get(pool_address)
+        if metadata is None:
+            raise ValueError(f"Could not read metadata for pool {pool_address}")
+    return metadata.tokens[0], metadata.tokens[1], metadata.fee
+
+def get_quote_params(pool_address: HexAddress) -> Tuple[str, str, int, int, int]:
+    """(weth_token, usdc_token, fee, eth_decimals, usdc_decimals) for a pool"""
+    get_pool_info(pool_address)
+    return quoter.quote_params(pool_address)
+
+def get_uniswap_quote_calls() -> List[Call]:
+    """Quoter calls for every pool with warmed metadata, for batching through Multicall3"""
+    return quoter.quote_calls()
+
+def uniswap_prices_from_results(results: MulticallResult) -> Dict[str, Dict[str, float]]:
+    """Build the same structure as get_uniswap_prices() from a multicall result"""
+    return quoter.prices_from_results(results)
+
+def get_uniswap_sample_calls(eth_sizes: Sequence[float], usdc_sizes: Sequence[float]) -> List[Call]:
+    """Quoter calls sampling each pool's ETH -> USDC and USDC -> ETH output at several whole-token sizes"""
+    calls = []
+    for pool_address in UNISWAP_POOLS:
+        if pool_metadata.get(pool_address) is None:
+            continue
+        weth_token, usdc_token, fee, eth_decimals, usdc_decimals = get_quote_params(pool_address)
+        calls += [Call(QUOTER_ADDRESS, QUOTE_SIGNATURE, (weth_token, usdc_token, fee, int(size * 10**eth_decimals), 0),
+                       key=(pool_address, 'sell', k)) for k, size in enumerate(eth_sizes)]
+        calls += [Call(QUOTER_ADDRESS, QUOTE_SIGNATURE, (usdc_token, weth_token, fee, int(size * 10**usdc_decimals), 0),
+                       key=(pool_address, 'buy', k)) for k, size in enumerate(usdc_sizes)]
+    return calls
+
+def uniswap_output_curves(results: MulticallResult, eth_sizes: Sequence[float],
+                          usdc_sizes: Sequence[float]) -> Dict[str, Dict[str, SampledCurve]]:
+    """Per pool 'sell' (ETH -> USDC) and 'buy' (USDC -> ETH) curves in whole tokens"""
+    curves = {}
+    for pool_address in UNISWAP_POOLS:
+        if pool_metadata.get(pool_address) is None:
+            continue
+        _, _, _, eth_decimals, usdc_decimals = get_quote_params(pool_address)
+        sell = [results.get((pool_address, 'sell', k)) for k in range(len(eth_sizes))]
+        buy = [results.get((pool_address, 'buy', k)) for k in range(len(usdc_sizes))]
+        curves[pool_address] = {
+            'sell': SampledCurve(eth_sizes, [out / 10**usdc_decimals if out else None for out in sell]),
+            'buy': SampledCurve(usdc_sizes, [out / 10**eth_decimals if out else None for out in buy])
+        }
+    return curves
+
+def load_pool_states(multicall: Multicall = None, block_identifier=None) -> Dict[str, UniswapV3Pool]:
+    """Local swap models of every pool at one block, for quoting any size without RPCs"""
+    multicall = multicall or Multicall(w3)
+    warm_pool_metadata(multicall)
+    pools = {pool: get_pool_info(pool) for pool in UNISWAP_POOLS if pool_metadata.get(pool)}
+    return load_pools(multicall, pools, block_identifier)
+
+def uniswap_prices_from_states(states: Dict[str, UniswapV3Pool]) -> Dict[str, Dict[str, float]]:
+    """Build the same structure as get_uniswap_prices() from local pool models"""
+    pool_prices = {}
+    for pool_address, state in states.items():
+        try:
+            weth_token, usdc_token, fee, eth_decimals, usdc_decimals = get_quote_params(pool_address)
+            usdc_for_eth = state.quote_exact_input(weth_token, ETH_AMOUNT * 10**eth_decimals)
+            eth_for_usdc = state.quote_exact_input(usdc_token, USDC_AMOUNT * 10**usdc_decimals)
+            pool_prices[pool_address] = prices_from_amounts(usdc_for_eth, eth_for_usdc, usdc_decimals, eth_decimals)
+        except TickRangeError as e:
+            print(f"Error with pool {pool_address}: {str(e)}")
+    return pool_prices
+
+def record_quoter_fixture(path: str, pool_address: str, amounts_in: List[Tuple[str, int]],
+                          block_identifier=None):
+    """
+    Record a pool's state together with Quoter outputs for (token_in, amount_in)
+    pairs from the same block, so the local model can be checked offline
+    with services.uniswap_v3_pool.check_fixture.
+    """
+    multicall = Multicall(w3)
+    block_number = multicall.resolve_block(block_identifier)
+    state = load_pool_states(multicall, block_number)[pool_address]
+    calls = [
+        Call(QUOTER_ADDRESS, QUOTE_SIGNATURE,
+             (token_in, state.token1 if token_in == state.token0 else state.token0, state.fee, amount, 0),
+             key=i)
+        for i, (token_in, amount) in enumerate(amounts_in)
+    ]
+    results = multicall.aggregate(calls, block_number)
+    quotes = [
+        {'token_in': token_in, 'amount_in': str(amount), 'amount_out': str(results.get(i)), 'exact_output': False}
+        for i, (token_in, amount) in enumerate(amounts_in) if results.get(i) is not None
+    ]
+    record_fixture(path, state, quotes)
 
 if __name__ == "__main__":
     prices = get_uniswap_prices()
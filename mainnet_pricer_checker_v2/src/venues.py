@@ -0,0 +1,54 @@
+from web3 import AsyncWeb3
+from typing import Dict, List, Optional
+import asyncio
+import os
+
+from pricer_core.multicall import AsyncMulticall, Multicall
+from pricer_core.venues import Venue, VenueFanout, UniswapVenue, CoinbaseVenue, GMXVenue, make_async_web3
+from curve_get_price import get_curve_quote_calls, curve_prices_from_results
+from curve_get_price import warm_pool_metadata as warm_curve_metadata
+from uniswap import quoter as uniswap_quoter
+from price_snapshot import size_sample_calls, sized_opportunities_from_results
+
+class CurveVenue(Venue):
+    name = 'Curve'
+
+    def __init__(self, multicall: AsyncMulticall, timeout: float = 5.0):
+        super().__init__(timeout)
+        self.multicall = multicall
+
+    async def fetch(self, block_number: int) -> Dict[str, Dict[str, float]]:
+        results = await self.multicall.aggregate(get_curve_quote_calls(), block_number)
+        return curve_prices_from_results(results)
+
+    def warm(self, multicall: Multicall):
+        warm_curve_metadata(multicall)
+
+class SizeSampler:
+    """
+    Samples every pool's output curve at several sizes in one multicall per
+    block and solves for the profit-maximizing trade size per pool pair
+    """
+    def __init__(self, multicall: AsyncMulticall, max_usdc: Optional[float] = None, timeout: float = 5.0):
+        self.multicall = multicall
+        self.max_usdc = max_usdc  # cap on the buy leg, e.g. available capital
+        self.timeout = timeout
+
+    async def fetch(self, block_number: int) -> List[Dict]:
+        try:
+            results = await asyncio.wait_for(self.multicall.aggregate(size_sample_calls(), block_number),
+                                             timeout=self.timeout)
+        except asyncio.TimeoutError:
+            print(f"Error sampling output curves at block {block_number}: timed out after {self.timeout:.1f}s")
+            return []
+        except Exception as e:
+            print(f"Error sampling output curves at block {block_number}: {str(e)}")
+            return []
+        return sized_opportunities_from_results(results, self.max_usdc)
+
+def default_venues(w3: AsyncWeb3, include_coinbase: bool = True) -> List[Venue]:
+    multicall = AsyncMulticall(w3)
+    venues = [CurveVenue(multicall), UniswapVenue(multicall, uniswap_quoter)]
+    if include_coinbase and os.getenv('COINBASE_API_KEY'):
+        venues.append(CoinbaseVenue())
+    return venues
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The checker's modules are flat scripts run from src/ (pricer_core is linked in there), import them the same way
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
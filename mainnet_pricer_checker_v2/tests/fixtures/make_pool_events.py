@@ -0,0 +1,153 @@
+"""
+Writes pool_events.json, the log replay fixture test_historical_arb_graph.py
+checks: seed states of the USDC/WETH 0.05% Uniswap pool and tricrypto-USDC at
+SEED_BLOCK, the Swap/Mint/Burn/TokenExchange/AddLiquidity logs of the blocks
+after it and reference prices at CHECK_BLOCKS. The logs are generated: swap
+amounts are what the pool model trades to move between the logged prices and
+exchange outputs are get_dy at the balances before them. The reference prices
+come from pool models built straight from the open positions and absolute
+balances at each check block, never from replaying the logs or their deltas.
+Run from mainnet_pricer_checker_v2/tests: python fixtures/make_pool_events.py
+"""
+import os
+import random
+import sys
+import tempfile
+
+from eth_abi import encode
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', '..', 'src'))
+os.chdir(tempfile.mkdtemp())  # keep the modules' metadata cache out of the tree
+
+import curve_get_price
+import uniswap
+from pricer_core.pool_metadata import PoolMetadata
+from services import pool_events
+from services.cryptoswap_pool import CryptoSwapPool, unpack_prices
+from services.uniswap_v3_math import get_sqrt_ratio_at_tick, tick_position
+from services.uniswap_v3_pool import UniswapV3Pool
+
+SEED_BLOCK = 20_000_000
+LAST_BLOCK = SEED_BLOCK + 40
+CHECK_BLOCKS = [SEED_BLOCK + 10, SEED_BLOCK + 25, SEED_BLOCK + 40]
+GENESIS_TIME = 1_717_000_000
+
+UNISWAP_POOL = '0x88e6A0c2dDD26FEEb64F039a2c41296FcB3f5640'
+CURVE_POOL = '0x7F86Bf177Dd4F3494b841a37e810A34dD56c829B'
+USDC, WBTC, WETH = curve_get_price.USDC, curve_get_price.WBTC, uniswap.WETH
+TICK_SPACING = 10
+OWNER = '0x' + '00' * 32
+
+METADATA = {
+    UNISWAP_POOL: PoolMetadata(UNISWAP_POOL, 'uniswap_v3', [USDC, WETH], [6, 18], 500, {USDC: 0, WETH: 1}),
+    CURVE_POOL: PoolMetadata(CURVE_POOL, 'curve', [USDC, WBTC, WETH], [6, 8, 18], None, {USDC: 0, WBTC: 1, WETH: 2}),
+}
+
+def topic_int24(value: int) -> str:
+    return '0x' + encode(['int24'], [value]).hex()
+
+def uniswap_state(positions, sqrt_price_x96: int, tick: int, block: int) -> UniswapV3Pool:
+    """The pool model for a set of (lower, upper, liquidity) positions, built directly"""
+    word = tick_position(tick // TICK_SPACING)[0]
+    pool = UniswapV3Pool(UNISWAP_POOL, USDC, WETH, 500, TICK_SPACING, sqrt_price_x96, tick, 0, block,
+                         bitmap={w: 0 for w in range(word - 4, word + 5)})
+    for lower, upper, liquidity in positions:
+        pool.apply_position(lower, upper, liquidity, block)
+    pool.liquidity = sum(liquidity for lower, upper, liquidity in positions if lower <= tick < upper)
+    return pool
+
+def curve_state(balances, packed: int, timestamp: int, block: int) -> CryptoSwapPool:
+    """The pool model for absolute balances, built directly with D solved from them"""
+    pool = CryptoSwapPool(CURVE_POOL, list(balances), [10**12, 10**10, 1], unpack_prices(packed, 3), 0,
+                          1_707_629, 11_809_167_828_997, 1_000_000, 140_000_000, 500_000_000_000_000,
+                          0, timestamp, block)
+    pool.D = pool._newton_D(pool.xp(pool.balances))
+    return pool
+
+def main():
+    random.seed(15)
+    for address, metadata in METADATA.items():
+        uniswap.pool_metadata.pools[address] = metadata
+
+    # Uniswap: a wide position plus narrow ones minted and burned along the way
+    tick = 195_600
+    positions = [(193_000, 198_000, 4 * 10**18), (195_000, 196_200, 10**18)]
+    sqrt_price = get_sqrt_ratio_at_tick(tick) + 1
+    uniswap_seed = uniswap_state(positions, sqrt_price, tick, SEED_BLOCK)
+
+    # Curve: absolute balances moved by exchanges and deposits, exchanges quoted with get_dy
+    balances = [10_000_000 * 10**6, 166 * 10**8, 3_333 * 10**18]
+    packed = 60_000 * 10**18 | (3_000 * 10**18 << 128)
+    curve_time = GENESIS_TIME
+    curve_seed = curve_state(balances, packed, curve_time, SEED_BLOCK)
+    topics = pool_events.curve_topics(3)
+
+    logs, prices = [], {}
+    for block in range(SEED_BLOCK + 1, LAST_BLOCK + 1):
+        timestamp = GENESIS_TIME + 12 * (block - SEED_BLOCK)
+        for log_index in range(random.randint(1, 2)):
+            log = {'blockNumber': block, 'logIndex': log_index, 'blockTimestamp': timestamp}
+            roll = random.random()
+            if roll < 0.5:
+                # Swap to a new price: the amounts are what the pool trades to get there from the last one
+                before = uniswap_state(positions, sqrt_price, tick, block)
+                tick = max(194_700, min(196_500, tick + random.randint(-40, 40)))
+                target = get_sqrt_ratio_at_tick(tick) + random.randint(1, 10**6)
+                if target == sqrt_price:
+                    target += 1
+                amount0, amount1 = before.swap(target < sqrt_price, 10**40, target)
+                sqrt_price = target
+                liquidity = sum(l for lower, upper, l in positions if lower <= tick < upper)
+                log.update(address=UNISWAP_POOL, topics=[pool_events.UNISWAP_SWAP, OWNER, OWNER],
+                           data='0x' + encode(['int256', 'int256', 'uint160', 'uint128', 'int24'],
+                                              [amount0, amount1, sqrt_price, liquidity, tick]).hex())
+            elif roll < 0.65:
+                lower = (tick // TICK_SPACING - random.randint(1, 30)) * TICK_SPACING
+                upper = (tick // TICK_SPACING + random.randint(1, 30)) * TICK_SPACING
+                amount = random.randint(1, 5) * 10**17
+                positions.append((lower, upper, amount))
+                log.update(address=UNISWAP_POOL,
+                           topics=[pool_events.UNISWAP_MINT, OWNER, topic_int24(lower), topic_int24(upper)],
+                           data='0x' + encode(['address', 'uint128', 'uint256', 'uint256'],
+                                              ['0x' + '00' * 20, amount, 1, 1]).hex())
+            elif roll < 0.7 and len(positions) > 2:
+                lower, upper, amount = positions.pop(random.randrange(2, len(positions)))
+                log.update(address=UNISWAP_POOL,
+                           topics=[pool_events.UNISWAP_BURN, OWNER, topic_int24(lower), topic_int24(upper)],
+                           data='0x' + encode(['uint128', 'uint256', 'uint256'], [amount, 1, 1]).hex())
+            elif roll < 0.95:
+                i, j = random.choice([(0, 2), (2, 0), (0, 1), (1, 0), (1, 2), (2, 1)])
+                dx = [random.randint(1_000, 50_000) * 10**6, random.randint(1, 20) * 10**7,
+                      random.randint(1, 20) * 10**18][i]
+                dy = curve_state(balances, packed, curve_time, block).get_dy(i, j, dx)
+                balances[i] += dx
+                balances[j] -= dy
+                curve_time = timestamp
+                log.update(address=CURVE_POOL, topics=[topics['TokenExchange'], OWNER],
+                           data='0x' + encode(['uint256'] * 6, [i, dx, j, dy, 0, packed]).hex())
+            else:
+                amounts = [random.randint(1_000, 20_000) * 10**6, random.randint(1, 10) * 10**7,
+                           random.randint(1, 10) * 10**18]
+                balances = [balance + amount for balance, amount in zip(balances, amounts)]
+                curve_time = timestamp
+                log.update(address=CURVE_POOL, topics=[topics['AddLiquidity'], OWNER],
+                           data='0x' + encode(['uint256[3]', 'uint256', 'uint256', 'uint256'],
+                                              [amounts, 0, 0, packed]).hex())
+            logs.append(log)
+
+        if block in CHECK_BLOCKS:
+            uniswap_now = uniswap_state(positions, sqrt_price, tick, block)
+            prices[block] = {
+                **uniswap.uniswap_prices_from_states({UNISWAP_POOL: uniswap_now}),
+                **curve_get_price.curve_prices_from_states(
+                    {CURVE_POOL: curve_state(balances, packed, curve_time, block)}),
+            }
+
+    path = os.path.join(HERE, 'pool_events.json')
+    pool_events.record_log_fixture(path, SEED_BLOCK, {UNISWAP_POOL: uniswap_seed}, {CURVE_POOL: curve_seed},
+                                   logs, uniswap.pool_metadata, prices)
+    print(f"Wrote {len(logs)} logs and prices at {len(prices)} blocks to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Writes uniswap_v3_pool.json, the offline fixture test_uniswap_v3_pool.py
+runs check_fixture() on: a USDC/WETH 0.05% pool state and QuoterV1 outputs
+for the same state. Both come from Uniswap's own bytecode run by titanoboa:
+the factory deploys the pool, liquidity is minted in ranges around the price
+so the larger quotes cross initialized ticks and bitmap words, the state is
+read back through services.uniswap_v3_pool.load_pools and QuoterV1 quotes
+it. Needs titanoboa and the compiled UniswapV3Factory.json and Quoter.json
+artifacts of @uniswap/v3-core and @uniswap/v3-periphery.
+Run from mainnet_pricer_checker_v2/tests:
+    python fixtures/make_uniswap_v3_fixture.py path/to/artifacts
+"""
+import json
+import os
+import sys
+import tempfile
+from math import isqrt
+
+import boa
+from eth_abi import encode
+from web3 import Web3
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', '..', 'src'))
+os.chdir(tempfile.mkdtemp())  # keep the modules' metadata cache out of the tree
+
+from pricer_core.multicall import Multicall
+from services.local_chain import LocalChainProvider
+from services.uniswap_v3_math import get_tick_at_sqrt_ratio
+from services.uniswap_v3_pool import SLOT0_OUTPUTS, TICKS_OUTPUTS, load_pools, record_fixture
+
+FEE = 500
+TICK_SPACING = 10
+ETH_PRICE = 2500  # USDC per WETH
+
+TOKEN = """
+# pragma version 0.3.10
+symbol: public(String[8])
+decimals: public(uint8)
+balanceOf: public(HashMap[address, uint256])
+
+@external
+def __init__(_symbol: String[8], _decimals: uint8):
+    self.symbol = _symbol
+    self.decimals = _decimals
+
+@external
+def mint(_to: address, _value: uint256):
+    self.balanceOf[_to] += _value
+
+@external
+def transfer(_to: address, _value: uint256) -> bool:
+    self.balanceOf[msg.sender] -= _value
+    self.balanceOf[_to] += _value
+    return True
+"""
+
+# Pays for minted liquidity out of its own balances
+MINTER = """
+# pragma version 0.3.10
+interface Pool:
+    def mint(recipient: address, tickLower: int24, tickUpper: int24, amount: uint128,
+             data: Bytes[32]) -> (uint256, uint256): nonpayable
+    def token0() -> address: view
+    def token1() -> address: view
+
+interface Token:
+    def transfer(_to: address, _value: uint256) -> bool: nonpayable
+
+@external
+def mint(pool: address, tick_lower: int24, tick_upper: int24, amount: uint128):
+    Pool(pool).mint(self, tick_lower, tick_upper, amount, b"")
+
+@external
+def uniswapV3MintCallback(amount0: uint256, amount1: uint256, data: Bytes[32]):
+    if amount0 > 0:
+        Token(Pool(msg.sender).token0()).transfer(msg.sender, amount0)
+    if amount1 > 0:
+        Token(Pool(msg.sender).token1()).transfer(msg.sender, amount1)
+"""
+
+# (lower, upper, liquidity) relative to the starting tick: one wide range, a
+# ladder of narrow ones around the price and a few in the neighbouring words
+POSITIONS = [
+    (-60_000, 60_000, 2 * 10**17),
+    (-50, 50, 10**18), (-200, 150, 6 * 10**17), (-120, 300, 4 * 10**17),
+    (-700, -300, 5 * 10**17), (400, 900, 5 * 10**17), (-1_500, 1_200, 3 * 10**17),
+    (-4_000, -2_500, 2 * 10**17), (2_600, 4_100, 2 * 10**17),
+]
+
+# (token in, whole tokens, exact output)
+QUOTES = [
+    ('weth', 0.001, False), ('weth', 1, False), ('weth', 50, False), ('weth', 500, False), ('weth', 3_000, False),
+    ('usdc', 10, False), ('usdc', 3_000, False), ('usdc', 250_000, False), ('usdc', 2_000_000, False),
+    ('usdc', 7_000_000, False),
+    ('weth', 3_000, True), ('weth', 1_000_000, True),  # USDC out
+    ('usdc', 1, True), ('usdc', 400, True),  # WETH out
+]
+
+def load_artifact(directory: str, name: str):
+    with open(os.path.join(directory, f'{name}.json'), 'r') as f:
+        artifact = json.load(f)
+    return json.dumps(artifact['abi']), bytes.fromhex(artifact['bytecode'][2:])
+
+def deploy(directory: str, name: str, types=(), args=()):
+    abi, bytecode = load_artifact(directory, name)
+    address, _ = boa.env.deploy_code(bytecode=bytecode + encode(list(types), list(args)))
+    return boa.loads_abi(abi, name=name).at(address)
+
+def start_price(usdc: str, weth: str) -> int:
+    """sqrtPriceX96 of ETH_PRICE for whichever order the tokens sort in"""
+    raw_weth_per_usdc = (10**18, ETH_PRICE * 10**6)  # token1/token0 when USDC is token0
+    num, den = raw_weth_per_usdc if int(usdc, 16) < int(weth, 16) else raw_weth_per_usdc[::-1]
+    return isqrt(num * 2**192 // den)
+
+def chain_reader(pool) -> LocalChainProvider:
+    """A LocalChainProvider answering the reads load_pools makes from the boa pool"""
+    chain = LocalChainProvider(block_number=boa.env.evm.patch.block_number)
+    chain.register(pool.address, "slot0()", SLOT0_OUTPUTS, lambda block: pool.slot0())
+    chain.register(pool.address, "liquidity()", ['uint128'], lambda block: pool.liquidity())
+    chain.register(pool.address, "tickSpacing()", ['int24'], lambda block: pool.tickSpacing())
+    chain.register(pool.address, "tickBitmap(int16)", ['uint256'], lambda block, word: pool.tickBitmap(word))
+    chain.register(pool.address, "ticks(int24)", TICKS_OUTPUTS, lambda block, tick: pool.ticks(tick))
+    return chain
+
+def main(artifacts: str):
+    usdc = boa.loads(TOKEN, "USDC", 6)
+    weth = boa.loads(TOKEN, "WETH", 18)
+    factory = deploy(artifacts, 'UniswapV3Factory')
+    quoter = deploy(artifacts, 'Quoter', ('address', 'address'), (factory.address, weth.address))
+
+    factory.createPool(usdc.address, weth.address, FEE)
+    pool_abi, _ = load_artifact(artifacts, 'UniswapV3Pool')
+    pool = boa.loads_abi(pool_abi, name='UniswapV3Pool').at(factory.getPool(usdc.address, weth.address, FEE))
+    sqrt_price = start_price(usdc.address, weth.address)
+    pool.initialize(sqrt_price)
+
+    minter = boa.loads(MINTER)
+    for token in (usdc, weth):
+        token.mint(minter.address, 10**40)
+    center = get_tick_at_sqrt_ratio(sqrt_price) // TICK_SPACING * TICK_SPACING
+    for lower, upper, liquidity in POSITIONS:
+        minter.mint(pool.address, center + lower, center + upper, liquidity)
+
+    token0, token1 = pool.token0(), pool.token1()
+    state = load_pools(Multicall(Web3(chain_reader(pool))), {pool.address: (token0, token1, FEE)},
+                       word_radius=4)[pool.address]
+
+    tokens = {'usdc': (usdc.address, 6), 'weth': (weth.address, 18)}
+    quotes = []
+    for token, amount, exact_output in QUOTES:
+        (token_in, _), (token_out, out_decimals) = (tokens['weth'], tokens['usdc']) if token == 'weth' else \
+            (tokens['usdc'], tokens['weth'])
+        if exact_output:
+            amount_out = int(amount * 10**out_decimals)
+            amount_in = quoter.quoteExactOutputSingle(token_in, token_out, FEE, amount_out, 0)
+        else:
+            amount_in = int(amount * 10**tokens[token][1])
+            amount_out = quoter.quoteExactInputSingle(token_in, token_out, FEE, amount_in, 0)
+        quotes.append({'token_in': Web3.to_checksum_address(token_in), 'amount_in': str(amount_in),
+                       'amount_out': str(amount_out), 'exact_output': exact_output})
+
+    path = os.path.join(HERE, 'uniswap_v3_pool.json')
+    record_fixture(path, state, quotes)
+    print(f"Recorded {len(quotes)} QuoterV1 quotes for pool {pool.address} to {path}")
+
+if __name__ == "__main__":
+    main(sys.argv[1])
@@ -0,0 +1,122 @@
+"""PriceMatrix opportunity search against the pairwise dict loop it replaced"""
+import random
+
+import pytest
+
+from pricer_core.arb import find_arbitrage_opportunities
+from pricer_core.arb_matrix import PriceMatrix, find_opportunities, price_assets
+
+def dict_loop(pools, assets=('eth',)):
+    """
+    The original find_arbitrage_opportunities, run per asset: every pair of
+    pools both ways, a leg skipped when either pool lacks the quote it needs
+    """
+    opportunities = []
+    pools = [pool for pool in pools if pool]
+    for asset in (assets if assets is not None else price_assets(pools)):
+        buy, sell = f"{asset}_buy", f"{asset}_sell"
+        for i, pool1 in enumerate(pools):
+            for pool2 in pools[i + 1:]:
+                for low, high in ((pool1, pool2), (pool2, pool1)):
+                    if buy not in low or sell not in high:
+                        continue
+                    profit = high[sell] - low[buy]
+                    if profit > 0:
+                        opportunities.append({
+                            'asset': asset,
+                            'buy_pool': low['name'],
+                            'sell_pool': high['name'],
+                            'buy_price': low[buy],
+                            'sell_price': high[sell],
+                            f'profit_per_{asset}': profit,
+                            'profit_percentage': (profit / low[buy]) * 100
+                        })
+    return opportunities
+
+def rows(opportunities):
+    return sorted(tuple(sorted(opp.items())) for opp in opportunities)
+
+def pool(name, **prices):
+    return {'name': name, **prices}
+
+POOL_SETS = {
+    'mainnet venues': [
+        pool('Curve', eth_buy=3001.2, eth_sell=2999.8, wbtc_buy=60010.0, wbtc_sell=59990.0),
+        pool('Uniswap', eth_buy=3003.5, eth_sell=3002.9),
+        pool('Coinbase', eth_buy=2998.0, eth_sell=2997.5, wbtc_buy=60050.0, wbtc_sell=60040.0),
+    ],
+    'duplicate venue names': [
+        pool('Uniswap', eth_buy=3000.0, eth_sell=2999.0),
+        pool('Uniswap', eth_buy=3010.0, eth_sell=3009.0),
+        pool('Uniswap', eth_buy=2990.0, eth_sell=2989.5),
+        pool('Curve', eth_buy=3005.0, eth_sell=3004.0),
+    ],
+    'one-sided quotes': [
+        pool('GMX', eth_sell=3020.0),
+        pool('Curve', eth_buy=3001.0, eth_sell=3000.0, wbtc_buy=60000.0),
+        pool('Uniswap', eth_buy=2995.0),
+        pool('Coinbase', eth_buy=3010.0, eth_sell=3009.0, wbtc_sell=60100.0),
+    ],
+    'empty entries': [None, pool('Curve', eth_buy=3001.0, eth_sell=3000.0), {},
+                      pool('Uniswap', eth_buy=2990.0, eth_sell=2989.0)],
+    'no spread': [pool('Curve', eth_buy=3001.0, eth_sell=2999.0), pool('Uniswap', eth_buy=3001.0, eth_sell=2999.0)],
+    'single pool': [pool('Curve', eth_buy=2990.0, eth_sell=3010.0)],
+}
+
+def random_pools(seed: int):
+    rng = random.Random(seed)
+    pools = []
+    for k in range(rng.randint(2, 12)):
+        prices = {}
+        for asset, mid in (('eth', 3000.0), ('wbtc', 60000.0), ('arb', 1.2)):
+            if rng.random() < 0.3:
+                continue
+            price = mid * (1 + rng.uniform(-0.01, 0.01))
+            if rng.random() < 0.85:
+                prices[f'{asset}_buy'] = price * (1 + rng.uniform(0, 0.002))
+            if rng.random() < 0.85:
+                prices[f'{asset}_sell'] = price * (1 - rng.uniform(0, 0.002))
+        pools.append(pool(rng.choice(['Curve', 'Uniswap', 'Coinbase', 'GMX', f'pool{k}']), **prices))
+    return pools
+
+@pytest.mark.parametrize('pools', list(POOL_SETS.values()) + [random_pools(seed) for seed in range(20)],
+                         ids=list(POOL_SETS) + [f'random {seed}' for seed in range(20)])
+@pytest.mark.parametrize('assets', [('eth',), None])
+def test_matches_dict_loop(pools, assets):
+    opportunities = find_arbitrage_opportunities(pools, assets=assets)
+    assert rows(opportunities) == rows(dict_loop(pools, assets))
+    pcts = [opp['profit_percentage'] for opp in opportunities]
+    assert pcts == sorted(pcts, reverse=True)
+
+def test_duplicate_names_compare_every_pool():
+    """Pools sharing a venue name are still different pools: the cheapest Uniswap pool sells into the dearest"""
+    opportunities = find_arbitrage_opportunities(POOL_SETS['duplicate venue names'])
+    best = opportunities[0]
+    assert (best['buy_pool'], best['sell_pool']) == ('Uniswap', 'Uniswap')
+    assert (best['buy_price'], best['sell_price']) == (2990.0, 3009.0)
+    # Each pool's own sell beats its buy, but a pool is never traded against itself: only the two cross legs
+    crossed = [pool('Curve', eth_buy=2990.0, eth_sell=3010.0), pool('Curve', eth_buy=2990.0, eth_sell=3010.0)]
+    assert len(find_arbitrage_opportunities(crossed)) == 2
+
+def test_one_sided_quotes_only_trade_their_side():
+    opportunities = find_arbitrage_opportunities(POOL_SETS['one-sided quotes'], assets=['eth', 'wbtc'])
+    assert not any(opp['buy_pool'] == 'GMX' or opp['sell_pool'] == 'Uniswap' for opp in opportunities)
+    assert {(opp['asset'], opp['buy_pool'], opp['sell_pool']) for opp in opportunities if opp['asset'] == 'wbtc'} \
+        == {('wbtc', 'Curve', 'Coinbase')}
+    assert price_assets(POOL_SETS['one-sided quotes']) == ['eth']  # no single pool quotes both wbtc sides
+
+@pytest.mark.parametrize('seed', range(5))
+def test_min_profit_and_top_k_match_filtered_loop(seed):
+    pools = random_pools(100 + seed)
+    expected = sorted(dict_loop(pools, None), key=lambda opp: -opp['profit_percentage'])
+    threshold = 0.1
+    assert rows(find_arbitrage_opportunities(pools, assets=None, min_profit_pct=threshold)) == \
+        rows([opp for opp in expected if opp['profit_percentage'] > threshold])
+    top = find_arbitrage_opportunities(pools, assets=None, top_k=3)
+    assert [opp['profit_percentage'] for opp in top] == [opp['profit_percentage'] for opp in expected[:3]]
+
+def test_matrix_shape_and_missing_quotes():
+    matrix = PriceMatrix.from_pools(POOL_SETS['one-sided quotes'], assets=['eth', 'wbtc'])
+    assert matrix.names == ['GMX', 'Curve', 'Uniswap', 'Coinbase']
+    assert matrix.buy.shape == matrix.sell.shape == (4, 2)
+    assert len(find_opportunities(matrix)) == len(dict_loop(POOL_SETS['one-sided quotes'], ['eth', 'wbtc']))
@@ -0,0 +1,99 @@
+"""BlockScheduler following FakeHeadFeed: heads that arrive during a slow cycle collapse to the newest"""
+import asyncio
+
+import pytest
+
+from pricer_core.block_scheduler import BlockScheduler
+from services.local_chain import FakeHeadFeed, LocalChainProvider
+
+START = 100
+
+class FailingFeed(FakeHeadFeed):
+    """FakeHeadFeed whose connection drops after its last head"""
+    async def __aiter__(self):
+        async for block in super().__aiter__():
+            yield block
+        raise ConnectionError("websocket closed")
+
+def run(scheduler: BlockScheduler, cycle, **kwargs):
+    asyncio.run(scheduler.run(cycle, **kwargs))
+
+def test_burst_during_slow_cycle_processes_newest_head():
+    chain = LocalChainProvider(block_number=START)
+    scheduler = BlockScheduler(FakeHeadFeed(START, 10, chain=chain))
+    processed, head_after = [], []
+
+    async def cycle(block):
+        processed.append(block)
+        await asyncio.sleep(0.05)  # the whole burst arrives while the first cycle runs
+        head_after.append(chain.block_number)
+
+    run(scheduler, cycle)
+    assert processed == [START, START + 9]
+    assert head_after[0] == START + 9
+    assert scheduler.stats.processed == 2
+    assert scheduler.stats.dropped == 8
+    assert scheduler.stats.last_block == START + 9
+
+def test_fast_cycle_keeps_every_head():
+    scheduler = BlockScheduler(FakeHeadFeed(START, 5, block_time=0.01))
+    processed = []
+
+    async def cycle(block):
+        processed.append(block)
+
+    run(scheduler, cycle)
+    assert processed == list(range(START, START + 5))
+    assert scheduler.stats.processed == 5 and scheduler.stats.dropped == 0
+
+def test_slow_cycle_drops_heads_between_cycles():
+    scheduler = BlockScheduler(FakeHeadFeed(START, 12, block_time=0.01))
+    processed = []
+
+    async def cycle(block):
+        processed.append(block)
+        await asyncio.sleep(0.035)
+
+    run(scheduler, cycle)
+    assert processed[0] == START and processed[-1] == START + 11
+    assert all(later > earlier for earlier, later in zip(processed, processed[1:]))
+    assert len(processed) < 12
+    assert scheduler.stats.processed + scheduler.stats.dropped == 12
+
+def test_every_n_blocks():
+    scheduler = BlockScheduler(FakeHeadFeed(START, 7, block_time=0.01), every_n_blocks=3)
+    processed = []
+
+    async def cycle(block):
+        processed.append(block)
+
+    run(scheduler, cycle)
+    assert processed == [START, START + 3, START + 6]
+    assert scheduler.stats.dropped == 0
+
+def test_cycle_error_does_not_stop_scheduler():
+    scheduler = BlockScheduler(FakeHeadFeed(START, 3, block_time=0.01))
+    processed = []
+
+    async def cycle(block):
+        processed.append(block)
+        if block == START:
+            raise ValueError("pool state unavailable")
+
+    run(scheduler, cycle)
+    assert processed == [START, START + 1, START + 2]
+    assert scheduler.stats.processed == 3
+
+def test_feed_error_is_reraised_after_last_head():
+    scheduler = BlockScheduler(FailingFeed(START, 4))
+    finished = []
+
+    async def cycle(block):
+        await asyncio.sleep(0.05)
+        finished.append(block)
+
+    with pytest.raises(ConnectionError, match="websocket closed"):
+        run(scheduler, cycle)
+    # The cycle running when the feed failed completes and the newest head it delivered is still processed
+    assert finished == [START, START + 3]
+    assert scheduler.stats.processed == 2 and scheduler.stats.dropped == 2
@@ -0,0 +1,133 @@
+"""Tricrypto-NG quotes from CryptoSwapPool against the vendored Vyper Views/Math contracts under titanoboa"""
+import os
+
+import pytest
+
+boa = pytest.importorskip("boa")
+
+from services import cryptoswap_math
+from services.cryptoswap_pool import CryptoSwapPool
+
+VYPER_SOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..',
+                             'curve examples', 'metaregistry', 'contracts', 'amms', 'tricryptong')
+
+# The getters CurveCryptoViews3Optimized reads, over an arbitrary state instead of a mainnet fork
+STUB_POOL = """
+# pragma version 0.3.10
+interface Math:
+    def reduction_coefficient(x: uint256[3], fee_gamma: uint256) -> uint256: view
+
+MATH: public(address)
+A: public(uint256)
+gamma: public(uint256)
+D: public(uint256)
+future_A_gamma_time: public(uint256)
+totalSupply: public(uint256)
+mid_fee: public(uint256)
+out_fee: public(uint256)
+fee_gamma: public(uint256)
+_balances: uint256[3]
+_precisions: uint256[3]
+_price_scale: uint256[2]
+
+@external
+def __init__(_math: address, _balances: uint256[3], _precisions: uint256[3], _price_scale: uint256[2],
+             _D: uint256, _A: uint256, _gamma: uint256, _mid_fee: uint256, _out_fee: uint256, _fee_gamma: uint256):
+    self.MATH = _math
+    self._balances = _balances
+    self._precisions = _precisions
+    self._price_scale = _price_scale
+    self.D = _D
+    self.A = _A
+    self.gamma = _gamma
+    self.mid_fee = _mid_fee
+    self.out_fee = _out_fee
+    self.fee_gamma = _fee_gamma
+
+@view
+@external
+def balances(i: uint256) -> uint256:
+    return self._balances[i]
+
+@view
+@external
+def precisions() -> uint256[3]:
+    return self._precisions
+
+@view
+@external
+def price_scale(k: uint256) -> uint256:
+    return self._price_scale[k]
+
+@view
+@external
+def fee_calc(xp: uint256[3]) -> uint256:
+    f: uint256 = Math(self.MATH).reduction_coefficient(xp, self.fee_gamma)
+    return (self.mid_fee * f + self.out_fee * (10**18 - f)) / 10**18
+"""
+
+def pool(balances, price_scale):
+    """tricrypto-USDC parameters (USDC/WBTC/ETH) with balances in whole tokens"""
+    state = CryptoSwapPool(
+        address='0x' + '00' * 20,
+        balances=[balances[0] * 10**6, int(balances[1] * 10**8), balances[2] * 10**18],
+        precisions=[10**12, 10**10, 1],
+        price_scale=[p * 10**18 for p in price_scale],
+        D=0, A=1_707_629, gamma=11_809_167_828_997, mid_fee=1_000_000, out_fee=140_000_000,
+        fee_gamma=500_000_000_000_000, future_A_gamma_time=0, timestamp=0, block_number=0
+    )
+    state.D = state._newton_D(state.xp(state.balances))
+    return state
+
+POOLS = {
+    'balanced': pool([10_000_000, 166.67, 3_333], [60_000, 3_000]),
+    'imbalanced': pool([14_000_000, 120, 3_000], [60_000, 3_000]),
+    'thin': pool([200_000, 3.5, 70], [65_000, 2_800]),
+}
+
+# (i, j, whole tokens of coin i)
+TRADES = [(0, 2, 3_000), (2, 0, 1), (0, 1, 50_000), (1, 0, 0.05), (1, 2, 2), (2, 1, 40), (0, 2, 100_000)]
+DECIMALS = [6, 8, 18]
+
+@pytest.fixture(scope='module')
+def contracts():
+    return (boa.load(os.path.join(VYPER_SOURCES, 'CurveCryptoMathOptimized3.vy')),
+            boa.load(os.path.join(VYPER_SOURCES, 'CurveCryptoViews3Optimized.vy')))
+
+def deploy_stub(vy_math, state: CryptoSwapPool):
+    return boa.loads(STUB_POOL, vy_math.address, state.balances, state.precisions, state.price_scale,
+                     state.D, state.A, state.gamma, state.mid_fee, state.out_fee, state.fee_gamma)
+
+@pytest.mark.parametrize('name', POOLS)
+def test_newton_D_matches_vyper(contracts, name):
+    vy_math, _ = contracts
+    state = POOLS[name]
+    xp = state.xp(state.balances)
+    assert cryptoswap_math.newton_D3(state.A, state.gamma, xp, 0) == vy_math.newton_D(state.A, state.gamma, xp, 0)
+
+@pytest.mark.parametrize('name', POOLS)
+@pytest.mark.parametrize('i, j, amount', TRADES)
+def test_get_y_and_get_dy_match_vyper(contracts, name, i, j, amount):
+    vy_math, views = contracts
+    state = POOLS[name]
+    dx = int(amount * 10**DECIMALS[i])
+
+    balances = list(state.balances)
+    balances[i] += dx
+    xp = state.xp(balances)
+    assert list(cryptoswap_math.get_y3(state.A, state.gamma, xp, state.D, j)) == \
+        list(vy_math.get_y(state.A, state.gamma, xp, state.D, j))
+
+    stub = deploy_stub(vy_math, state)
+    assert state.get_dy(i, j, dx) == views.get_dy(i, j, dx, stub.address)
+
+@pytest.mark.parametrize('name', POOLS)
+@pytest.mark.parametrize('i, j, amount', TRADES)
+def test_get_dx_matches_vyper(contracts, name, i, j, amount):
+    vy_math, views = contracts
+    state = POOLS[name]
+    # Ask for what selling amount of coin i would give, so every case is within the pool's depth
+    dy = state.get_dy(i, j, int(amount * 10**DECIMALS[i]))
+
+    stub = deploy_stub(vy_math, state)
+    assert state.get_dx(i, j, dy) == views.get_dx(i, j, dy, stub.address)
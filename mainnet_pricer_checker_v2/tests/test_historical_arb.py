@@ -0,0 +1,169 @@
+"""Blocks priced concurrently on the backtest thread pool each get their own block's prices"""
+import pytest
+import requests
+from web3 import Web3
+
+from pricer_core.backtest import iter_batches
+from services.local_chain import LocalChainProvider
+
+USDT = Web3.to_checksum_address("0xdAC17F958D2ee523a2206206994597C13D831ec7")
+BLOCKS = list(range(20_000_000, 20_000_040))
+
+def eth_price(block: int) -> int:
+    """USDC per ETH, different at every block"""
+    return 2000 + block % 1000
+
+def wbtc_price(block: int) -> int:
+    return 30 * eth_price(block)
+
+@pytest.fixture
+def chain(tmp_path, monkeypatch):
+    """A LocalChainProvider pricing every pool by block, behind the pricing modules' w3"""
+    monkeypatch.chdir(tmp_path)  # pool metadata and block index files land here
+    import curve_get_price
+    import historical_arb
+    import uniswap
+
+    provider = LocalChainProvider(block_number=BLOCKS[-1] + 100)
+    decimals = {curve_get_price.USDC: 6, USDT: 6, curve_get_price.WBTC: 8, uniswap.WETH: 18}
+    for token, d in decimals.items():
+        provider.register(token, "decimals()", ['uint8'], lambda block, d=d: d)
+
+    for pool, indices in curve_get_price.CURVE_POOLS.items():
+        coins = [curve_get_price.USDC if 'USDC' in indices else USDT, curve_get_price.WBTC, uniswap.WETH]
+
+        def get_dy(block, i, j, dx, coins=coins):
+            value = [1, wbtc_price(block), eth_price(block)]
+            return dx * value[i] * 10**decimals[coins[j]] // (value[j] * 10**decimals[coins[i]])
+
+        provider.register(pool, curve_get_price.GET_DY_SIGNATURE, ['uint256'], get_dy)
+        provider.register(pool, "coins(uint256)", ['address'], lambda block, i, coins=coins: coins[i])
+
+    for pool in uniswap.UNISWAP_POOLS:
+        provider.register(pool, "token0()", ['address'], lambda block: uniswap.USDC)
+        provider.register(pool, "token1()", ['address'], lambda block: uniswap.WETH)
+        provider.register(pool, "fee()", ['uint24'], lambda block: 500)
+
+    def quote(block, token_in, token_out, fee, amount, limit):
+        if token_in.lower() == uniswap.WETH.lower():
+            return amount * eth_price(block) * 10**6 // 10**18
+        return amount * 10**18 // (eth_price(block) * 10**6)
+
+    provider.register(uniswap.QUOTER_ADDRESS, uniswap.QUOTE_SIGNATURE, ['uint256'], quote)
+
+    w3 = Web3(provider)
+    for module in (curve_get_price, uniswap, historical_arb):
+        monkeypatch.setattr(module, 'w3', w3)
+    return provider
+
+def price_blocks(fetch):
+    """fetch(block) for every block, ten at a time on the backtest thread pool, by block"""
+    batches = [(k, BLOCKS[k * 10:(k + 1) * 10]) for k in range(len(BLOCKS) // 10)]
+    results = {}
+    for (_, blocks), (_, chunk_results) in zip(batches, iter_batches(fetch, batches, max_workers=10)):
+        results.update(zip(blocks, chunk_results))
+    return results
+
+def assert_eth_prices(prices, block):
+    assert prices['eth_sell'] == pytest.approx(eth_price(block))
+    assert prices['eth_buy'] == pytest.approx(eth_price(block))
+
+def test_get_curve_prices_per_block(chain):
+    from curve_get_price import CURVE_POOLS, get_curve_prices
+
+    results = price_blocks(lambda block: get_curve_prices(block_identifier=block))
+    for block, pool_prices in results.items():
+        assert set(pool_prices) == set(CURVE_POOLS)
+        for prices in pool_prices.values():
+            assert_eth_prices(prices, block)
+            assert prices['wbtc_sell'] == pytest.approx(wbtc_price(block))
+            assert prices['wbtc_buy'] == pytest.approx(wbtc_price(block))
+
+def test_get_uniswap_prices_per_block(chain):
+    from uniswap import UNISWAP_POOLS, get_uniswap_prices
+
+    results = price_blocks(lambda block: get_uniswap_prices(block_identifier=block))
+    for block, pool_prices in results.items():
+        assert set(pool_prices) == set(UNISWAP_POOLS)
+        for prices in pool_prices.values():
+            assert_eth_prices(prices, block)
+
+def test_get_prices_at_block_per_block(chain):
+    from curve_get_price import CURVE_POOLS
+    from historical_arb import get_prices_at_block
+    from uniswap import UNISWAP_POOLS
+
+    results = price_blocks(get_prices_at_block)
+    for block, snapshot in results.items():
+        assert len(snapshot) == len(CURVE_POOLS) + len(UNISWAP_POOLS)
+        for prices in snapshot:
+            assert prices['block'] == block
+            assert_eth_prices(prices, block)
+
+    # Every call was pinned to one of the requested blocks, none fell back to latest
+    pinned = {int(params[1], 16) for method, params in chain.requests if method == 'eth_call'}
+    assert pinned <= set(BLOCKS)
+
+def test_failed_block_leaves_chunk_pending(chain, monkeypatch):
+    import historical_arb
+    from pricer_core.backtest import BacktestStore, run_backtest
+
+    # One sample per block, so a sample's timestamp is its block
+    monkeypatch.setattr(historical_arb, 'get_block_by_timestamp', lambda timestamp: timestamp)
+    store = BacktestStore('backtest.sqlite')
+    job = store.job('mainnet', BLOCKS[0], BLOCKS[-1], 1, 10)
+
+    chain.failing_blocks.add(BLOCKS[15])
+    summary = run_backtest(store, job, historical_arb.fetch_block_data)
+    assert summary == {'chunks': 4, 'failed_chunks': 1}
+    assert set(store.completed_chunks(job)) == {0, 2, 3}
+
+    # The next run retries just that chunk
+    chain.failing_blocks.clear()
+    summary = run_backtest(store, job, historical_arb.fetch_block_data)
+    assert summary == {'chunks': 4, 'failed_chunks': 0}
+    assert store.completed_chunks(job) == {0: 10, 1: 10, 2: 10, 3: 10}
+    assert [block for _, block, _ in store.results(job)] == BLOCKS
+
+def test_get_prices_at_block_rejects_missing_pool(chain):
+    from curve_get_price import CURVE_POOLS, GET_DY_SIGNATURE
+    from historical_arb import get_prices_at_block
+    from uniswap import UNISWAP_POOLS
+
+    pool = next(iter(CURVE_POOLS))
+    key = (pool.lower(), bytes(Web3.keccak(text=GET_DY_SIGNATURE)[:4]))
+    handler, input_types, output_types = chain.handlers[key]
+
+    def get_dy(block, *args):
+        if block == BLOCKS[5]:
+            raise ValueError("pool reverted")
+        return handler(block, *args)
+
+    chain.handlers[key] = (get_dy, input_types, output_types)
+    assert len(get_prices_at_block(BLOCKS[4])) == len(CURVE_POOLS) + len(UNISWAP_POOLS)
+    with pytest.raises(ValueError, match=pool):
+        get_prices_at_block(BLOCKS[5])
+
+def test_pricing_raises_rpc_errors(chain):
+    from curve_get_price import get_curve_prices
+    from uniswap import get_uniswap_prices
+
+    chain.failing_blocks.add(BLOCKS[0])
+    for fetch in (get_curve_prices, get_uniswap_prices):
+        with pytest.raises(requests.ConnectionError):
+            fetch(block_identifier=BLOCKS[0])
+
+def test_pricing_raises_when_circuit_open(chain):
+    import curve_get_price
+    import uniswap
+    from pricer_core.rpc_guard import CircuitOpenError, RpcGuard, guard_web3
+
+    guard = RpcGuard()
+    guard_web3(curve_get_price.w3, guard)
+    curve_get_price.get_curve_prices(block_identifier=BLOCKS[0])  # warms pool metadata while the circuit is closed
+    uniswap.get_uniswap_prices(block_identifier=BLOCKS[0])
+    for _ in range(guard.breaker.failure_threshold):
+        guard.breaker.record_failure()
+    for fetch in (curve_get_price.get_curve_prices, uniswap.get_uniswap_prices):
+        with pytest.raises(CircuitOpenError):
+            fetch(block_identifier=BLOCKS[1])
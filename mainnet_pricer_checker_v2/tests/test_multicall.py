@@ -0,0 +1,111 @@
+"""Multicall3 batching against AsyncLocalChainProvider, the way the live snapshot runs it"""
+import asyncio
+
+import pytest
+from web3 import AsyncWeb3, Web3
+
+from pricer_core.multicall import (
+    MULTICALL3_ADDRESS, AsyncMulticall, Call, Multicall, MulticallResult, collect_results, decode_aggregate3,
+    encode_aggregate3
+)
+from services.local_chain import AsyncLocalChainProvider, LocalChainProvider
+
+POOL = Web3.to_checksum_address('0x' + '11' * 20)
+TOKEN = Web3.to_checksum_address('0x' + '22' * 20)
+BLOCK = 19_000_000
+
+@pytest.fixture
+def chain():
+    chain = LocalChainProvider(block_number=BLOCK)
+    chain.register(POOL, "get_dy(uint256,uint256,uint256)", ['uint256'], lambda block, i, j, dx: dx * 2 + block)
+    chain.register(POOL, "coins(uint256)", ['address'], lambda block, i: TOKEN)
+    chain.register(TOKEN, "decimals()", ['uint8'], lambda block: 6)
+
+    def revert(block):
+        raise ValueError("always reverts")
+
+    chain.register(POOL, "fee()", ['uint256'], revert)
+    return chain
+
+def async_multicall(chain: LocalChainProvider, batch_size: int = 100) -> AsyncMulticall:
+    return AsyncMulticall(AsyncWeb3(AsyncLocalChainProvider(chain)), batch_size=batch_size)
+
+def get_dy(dx: int, key=None) -> Call:
+    return Call(POOL, "get_dy(uint256,uint256,uint256)", (0, 1, dx), key=key)
+
+def test_encode_decode_aggregate3_round_trip():
+    calls = [get_dy(10), Call(TOKEN, "decimals()", output_types=('uint8',))]
+    raw = encode_aggregate3(calls)
+    assert raw[:4] == bytes(Web3.keccak(text="aggregate3((address,bool,bytes)[])")[:4])
+
+    # The chain decodes the batch, runs every call and encodes (success, returndata) pairs
+    chain = LocalChainProvider(block_number=BLOCK)
+    chain.register(POOL, "get_dy(uint256,uint256,uint256)", ['uint256'], lambda block, i, j, dx: dx * 3)
+    chain.register(TOKEN, "decimals()", ['uint8'], lambda block: 8)
+    responses = decode_aggregate3(chain._call(MULTICALL3_ADDRESS, raw, BLOCK))
+    assert [success for success, _ in responses] == [True, True]
+    assert [call.decode(data) for call, (_, data) in zip(calls, responses)] == [30, 8]
+
+def test_collect_results_maps_failures_to_none():
+    calls = [get_dy(1, key='ok'), get_dy(2, key='reverted'),
+             Call(POOL, "coins(uint256)", (0,), ('address',), key='bad data'), get_dy(3)]
+    responses = [(True, (7).to_bytes(32, 'big')), (False, b''), (True, b'\x01'), (True, (9).to_bytes(32, 'big'))]
+    result = MulticallResult(block_number=BLOCK)
+    collect_results(result, calls, responses, offset=10)
+
+    assert result.get('ok') == 7
+    assert result.get('reverted') is None and result.get('bad data') is None
+    assert result.get(13) == 9  # keyless calls are keyed by their position in the whole aggregate
+    assert result.failed == ['reverted', 'bad data']
+
+def test_async_aggregate_pins_block_and_maps_reverts(chain):
+    calls = [get_dy(dx, key=('dy', dx)) for dx in range(5)] + [
+        Call(POOL, "fee()", key='fee'),
+        Call(POOL, "coins(uint256)", (0,), ('address',), key='coin'),
+        Call(TOKEN, "decimals()", output_types=('uint8',), key='decimals'),
+    ]
+    result = asyncio.run(async_multicall(chain, batch_size=3).aggregate(calls, BLOCK - 5))
+
+    assert result.block_number == BLOCK - 5
+    assert [result.get(('dy', dx)) for dx in range(5)] == [dx * 2 + BLOCK - 5 for dx in range(5)]
+    assert result.get('coin') == TOKEN and result.get('decimals') == 6
+    assert result.get('fee') is None and result.failed == ['fee']
+    # 8 calls in batches of 3, every batch at the pinned block
+    eth_calls = [params for method, params in chain.requests if method == 'eth_call']
+    assert len(eth_calls) == 3
+    assert {params[1] for params in eth_calls} == {hex(BLOCK - 5)}
+
+def test_async_aggregate_resolves_latest_once(chain):
+    result = asyncio.run(async_multicall(chain, batch_size=2).aggregate([get_dy(dx) for dx in range(4)]))
+    assert result.block_number == BLOCK
+    assert chain.rpc_count('eth_blockNumber') == 1
+    assert [result.get(k) for k in range(4)] == [dx * 2 + BLOCK for dx in range(4)]
+
+def test_async_aggregate_whole_batch_failure(chain):
+    """A batch whose eth_call fails marks every call in it failed, other batches still return"""
+    calls = [get_dy(dx, key=dx) for dx in range(4)]
+    multicall = async_multicall(chain, batch_size=2)
+    chain.failing_blocks.add(BLOCK - 1)
+    result = asyncio.run(multicall.aggregate(calls, BLOCK - 1))
+    assert result.results == {0: None, 1: None, 2: None, 3: None}
+    assert result.failed == [0, 1, 2, 3]
+
+    # One failing batch out of two: only its calls are lost
+    original = chain._call
+
+    def fail_second_batch(to, data, block_number):
+        if to.lower() == multicall.address.lower() and data == encode_aggregate3(calls[2:]):
+            raise ValueError("batch too large")
+        return original(to, data, block_number)
+
+    chain._call = fail_second_batch
+    result = asyncio.run(multicall.aggregate(calls, BLOCK))
+    assert [result.get(k) for k in range(4)] == [BLOCK, 2 + BLOCK, None, None]
+    assert result.failed == [2, 3]
+
+def test_sync_and_async_aggregate_agree(chain):
+    calls = [get_dy(dx, key=dx) for dx in range(7)] + [Call(POOL, "fee()", key='fee')]
+    sync = Multicall(Web3(chain), batch_size=3).aggregate(calls, BLOCK)
+    async_result = asyncio.run(async_multicall(chain, batch_size=3).aggregate(calls, BLOCK))
+    assert sync.results == async_result.results
+    assert sync.failed == async_result.failed
@@ -0,0 +1,108 @@
+"""StableSwap-NG quotes from the Python port against the vendored Vyper Views/Math contracts under titanoboa"""
+import os
+
+import pytest
+
+boa = pytest.importorskip("boa")
+
+from services import stableswap_ng_math as math
+from services.stableswap_ng_pool import StableSwapNGPool
+
+VYPER_SOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..',
+                             'curve examples', 'metaregistry', 'contracts', 'amms', 'stableswapng')
+
+# The getters CurveStableSwapNGViews reads, over an arbitrary state instead of a mainnet fork
+STUB_POOL = """
+# pragma version 0.3.10
+N_COINS: public(uint256)
+A: public(uint256)
+fee: public(uint256)
+offpeg_fee_multiplier: public(uint256)
+rates: DynArray[uint256, 8]
+balances: DynArray[uint256, 8]
+
+@external
+def __init__(_rates: DynArray[uint256, 8], _balances: DynArray[uint256, 8],
+             _A: uint256, _fee: uint256, _offpeg_fee_multiplier: uint256):
+    self.N_COINS = len(_balances)
+    self.rates = _rates
+    self.balances = _balances
+    self.A = _A
+    self.fee = _fee
+    self.offpeg_fee_multiplier = _offpeg_fee_multiplier
+
+@view
+@external
+def stored_rates() -> DynArray[uint256, 8]:
+    return self.rates
+
+@view
+@external
+def get_balances() -> DynArray[uint256, 8]:
+    return self.balances
+"""
+
+def pool(decimals, balances, A, fee=1_000_000, offpeg_fee_multiplier=20_000_000_000):
+    """A pool holding balances in whole tokens of the given decimals"""
+    return StableSwapNGPool(
+        address='0x' + '00' * 20,
+        rates=[10**(36 - d) for d in decimals],
+        balances=[b * 10**d for b, d in zip(balances, decimals)],
+        A=A, fee=fee, offpeg_fee_multiplier=offpeg_fee_multiplier, block_number=0
+    )
+
+POOLS = {
+    'usdc-usdt balanced': pool([6, 6], [10_000_000, 10_000_000], 1_500),
+    'usdc-usdt off peg': pool([6, 6], [18_000_000, 2_000_000], 1_500),
+    'dai-usdc-usdt': pool([18, 6, 6], [5_000_000, 4_000_000, 6_000_000], 2_000, 500_000, 50_000_000_000),
+    'low A, thin': pool([18, 18], [50_000, 120_000], 50, 4_000_000),
+}
+
+@pytest.fixture(scope='module')
+def contracts():
+    return (boa.load(os.path.join(VYPER_SOURCES, 'CurveStableSwapNGMath.vy')),
+            boa.load(os.path.join(VYPER_SOURCES, 'CurveStableSwapNGViews.vy')))
+
+def check_against_vyper(contracts, state: StableSwapNGPool, trades):
+    """
+    Each trade is {'i', 'j', 'dx'} or {'i', 'j', 'dy'}; returns the ones where
+    the port and Vyper disagree, including get_D/get_y from CurveStableSwapNGMath.vy
+    """
+    vy_math, views = contracts
+    stub = boa.loads(STUB_POOL, state.rates, state.balances, state.A, state.fee, state.offpeg_fee_multiplier)
+
+    xp = math.xp_mem(state.rates, state.balances)
+    amp = state.A * math.A_PRECISION
+    D = math.get_D(xp, amp, state.n_coins)
+
+    mismatches = []
+    vy_D = vy_math.get_D(xp, amp, state.n_coins)
+    if vy_D != D:
+        mismatches.append({'function': 'get_D', 'python': D, 'vyper': vy_D})
+
+    for trade in trades:
+        i, j = trade['i'], trade['j']
+        if 'dx' in trade:
+            python, vyper = state.get_dy(i, j, trade['dx']), views.get_dy(i, j, trade['dx'], stub.address)
+            x = xp[i] + trade['dx'] * state.rates[i] // math.PRECISION
+            py_y, vy_y = math.get_y(i, j, x, xp, amp, D, state.n_coins), vy_math.get_y(i, j, x, xp, amp, D, state.n_coins)
+            if py_y != vy_y:
+                mismatches.append({**trade, 'function': 'get_y', 'python': py_y, 'vyper': vy_y})
+        else:
+            python, vyper = state.get_dx(i, j, trade['dy']), views.get_dx(i, j, trade['dy'], stub.address)
+        if python != vyper:
+            mismatches.append({**trade, 'python': python, 'vyper': vyper})
+    return mismatches
+
+@pytest.mark.parametrize('name', POOLS)
+@pytest.mark.parametrize('amount', [1, 3_000, 1_000_000])
+def test_matches_vyper(contracts, name, amount):
+    state = POOLS[name]
+    decimals = [36 - (len(str(rate)) - 1) for rate in state.rates]  # rates are 10**(36 - decimals)
+    trades = []
+    for i in range(state.n_coins):
+        for j in range(state.n_coins):
+            if i != j:
+                trades += [{'i': i, 'j': j, 'dx': amount * 10**decimals[i]},
+                           {'i': i, 'j': j, 'dy': min(amount * 10**decimals[j], state.balances[j] // 2)}]
+    assert check_against_vyper(contracts, state, trades) == []
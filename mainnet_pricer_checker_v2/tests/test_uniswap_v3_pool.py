@@ -0,0 +1,86 @@
+"""
+UniswapV3Pool quotes against QuoterV1: offline against the recorded
+fixtures/uniswap_v3_pool.json (see fixtures/make_uniswap_v3_fixture.py), and
+under titanoboa on a mainnet fork at the block the pool was loaded at. The
+fork tests need ALCHEMY_API_URL (an archive-capable endpoint) and boa, and
+are skipped without either.
+"""
+import json
+import os
+
+import pytest
+
+from pricer_core.chains import MAINNET
+from pricer_core.multicall import Multicall
+from services.uniswap_v3_pool import UniswapV3Pool, check_fixture, load_pools
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'uniswap_v3_pool.json')
+
+def test_fixture_matches_quoter():
+    assert check_fixture(FIXTURE) == []
+
+def test_fixture_quotes_cross_ticks(tmp_path):
+    """The initialized ticks nearest the price are each crossed by some quote: shifting one shows up as a mismatch"""
+    with open(FIXTURE, 'r') as f:
+        data = json.load(f)
+    pool = UniswapV3Pool.from_dict(data['pool'])
+    near = sorted(pool.liquidity_net, key=lambda tick: abs(tick - pool.tick))[:4]
+    for tick in near:
+        broken = UniswapV3Pool.from_dict(data['pool'])
+        broken.liquidity_net[tick] += 10**15
+        path = tmp_path / f'{tick}.json'
+        path.write_text(json.dumps({'pool': broken.to_dict(), 'quotes': data['quotes']}))
+        assert check_fixture(str(path)), f"no quote crosses tick {tick}"
+
+POOLS = {  # pool -> (token0, token1, fee)
+    '0x88e6A0c2dDD26FEEb64F039a2c41296FcB3f5640': (MAINNET.usdc, MAINNET.weth, 500),
+    '0x8ad599c3A0ff1De082011EFDDc58f1908eb6e6D8': (MAINNET.usdc, MAINNET.weth, 3000),
+}
+
+def _quote_abi(name: str, amount: str):
+    # Declared nonpayable as QuoterV1 is: it runs the swap and reverts out of the callback
+    inputs = [('tokenIn', 'address'), ('tokenOut', 'address'), ('fee', 'uint24'), (amount, 'uint256'),
+              ('sqrtPriceLimitX96', 'uint160')]
+    return {'name': name, 'type': 'function', 'stateMutability': 'nonpayable',
+            'inputs': [{'name': n, 'type': t} for n, t in inputs],
+            'outputs': [{'name': 'amount', 'type': 'uint256'}]}
+
+QUOTER_ABI = json.dumps([_quote_abi('quoteExactInputSingle', 'amountIn'),
+                         _quote_abi('quoteExactOutputSingle', 'amountOut')])
+
+@pytest.fixture(scope='module')
+def forked():
+    """Local pool models and a forked QuoterV1, both at one settled block"""
+    boa = pytest.importorskip("boa")
+    if not MAINNET.rpc_url:
+        pytest.skip(f"{MAINNET.rpc_env} is not set")
+    w3 = MAINNET.web3()
+    block = w3.eth.block_number - 64
+    pools = load_pools(Multicall(w3), POOLS, block, word_radius=4)
+    with boa.fork(MAINNET.rpc_url, block_identifier=block):
+        yield pools, boa.loads_abi(QUOTER_ABI, name='QuoterV1').at(MAINNET.quoter)
+
+# (token in, amount in whole tokens, exact output)
+CASES = [
+    ('weth', 0.001, False), ('weth', 1, False), ('weth', 500, False),
+    ('usdc', 10, False), ('usdc', 3_000, False), ('usdc', 2_000_000, False),
+    ('weth', 3_000, True),  # 3000 USDC out
+    ('usdc', 1, True),  # 1 WETH out
+]
+
+@pytest.mark.parametrize('pool_address', POOLS)
+@pytest.mark.parametrize('token, amount, exact_output', CASES)
+def test_matches_quoter(forked, pool_address, token, amount, exact_output):
+    pools, quoter = forked
+    pool = pools[pool_address]
+    token_in, token_out = (MAINNET.weth, MAINNET.usdc) if token == 'weth' else (MAINNET.usdc, MAINNET.weth)
+    fee = POOLS[pool_address][2]
+
+    if exact_output:
+        amount_out = int(amount * 10**(6 if token_out == MAINNET.usdc else 18))
+        expected = quoter.quoteExactOutputSingle(token_in, token_out, fee, amount_out, 0)
+        assert pool.quote_exact_output(token_in, amount_out) == expected
+    else:
+        amount_in = int(amount * 10**(6 if token_in == MAINNET.usdc else 18))
+        expected = quoter.quoteExactInputSingle(token_in, token_out, fee, amount_in, 0)
+        assert pool.quote_exact_input(token_in, amount_in) == expected
@@ -0,0 +1,53 @@
+"""GMXVenue keeps one blocking SDK quote in flight however often its fetch times out"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from pricer_core.venues import GMXVenue, VenueFanout
+
+class SlowRouter:
+    """GMXRouter stand-in that takes delay seconds per quote and counts overlapping calls"""
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def get_swap_quote(self, token_in, token_out, amount_in):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return {'amount_out': 2500 * amount_in if token_in == 'ETH' else amount_in / 2500}
+
+def test_gmx_keeps_one_quote_in_flight():
+    router = SlowRouter(0.1)
+    venue = GMXVenue(router, timeout=0.02)
+    fanout = VenueFanout(None, [venue])
+
+    async def follow(blocks):
+        snapshots = []
+        for block in blocks:
+            snapshots.append(await fanout.fetch_all(block))
+            await asyncio.sleep(0.02)
+        return snapshots
+
+    errors = [snapshot['errors'].get('GMX') for snapshot in asyncio.run(follow(range(20)))]
+    started = sum(1 for error in errors if error.startswith('timed out'))
+    assert all(error.startswith('timed out') or 'still running' in error for error in errors)
+    assert 'still running' in errors[1]
+    assert router.max_active == 1
+    assert router.calls <= 2 * started
+
+    # Once the running quote is done the next block gets prices again
+    venue.running.result(timeout=1)
+    venue.timeout = 1.0
+    snapshot = asyncio.run(fanout.fetch_all(21))
+    assert snapshot['errors'] == {}
+    assert snapshot['venues']['GMX']['gmx'] == {'eth_sell': pytest.approx(2500), 'eth_buy': pytest.approx(2500)}
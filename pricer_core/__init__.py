@@ -0,0 +1 @@
+# Chain-agnostic core shared by the per-chain trees (mainnet_pricer_checker_v2, arbitrum_pricer_checker_v2)
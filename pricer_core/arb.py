@@ -0,0 +1,125 @@
+from typing import Dict, List, Optional, Sequence
+import logging
+from datetime import datetime
+import os
+import asyncio
+
+from pricer_core.arb_matrix import PriceMatrix, find_opportunities, opportunities_to_dicts
+
+def opportunities_path(chain: Optional[str], day: str, log_dir: str = 'logs') -> str:
+    """JSONL file holding one day's opportunities for a chain (see OpportunitySink)"""
+    prefix = f"{chain}_" if chain else ""
+    return f'{log_dir}/opportunities_{prefix}{day}.jsonl'
+
+def setup_logging(chain: Optional[str] = None):
+    """
+    Logger writing to the console and logs/arbitrage_[chain_]{date}.log, one
+    per chain, and today's opportunities file for an OpportunitySink
+    """
+    # Create logs directory if it doesn't exist
+    log_dir = 'logs'
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+
+    # Setup logging to file
+    timestamp = datetime.now().strftime('%Y%m%d')
+    prefix = f"{chain}_" if chain else ""
+    log_file = f'{log_dir}/arbitrage_{prefix}{timestamp}.log'
+    json_file = opportunities_path(chain, timestamp, log_dir)
+
+    class CustomFormatter(logging.Formatter):
+        def format(self, record):
+            # Only add timestamp for the main header message
+            if "=== Checking prices" in record.msg:
+                self._style._fmt = '%(asctime)s\n%(message)s\n'
+            else:
+                self._style._fmt = '%(message)s'
+            return super().format(record)
+
+    # Create logger
+    logger = logging.getLogger(f"arb.{chain}" if chain else "arb")
+    if logger.handlers:
+        return logger, json_file
+
+    # Create handlers
+    file_handler = logging.FileHandler(log_file)
+    console_handler = logging.StreamHandler()
+
+    # Use the custom formatter for both handlers
+    formatter = CustomFormatter()
+    file_handler.setFormatter(formatter)
+    console_handler.setFormatter(formatter)
+
+    logger.setLevel(logging.INFO)
+    logger.addHandler(file_handler)
+    logger.addHandler(console_handler)
+    logger.propagate = False
+
+    return logger, json_file
+
+def find_arbitrage_opportunities(pools: List[Dict], assets: Optional[Sequence[str]] = ('eth',),
+                                 min_profit_pct: float = 0.0, top_k: Optional[int] = None) -> List[Dict]:
+    """
+    Find arbitrage opportunities between pools for each asset (all assets
+    quoted by any pool when assets is None), most profitable first
+    """
+    matrix = PriceMatrix.from_pools(pools, assets)
+    return opportunities_to_dicts(matrix, find_opportunities(matrix, min_profit_pct, top_k))
+
+def snapshot_pools(snapshot: Dict) -> List[Dict]:
+    """Flatten a snapshot into the pool list find_arbitrage_opportunities expects"""
+    all_pools = []
+    for name, venue_prices in snapshot['venues'].items():
+        for pool_address, prices in venue_prices.items():
+            prices['name'] = name
+            prices['pool_address'] = pool_address
+            prices['block'] = snapshot['block']
+            all_pools.append(prices)
+    return all_pools
+
+async def check_block(fanout, logger, block_number: int, sampler=None, chain: Optional[str] = None):
+    """
+    Price every venue at block_number and log any arbitrage opportunities.
+    sampler is anything with `async fetch(block_number)` returning sized
+    opportunities. Returns (snapshot, opportunities).
+    """
+    title = "Checking prices and arbitrage opportunities" + (f" ({chain})" if chain else "")
+    logger.info(f"\n=== {title} ===")
+
+    # Fetch every venue concurrently against the same block, with the size curves alongside
+    if sampler:
+        snapshot, sized = await asyncio.gather(fanout.fetch_all(block_number), sampler.fetch(block_number))
+    else:
+        snapshot, sized = await fanout.fetch_all(block_number), []
+    all_pools = snapshot_pools(snapshot)
+    logger.info(f"Block: {snapshot['block']}")
+    for venue, latency in snapshot['latency'].items():
+        error = snapshot['errors'].get(venue)
+        logger.info(f"{venue}: {latency * 1000:.0f}ms" + (f" ({error})" if error else ""))
+
+    for prices in all_pools:
+        logger.info(f"\n{prices['name']} Pool ({prices['pool_address']}):")
+        logger.info(f"ETH Sell Price: {prices['eth_sell']:.2f} USDC")
+        logger.info(f"ETH Buy Price: {prices['eth_buy']:.2f} USDC")
+
+    opportunities = find_arbitrage_opportunities(all_pools, assets=None)
+
+    if opportunities:
+        logger.info("\n=== Arbitrage Opportunities ===")
+        for opp in opportunities:
+            asset = opp['asset']
+            logger.info(f"\n{asset.upper()}: buy from {opp['buy_pool']} at {opp['buy_price']:.2f} USDC")
+            logger.info(f"Sell to {opp['sell_pool']} at {opp['sell_price']:.2f} USDC")
+            logger.info(f"Profit per {asset.upper()}: {opp[f'profit_per_{asset}']:.2f} USDC")
+            logger.info(f"Profit percentage: {opp['profit_percentage']:.2f}%")
+    else:
+        logger.info("\nNo arbitrage opportunities found")
+
+    if sized:
+        logger.info("\n=== Optimal Trade Sizes ===")
+        for opp in sized:
+            logger.info(f"\nBuy {opp['asset_amount']:.4f} ETH on {opp['buy_pool']} for {opp['amount_in']:.2f} USDC")
+            logger.info(f"Sell on {opp['sell_pool']} for {opp['amount_out']:.2f} USDC")
+            logger.info(f"Profit: {opp['profit']:.2f} USDC ({opp['profit_percentage']:.3f}%)")
+
+    return snapshot, opportunities
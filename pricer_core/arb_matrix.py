@@ -0,0 +1,97 @@
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+# One row per surviving (asset, buy venue, sell venue) opportunity
+OPPORTUNITY_DTYPE = np.dtype([
+    ('asset', np.int32),
+    ('buy', np.int32),
+    ('sell', np.int32),
+    ('buy_price', np.float64),
+    ('sell_price', np.float64),
+    ('profit', np.float64),
+    ('profit_pct', np.float64),
+])
+
+def price_assets(pools: Sequence[Dict]) -> List[str]:
+    """Assets with both a buy and a sell price in at least one pool, e.g. ['eth', 'wbtc']"""
+    assets = set()
+    for pool in pools:
+        for key in pool:
+            if key.endswith('_buy') and f"{key[:-4]}_sell" in pool:
+                assets.add(key[:-4])
+    return sorted(assets)
+
+@dataclass
+class PriceMatrix:
+    """
+    Columnar venue x asset quotes. buy[v, a] is what venue v charges for one
+    unit of asset a, sell[v, a] what it pays; NaN where a venue has no quote.
+    """
+    names: List[str]
+    assets: List[str]
+    buy: np.ndarray
+    sell: np.ndarray
+
+    @classmethod
+    def from_pools(cls, pools: Sequence[Dict], assets: Optional[Sequence[str]] = None) -> 'PriceMatrix':
+        pools = [pool for pool in pools if pool]
+        assets = list(assets) if assets is not None else price_assets(pools)
+        buy = np.full((len(pools), len(assets)), np.nan)
+        sell = np.full((len(pools), len(assets)), np.nan)
+        for v, pool in enumerate(pools):
+            for a, asset in enumerate(assets):
+                buy[v, a] = pool.get(f"{asset}_buy", np.nan)
+                sell[v, a] = pool.get(f"{asset}_sell", np.nan)
+        return cls([pool['name'] for pool in pools], assets, buy, sell)
+
+def find_opportunities(matrix: PriceMatrix, min_profit_pct: float = 0.0,
+                       top_k: Optional[int] = None) -> np.ndarray:
+    """
+    Every (asset, buy venue, sell venue) whose spread beats min_profit_pct,
+    best first, as a structured array of OPPORTUNITY_DTYPE. With top_k only
+    the k best are selected, without sorting the rest.
+    """
+    # spread[s, b, a] = sell[s, a] - buy[b, a]; NaN quotes propagate and fail the mask
+    spread = matrix.sell[:, None, :] - matrix.buy[None, :, :]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        profit_pct = spread / matrix.buy[None, :, :] * 100
+
+    mask = (spread > 0) & (profit_pct > min_profit_pct)
+    n = len(matrix.names)
+    mask &= ~np.eye(n, dtype=bool)[:, :, None]  # same venue on both legs
+
+    sell_idx, buy_idx, asset_idx = np.nonzero(mask)
+    pct = profit_pct[sell_idx, buy_idx, asset_idx]
+
+    if top_k is not None and top_k < len(pct):
+        keep = np.argpartition(-pct, top_k - 1)[:top_k]
+        sell_idx, buy_idx, asset_idx, pct = sell_idx[keep], buy_idx[keep], asset_idx[keep], pct[keep]
+    order = np.argsort(-pct, kind='stable')
+    sell_idx, buy_idx, asset_idx, pct = sell_idx[order], buy_idx[order], asset_idx[order], pct[order]
+
+    result = np.empty(len(pct), dtype=OPPORTUNITY_DTYPE)
+    result['asset'] = asset_idx
+    result['buy'] = buy_idx
+    result['sell'] = sell_idx
+    result['buy_price'] = matrix.buy[buy_idx, asset_idx]
+    result['sell_price'] = matrix.sell[sell_idx, asset_idx]
+    result['profit'] = spread[sell_idx, buy_idx, asset_idx]
+    result['profit_pct'] = pct
+    return result
+
+def opportunities_to_dicts(matrix: PriceMatrix, opportunities: np.ndarray) -> List[Dict]:
+    """Opportunity dicts in the shape arb.py logs, built only for the survivors"""
+    opportunity_dicts = []
+    for row in opportunities:
+        asset = matrix.assets[row['asset']]
+        opportunity_dicts.append({
+            'asset': asset,
+            'buy_pool': matrix.names[row['buy']],
+            'sell_pool': matrix.names[row['sell']],
+            'buy_price': float(row['buy_price']),
+            'sell_price': float(row['sell_price']),
+            f'profit_per_{asset}': float(row['profit']),
+            'profit_percentage': float(row['profit_pct'])
+        })
+    return opportunity_dicts
@@ -0,0 +1,344 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from queue import Empty
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import json
+import math
+import multiprocessing
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    start_time INTEGER NOT NULL,
+    end_time INTEGER NOT NULL,
+    interval INTEGER NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    finished REAL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    job_id INTEGER NOT NULL,
+    chunk INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    opportunities INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    completed REAL NOT NULL,
+    PRIMARY KEY (job_id, chunk)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    job_id INTEGER NOT NULL,
+    chunk INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    block INTEGER NOT NULL,
+    opportunities INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS opportunities (
+    job_id INTEGER NOT NULL,
+    chunk INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    block INTEGER NOT NULL,
+    buy_pool TEXT,
+    sell_pool TEXT,
+    profit_percentage REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_job ON samples (job_id, timestamp);
+CREATE INDEX IF NOT EXISTS opportunities_job ON opportunities (job_id, timestamp);
+"""
+
+@dataclass
+class BacktestJob:
+    """A time range sampled every interval seconds, split into chunks of chunk_size samples"""
+    id: int
+    name: str
+    start_time: int
+    end_time: int
+    interval: int
+    chunk_size: int
+
+    @property
+    def timestamps(self) -> List[int]:
+        return list(range(self.start_time, self.end_time + 1, self.interval))
+
+    def chunks(self) -> List[List[int]]:
+        timestamps = self.timestamps
+        return [timestamps[k:k + self.chunk_size] for k in range(0, len(timestamps), self.chunk_size)]
+
+class BacktestStore:
+    """
+    Append-only SQLite checkpoint store for backtests. A chunk's samples and
+    opportunities are committed in one transaction together with its row in
+    `chunks`, so after a crash a chunk is either fully stored or redone.
+    """
+    def __init__(self, path: str = "backtest.sqlite"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def job(self, name: str, start_time: int, end_time: int, interval: int, chunk_size: int,
+            resume: bool = True) -> BacktestJob:
+        """
+        The newest unfinished job called name when resuming (keeping its own
+        time range, so a restart later in the day continues the same samples),
+        otherwise a new job
+        """
+        if resume:
+            row = self.conn.execute(
+                "SELECT id, name, start_time, end_time, interval, chunk_size FROM jobs "
+                "WHERE name = ? AND finished IS NULL ORDER BY id DESC LIMIT 1", (name,)
+            ).fetchone()
+            if row:
+                return BacktestJob(*row)
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO jobs (name, start_time, end_time, interval, chunk_size, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (name, start_time, end_time, interval, chunk_size, time.time())
+            )
+        return BacktestJob(cursor.lastrowid, name, start_time, end_time, interval, chunk_size)
+
+    def completed_chunks(self, job: BacktestJob) -> Dict[int, int]:
+        """chunk -> number of samples, for every chunk already stored"""
+        rows = self.conn.execute("SELECT chunk, samples FROM chunks WHERE job_id = ?", (job.id,))
+        return dict(rows.fetchall())
+
+    def save_chunk(self, job: BacktestJob, chunk: int, results: List[Tuple], seconds: float):
+        """Store one finished chunk: (timestamp, block, opportunities, *extra) per sample"""
+        results = [result[:3] for result in results]
+        n_opportunities = sum(len(opportunities) for _, _, opportunities in results)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO samples (job_id, chunk, timestamp, block, opportunities) VALUES (?, ?, ?, ?, ?)",
+                [(job.id, chunk, timestamp, block, len(opportunities)) for timestamp, block, opportunities in results]
+            )
+            self.conn.executemany(
+                "INSERT INTO opportunities (job_id, chunk, timestamp, block, buy_pool, sell_pool, profit_percentage, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(job.id, chunk, timestamp, block, opp.get('buy_pool'), opp.get('sell_pool'),
+                  opp.get('profit_percentage'), json.dumps(opp))
+                 for timestamp, block, opportunities in results for opp in opportunities]
+            )
+            self.conn.execute(
+                "INSERT INTO chunks (job_id, chunk, samples, opportunities, seconds, completed) VALUES (?, ?, ?, ?, ?, ?)",
+                (job.id, chunk, len(results), n_opportunities, seconds, time.time())
+            )
+
+    def finish(self, job: BacktestJob):
+        with self.conn:
+            self.conn.execute("UPDATE jobs SET finished = ? WHERE id = ?", (time.time(), job.id))
+
+    def opportunities(self, job: BacktestJob) -> Iterator[Dict]:
+        """Stream a job's opportunities in time order without loading them all"""
+        cursor = self.conn.execute(
+            "SELECT data FROM opportunities WHERE job_id = ? ORDER BY timestamp", (job.id,)
+        )
+        for (data,) in cursor:
+            yield json.loads(data)
+
+    def results(self, job: BacktestJob) -> Iterator[Tuple[int, int, List[Dict]]]:
+        """Stream (timestamp, block, opportunities) for every stored sample in time order, empty samples included"""
+        samples = self.conn.execute(
+            "SELECT timestamp, block, opportunities FROM samples WHERE job_id = ? ORDER BY timestamp", (job.id,)
+        )
+        opportunities = self.conn.execute(
+            "SELECT data FROM opportunities WHERE job_id = ? ORDER BY timestamp, rowid", (job.id,)
+        )
+        for timestamp, block, n in samples:
+            yield timestamp, block, [json.loads(opportunities.fetchone()[0]) for _ in range(n)]
+
+    def export_json(self, job: BacktestJob, path: str) -> int:
+        """Write a job's opportunities as a JSON list, one row at a time; returns the count"""
+        count = 0
+        with open(path, 'w') as f:
+            f.write('[')
+            for opp in self.opportunities(job):
+                f.write(('\n  ' if count == 0 else ',\n  ') + json.dumps(opp))
+                count += 1
+            f.write('\n]\n')
+        return count
+
+class Progress:
+    """Samples/s as a moving average over chunks, and the ETA for what's left"""
+    def __init__(self, total_samples: int, done_samples: int = 0):
+        self.total = total_samples
+        self.done = done_samples
+        self.rate: Optional[float] = None  # samples per second
+
+    def update(self, samples: int, seconds: float):
+        self.done += samples
+        rate = samples / max(seconds, 1e-9)
+        self.rate = rate if self.rate is None else 0.7 * self.rate + 0.3 * rate
+
+    def report(self) -> str:
+        pct = self.done / self.total * 100 if self.total else 100.0
+        if not self.rate:
+            return f"{self.done}/{self.total} samples ({pct:.1f}%)"
+        eta = (self.total - self.done) / self.rate
+        return (f"{self.done}/{self.total} samples ({pct:.1f}%), {self.rate:.2f} samples/s, "
+                f"ETA {time.strftime('%H:%M:%S', time.gmtime(eta))}")
+
+def iter_batches(process: Callable, batches: Sequence[Tuple[int, List[int]]], per_chunk: bool = False,
+                 max_workers: int = 10) -> Iterator[Tuple[int, List]]:
+    """
+    (chunk, results) for each (chunk, timestamps) batch, in order, from one
+    thread pool: samples of a chunk run concurrently, or whole chunks with
+    per_chunk
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if per_chunk:
+            results = executor.map(process, [timestamps for _, timestamps in batches])
+        else:
+            results = (list(executor.map(process, timestamps)) for _, timestamps in batches)
+        for (chunk, _), chunk_results in zip(batches, results):
+            yield chunk, chunk_results
+
+def _process_worker(process: Callable, batches: List[Tuple[int, List[int]]], per_chunk: bool, threads: int,
+                    queue, initializer: Optional[Callable], initargs: Tuple):
+    """Body of one backtest worker process: run its batches in order and put each result on queue"""
+    try:
+        if initializer:
+            initializer(*initargs)
+        for item in iter_batches(process, batches, per_chunk, threads):
+            queue.put(item)
+    except Exception as e:
+        print(f"Error in backtest worker for chunks {batches[0][0] + 1}-{batches[-1][0] + 1}: {str(e)}")
+    finally:
+        queue.put(None)
+
+def iter_batches_in_processes(process: Callable, batches: Sequence[Tuple[int, List[int]]], per_chunk: bool = False,
+                              max_workers: int = 4, threads_per_worker: int = 1,
+                              initializer: Optional[Callable] = None, initargs: Tuple = ()) -> Iterator[Tuple[int, List]]:
+    """
+    Like iter_batches, but across max_workers spawned processes so CPU-bound
+    decoding and simulation aren't serialized by the GIL. Each worker gets
+    one contiguous range of chunks, so per-process caches (connections,
+    pool states) stay warm from one chunk to the next, and starts from a
+    fresh interpreter, so it opens its own providers; initializer(*initargs)
+    runs first in each. process must be importable (a module-level
+    function). Results arrive through one queue in completion order; a
+    chunk a worker never reported (it raised or died) is simply missing.
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    batches = list(batches)
+    size = math.ceil(len(batches) / max_workers) if batches else 1
+    workers = [context.Process(target=_process_worker, daemon=True,
+                               args=(process, batches[i:i + size], per_chunk, threads_per_worker,
+                                     queue, initializer, initargs))
+               for i in range(0, len(batches), size)]
+    for worker in workers:
+        worker.start()
+
+    running = len(workers)
+    try:
+        while running:
+            try:
+                item = queue.get(timeout=1.0)
+            except Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    break
+                continue
+            if item is None:
+                running -= 1
+            else:
+                yield item
+    finally:
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+def run_backtest(store: BacktestStore, job: BacktestJob,
+                 process: Callable[[int], Optional[Tuple]],
+                 max_workers: int = 10,
+                 on_result: Callable[[int, int, List[Dict]], None] = None,
+                 on_chunk: Callable[[int, List[Tuple]], None] = None,
+                 per_chunk: bool = False, mode: str = 'thread', threads_per_worker: int = 1,
+                 initializer: Optional[Callable] = None, initargs: Tuple = ()) -> Dict[str, int]:
+    """
+    Run every chunk of job that isn't stored yet. process(timestamp) returns
+    (timestamp, block, opportunities, *extra), or None when the sample
+    failed; a chunk with any failed sample is not stored, so the next run
+    retries it. on_chunk(chunk, results) sees the full results, extras
+    included, before the chunk is checkpointed, so side data it persists is
+    never missing for a stored chunk (at worst written twice after a crash).
+    Chunks are stored in order and, by default, only one chunk's results are
+    held in memory at a time. With per_chunk, process(timestamps) handles a
+    whole chunk and returns one result per timestamp, and up to max_workers
+    chunks run at once instead of samples. mode='process' runs max_workers
+    processes instead (see iter_batches_in_processes), each with
+    threads_per_worker threads; chunks are then stored as they finish, but
+    on_result(timestamp, block, opportunities) still sees samples in time
+    order, as finished chunks are held until the ones before them are in.
+    """
+    chunks = job.chunks()
+    completed = store.completed_chunks(job)
+    progress = Progress(len(job.timestamps), sum(completed.values()))
+    if completed:
+        print(f"Resuming job {job.name} (#{job.id}): {len(completed)}/{len(chunks)} chunks already stored")
+
+    pending = [(chunk, timestamps) for chunk, timestamps in enumerate(chunks) if chunk not in completed]
+    failed_chunks = 0
+    if mode == 'process':
+        batches = iter_batches_in_processes(process, pending, per_chunk, max_workers, threads_per_worker,
+                                            initializer, initargs)
+    elif mode == 'thread':
+        batches = iter_batches(process, pending, per_chunk, max_workers)
+    else:
+        raise ValueError(f"Unknown backtest mode {mode}, expected 'thread' or 'process'")
+
+    # on_result sees samples in time order even when chunks finish out of order (mode='process'),
+    # which streak statistics depend on: a finished chunk waits here for the chunks before it
+    order = [chunk for chunk, _ in pending]
+    held: Dict[int, List[Tuple]] = {}
+    released = 0
+
+    def release(final: bool = False):
+        nonlocal released
+        while released < len(order) and (final or order[released] in held):
+            for result in held.pop(order[released], []):
+                on_result(*result)
+            released += 1
+
+    reported = set()
+    start = time.perf_counter()
+    for chunk, results in batches:
+        reported.add(chunk)
+        # Time since the previous chunk finished, so overlapping chunks aren't double counted
+        seconds = time.perf_counter() - start
+        start = time.perf_counter()
+
+        if any(result is None for result in results):
+            failed_chunks += 1
+            failed = sum(1 for result in results if result is None)
+            print(f"Error in chunk {chunk + 1}/{len(chunks)}: {failed} samples failed, it will be retried on the next run")
+            held[chunk] = []
+            release()
+            continue
+
+        if on_chunk:
+            on_chunk(chunk, results)
+        store.save_chunk(job, chunk, results, seconds)
+        if on_result:
+            held[chunk] = [result[:3] for result in results]
+            release()
+        progress.update(len(results), seconds)
+        n_opportunities = sum(len(result[2]) for result in results)
+        print(f"Chunk {chunk + 1}/{len(chunks)} stored: {n_opportunities} opportunities, {progress.report()}")
+
+    if on_result:
+        release(final=True)  # past any chunk that never finished
+
+    missing = len(pending) - len(reported)
+    if missing:
+        failed_chunks += missing
+        print(f"Error: {missing} chunks never finished, they will be retried on the next run")
+
+    if failed_chunks == 0:
+        store.finish(job)
+    return {'chunks': len(chunks), 'failed_chunks': failed_chunks}
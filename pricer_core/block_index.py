@@ -0,0 +1,214 @@
+from web3 import Web3
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: backtest worker processes' appends aren't serialized
+    fcntl = None
+
+# One on-disk sample: a block number and its timestamp
+RECORD_DTYPE = np.dtype([('block', '<u8'), ('timestamp', '<u8')])
+
+# Blocks this close to the head can still be reorged, they are only kept in memory
+REORG_DEPTH = 64
+
+class BlockTimestampIndex:
+    """
+    Persistent block number -> timestamp samples for one chain. Every block
+    fetched while resolving a timestamp is appended to
+    block_timestamps_{chain_id}.bin, which is memory-mapped on the next run,
+    so later lookups that fall between known samples cost no RPCs.
+
+    block_at(t) brackets t between two known samples with searchsorted and
+    only fetches blocks inside that gap, guessing by interpolation on the
+    bracket's timestamps (falling back to bisection when a guess doesn't
+    halve the gap). There is no fixed lookback: timestamps older than the
+    oldest sample are found by stepping back by block_time estimates.
+    """
+    def __init__(self, w3: Web3, chain_id: Optional[int] = None, path: Optional[str] = None,
+                 block_time: float = 12.0):
+        self.w3 = w3
+        self.chain_id = chain_id if chain_id is not None else w3.eth.chain_id
+        self.path = path or f"block_timestamps_{self.chain_id}.bin"
+        self.block_time = block_time  # seconds, seeds the step back past the oldest sample
+
+        self.lookups = 0
+        self.fetches = 0  # get_block RPCs made
+
+        self._lock = threading.Lock()
+        self._base = np.zeros(0, dtype=RECORD_DTYPE)  # sorted, memory-mapped from disk
+        self._blocks: List[int] = []  # samples added this run, sorted
+        self._timestamps: List[int] = []
+        self._unsaved: List[Tuple[int, int]] = []
+        self._head: Optional[Tuple[int, int]] = None
+
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._base) + len(self._blocks)
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        Exclusive lock on {path}.lock, held while the file is appended to or
+        compacted, as several backtest worker processes share one index
+        """
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def load(self):
+        """Memory-map the index file, compacting it first if earlier runs appended out of order"""
+        with self._file_lock():
+            if not os.path.exists(self.path) or os.path.getsize(self.path) < RECORD_DTYPE.itemsize:
+                return
+            records = np.fromfile(self.path, dtype=RECORD_DTYPE)
+            blocks = records['block']
+            if len(records) > 1 and not np.all(blocks[1:] > blocks[:-1]):
+                self.compact(records)
+            self._base = np.memmap(self.path, dtype=RECORD_DTYPE, mode='r')
+
+    def compact(self, records: np.ndarray):
+        """Rewrite the file sorted by block with duplicates dropped"""
+        _, first = np.unique(records['block'], return_index=True)
+        tmp_path = f"{self.path}.tmp"
+        records[first].tofile(tmp_path)
+        os.replace(tmp_path, self.path)
+
+    def save(self):
+        """Append samples gathered since the last save"""
+        with self._lock:
+            unsaved, self._unsaved = self._unsaved, []
+        if unsaved:
+            with self._file_lock(), open(self.path, 'ab') as f:
+                f.write(np.array(unsaved, dtype=RECORD_DTYPE).tobytes())
+
+    def timestamp_of(self, block_number: int) -> Optional[int]:
+        """Timestamp of a block if it's in the index"""
+        i = int(np.searchsorted(self._base['block'], block_number))
+        if i < len(self._base) and self._base['block'][i] == block_number:
+            return int(self._base['timestamp'][i])
+        with self._lock:
+            i = bisect_left(self._blocks, block_number)
+            if i < len(self._blocks) and self._blocks[i] == block_number:
+                return self._timestamps[i]
+        return None
+
+    def _record(self, block_number: int, timestamp: int):
+        with self._lock:
+            i = bisect_left(self._blocks, block_number)
+            if i < len(self._blocks) and self._blocks[i] == block_number:
+                return
+            self._blocks.insert(i, block_number)
+            self._timestamps.insert(i, timestamp)
+            if self._head is None or block_number <= self._head[0] - REORG_DEPTH:
+                self._unsaved.append((block_number, timestamp))
+
+    def _fetch(self, block_number: int) -> int:
+        timestamp = self.timestamp_of(block_number)
+        if timestamp is None:
+            timestamp = self.w3.eth.get_block(block_number)['timestamp']
+            self.fetches += 1
+            self._record(block_number, timestamp)
+        return timestamp
+
+    def head(self, refresh: bool = False) -> Tuple[int, int]:
+        """(block, timestamp) of the chain head, read once per index unless refresh"""
+        if self._head is None or refresh:
+            block = self.w3.eth.get_block('latest')
+            self.fetches += 1
+            self._head = (block['number'], block['timestamp'])
+        return self._head
+
+    def _bracket(self, timestamp: int) -> Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]]:
+        """Closest known samples (block, ts) with ts < timestamp and ts >= timestamp"""
+        lo, hi = None, None
+        base_ts = self._base['timestamp']
+        i = int(np.searchsorted(base_ts, timestamp, side='left'))
+        if i > 0:
+            lo = (int(self._base['block'][i - 1]), int(base_ts[i - 1]))
+        if i < len(self._base):
+            hi = (int(self._base['block'][i]), int(base_ts[i]))
+
+        with self._lock:
+            j = bisect_left(self._timestamps, timestamp)
+            if j > 0 and (lo is None or self._blocks[j - 1] > lo[0]):
+                lo = (self._blocks[j - 1], self._timestamps[j - 1])
+            if j < len(self._blocks) and (hi is None or self._blocks[j] < hi[0]):
+                hi = (self._blocks[j], self._timestamps[j])
+        return lo, hi
+
+    def block_at(self, timestamp: int) -> int:
+        """
+        First block whose timestamp is >= timestamp; the head if timestamp is
+        in the future and block 0 if it predates the chain
+        """
+        self.lookups += 1
+        # The head is only needed past the newest sample, so lookups inside known history cost no latest call
+        lo, hi = self._bracket(timestamp)
+        if hi is None:
+            head_block, head_ts = self.head()
+            if timestamp > head_ts:
+                head_block, head_ts = self.head(refresh=True)
+                if timestamp > head_ts:
+                    return head_block
+            self._record(head_block, head_ts)
+            hi = (head_block, head_ts)
+
+        # Step back past the oldest sample, doubling the step until it's older than timestamp
+        step = max(1, int((hi[1] - timestamp) / self.block_time))
+        while lo is None:
+            guess = max(0, hi[0] - step)
+            guess_ts = self._fetch(guess)
+            if guess_ts < timestamp:
+                lo = (guess, guess_ts)
+            elif guess == 0:
+                return 0
+            else:
+                hi, step = (guess, guess_ts), step * 2
+
+        # Interpolate within the bracket, bisecting when a guess leaves more than half the gap
+        interpolate = True
+        while hi[0] - lo[0] > 1:
+            gap = hi[0] - lo[0]
+            if interpolate and hi[1] > lo[1]:
+                guess = lo[0] + int((timestamp - lo[1]) * gap / (hi[1] - lo[1]))
+            else:
+                guess = (lo[0] + hi[0]) // 2
+            guess = min(max(guess, lo[0] + 1), hi[0] - 1)
+
+            guess_ts = self._fetch(guess)
+            if guess_ts < timestamp:
+                lo = (guess, guess_ts)
+            else:
+                hi = (guess, guess_ts)
+            interpolate = hi[0] - lo[0] <= gap // 2
+
+            # Samples other threads found may have narrowed the gap further
+            known_lo, known_hi = self._bracket(timestamp)
+            if known_lo and known_lo[0] > lo[0]:
+                lo = known_lo
+            if known_hi and known_hi[0] < hi[0]:
+                hi = known_hi
+
+        self.save()
+        return hi[0]
+
+    def blocks_at(self, timestamps: Iterable[int]) -> Dict[int, int]:
+        """Resolve many timestamps in time order, so each lookup starts from a tight bracket"""
+        return {timestamp: self.block_at(timestamp) for timestamp in sorted(timestamps)}
+
+    def report(self) -> str:
+        return (f"Block index: {len(self)} samples, {self.lookups} lookups, "
+                f"{self.fetches} RPC fetches ({self.fetches / max(self.lookups, 1):.1f} per lookup)")
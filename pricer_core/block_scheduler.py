@@ -0,0 +1,151 @@
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Optional
+import asyncio
+import time
+
+class PollingHeadFeed:
+    """
+    Yields new block numbers by polling eth_blockNumber. The poll interval
+    follows the observed block time (a quarter of its moving average) so a
+    ~250ms chain is polled quickly and mainnet isn't polled every few ms.
+    """
+    def __init__(self, w3, min_interval: float = 0.05, max_interval: float = 3.0,
+                 initial_block_time: float = 12.0):
+        self.w3 = w3  # AsyncWeb3
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.block_time = initial_block_time  # moving average, seconds
+
+    @property
+    def interval(self) -> float:
+        return min(self.max_interval, max(self.min_interval, self.block_time / 4))
+
+    async def __aiter__(self) -> AsyncIterator[int]:
+        last_block, last_seen = None, None
+        while True:
+            try:
+                block = await self.w3.eth.block_number
+            except Exception as e:
+                print(f"Error polling block number: {str(e)}")
+                await asyncio.sleep(self.max_interval)
+                continue
+
+            if last_block is None or block > last_block:
+                now = time.monotonic()
+                if last_block is not None:
+                    per_block = (now - last_seen) / (block - last_block)
+                    self.block_time = 0.8 * self.block_time + 0.2 * per_block
+                last_block, last_seen = block, now
+                yield block
+
+            await asyncio.sleep(self.interval)
+
+class SubscriptionHeadFeed:
+    """Yields block numbers from an eth_subscribe('newHeads') websocket subscription"""
+    def __init__(self, ws_url: str):
+        self.ws_url = ws_url
+
+    async def __aiter__(self) -> AsyncIterator[int]:
+        from web3 import AsyncWeb3, WebSocketProvider
+
+        async with AsyncWeb3(WebSocketProvider(self.ws_url)) as w3:
+            await w3.eth.subscribe('newHeads')
+            async for message in w3.socket.process_subscriptions():
+                yield int(message['result']['number'])
+
+@dataclass
+class SchedulerStats:
+    processed: int = 0
+    dropped: int = 0  # heads skipped because a newer one arrived while we were busy
+    last_block: Optional[int] = None
+    last_lag: float = 0.0  # seconds from head seen to cycle finished
+    avg_lag: float = 0.0
+    max_lag: float = 0.0
+
+    def record(self, block: int, lag: float):
+        self.processed += 1
+        self.last_block = block
+        self.last_lag = lag
+        self.avg_lag = lag if self.processed == 1 else 0.9 * self.avg_lag + 0.1 * lag
+        self.max_lag = max(self.max_lag, lag)
+
+    def report(self) -> str:
+        return (f"Block {self.last_block}: lag {self.last_lag * 1000:.0f}ms "
+                f"(avg {self.avg_lag * 1000:.0f}ms, max {self.max_lag * 1000:.0f}ms), "
+                f"processed {self.processed}, dropped {self.dropped}")
+
+class BlockScheduler:
+    """
+    Runs one cycle per new head (or per every_n_blocks heads). Heads are
+    consumed in the background while a cycle runs; when the cycle finishes
+    only the newest head is processed and any in between are dropped, so a
+    slow cycle never builds a backlog of stale blocks.
+    """
+    def __init__(self, feed, every_n_blocks: int = 1):
+        self.feed = feed
+        self.every_n_blocks = every_n_blocks
+        self.stats = SchedulerStats()
+
+        self._latest: Optional[int] = None
+        self._seen_at: float = 0.0
+        self._new_head = asyncio.Event()
+        self._feed_done = False
+
+    async def _follow_heads(self):
+        try:
+            async for block in self.feed:
+                if self._latest is None or block > self._latest:
+                    self._latest, self._seen_at = block, time.monotonic()
+                    self._new_head.set()
+        finally:
+            self._feed_done = True
+            self._new_head.set()
+
+    async def run(self, cycle: Callable[[int], Awaitable[None]], max_cycles: Optional[int] = None,
+                  report: Callable[[SchedulerStats], None] = None):
+        """
+        Call `await cycle(block_number)` for each scheduled head until the feed
+        ends; `report(stats)` is called after each cycle with its lag recorded.
+        An error raised by the feed is re-raised once the current cycle is done.
+        """
+        follower = asyncio.create_task(self._follow_heads())
+        try:
+            while max_cycles is None or self.stats.processed < max_cycles:
+                await self._new_head.wait()
+                self._new_head.clear()
+                if self._latest is None:
+                    if self._feed_done:
+                        break
+                    continue
+
+                block, seen_at = self._latest, self._seen_at
+                last = self.stats.last_block
+                if last is not None:
+                    if block - last < self.every_n_blocks:
+                        if self._feed_done:
+                            break
+                        continue
+                    self.stats.dropped += block - last - self.every_n_blocks
+
+                try:
+                    await cycle(block)
+                except Exception as e:
+                    print(f"Error processing block {block}: {str(e)}")
+                self.stats.record(block, time.monotonic() - seen_at)
+                if report:
+                    report(self.stats)
+
+                if self._feed_done and self._latest == block:
+                    break
+        finally:
+            if not follower.done():
+                follower.cancel()
+                try:
+                    await follower
+                except asyncio.CancelledError:
+                    pass  # our own shutdown; anything else the feed raises propagates
+
+        # A feed that failed (e.g. a dropped websocket) ended the run, rather than the feed running out
+        if not follower.cancelled() and follower.exception():
+            print(f"Error following heads: {str(follower.exception())}")
+            raise follower.exception()
@@ -0,0 +1,88 @@
+from web3 import Web3
+from requests.adapters import HTTPAdapter
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from dotenv import load_dotenv
+import os
+import requests
+
+from pricer_core.rpc_guard import get_rpc_guard, guard_web3
+
+# Load environment variables
+load_dotenv()
+
+@dataclass(frozen=True)
+class ChainProfile:
+    """
+    Everything that differs between deployments of the checker: RPC env vars,
+    token and contract addresses, the pools to price and the block time.
+    """
+    name: str
+    chain_id: int
+    rpc_env: str  # env var holding the HTTP RPC url
+    ws_env: str  # env var holding the websocket url, optional
+    block_time: float  # seconds, seeds the head poller
+    quoter: str  # Uniswap V3 QuoterV1
+    usdc: str
+    weth: str
+    uniswap_pools: Dict[str, str] = field(default_factory=dict)  # pool -> label
+
+    @property
+    def rpc_url(self) -> Optional[str]:
+        return os.getenv(self.rpc_env)
+
+    @property
+    def ws_url(self) -> Optional[str]:
+        return os.getenv(self.ws_env)
+
+    def web3(self, pool_size: int = 10) -> Web3:
+        """
+        Web3 over one keep-alive session shared by every thread, with up to
+        pool_size pooled connections. Pass block_identifier explicitly on
+        each call rather than setting w3.eth.default_block, which is shared.
+        Requests go through the endpoint's shared RpcGuard, which does the
+        rate limiting and retries in place of web3's own retry loop.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        provider = Web3.HTTPProvider(self.rpc_url, session=session, exception_retry_configuration=None)
+        return guard_web3(Web3(provider), get_rpc_guard(self.rpc_url))
+
+MAINNET = ChainProfile(
+    name='mainnet',
+    chain_id=1,
+    rpc_env='ALCHEMY_API_URL',
+    ws_env='ALCHEMY_WS_URL',
+    block_time=12.0,
+    quoter="0xb27308f9F90D607463bb33eA1BeBb41C27CE5AB6",
+    usdc=Web3.to_checksum_address("0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"),
+    weth=Web3.to_checksum_address("0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"),
+    uniswap_pools={
+        Web3.to_checksum_address("0x8ad599c3A0ff1De082011EFDDc58f1908eb6e6D8"): "0.3% fee pool",
+        Web3.to_checksum_address("0x88e6A0c2dDD26FEEb64F039a2c41296FcB3f5640"): "0.05% fee pool"
+    }
+)
+
+ARBITRUM = ChainProfile(
+    name='arbitrum',
+    chain_id=42161,
+    rpc_env='ARB_ALCHEMY_API_URL',
+    ws_env='ARB_ALCHEMY_WS_URL',
+    block_time=0.25,
+    quoter="0xb27308f9F90D607463bb33eA1BeBb41C27CE5AB6",
+    usdc=Web3.to_checksum_address("0xaf88d065e77c8cC2239327C5EDb3A432268e5831"),  # native USDC
+    weth=Web3.to_checksum_address("0x82aF49447D8a07e3bd95BD0d56f35241523fBab1"),
+    uniswap_pools={
+        Web3.to_checksum_address("0xC6962004f452bE9203591991D15f6b388e09E8D0"): "0.05% fee pool"
+    }
+)
+
+PROFILES = {profile.name: profile for profile in (MAINNET, ARBITRUM)}
+
+def get_profile(name: str) -> ChainProfile:
+    try:
+        return PROFILES[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown chain {name}, expected one of {', '.join(PROFILES)}")
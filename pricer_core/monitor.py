@@ -0,0 +1,166 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+import asyncio
+import json
+import os
+import sys
+import time
+
+from pricer_core.arb import setup_logging, check_block
+from pricer_core.block_scheduler import BlockScheduler, PollingHeadFeed, SubscriptionHeadFeed, SchedulerStats
+from pricer_core.chains import ChainProfile, get_profile
+from pricer_core.multicall import Multicall
+from pricer_core.opportunity_sink import OpportunitySink
+from pricer_core.opportunity_stats import OpportunityStats
+from pricer_core.rpc_guard import RpcGuard, get_rpc_guard
+from pricer_core.venues import VenueFanout, chain_venues, make_async_web3
+
+@dataclass
+class ChainMetrics:
+    """Throughput counters for one chain's monitor, cheap enough to update every cycle"""
+    chain: str
+    started: float = field(default_factory=time.monotonic)
+    cycles: int = 0
+    busy_time: float = 0.0  # seconds spent inside cycles
+    venue_calls: int = 0
+    venue_errors: int = 0
+    opportunities: int = 0
+    rpc: Optional[RpcGuard] = None  # the chain's shared RPC guard, for retry/drop counts
+    analytics: OpportunityStats = field(default_factory=OpportunityStats)
+    sink: Optional[OpportunitySink] = None  # set while the monitor runs
+
+    def record(self, seconds: float, snapshot: Dict, opportunities: List[Dict]):
+        self.cycles += 1
+        self.busy_time += seconds
+        self.venue_calls += len(snapshot['latency'])
+        self.venue_errors += len(snapshot['errors'])
+        self.opportunities += len(opportunities)
+        self.analytics.observe(snapshot['block'], int(time.time()), opportunities)
+
+    def to_dict(self, stats: SchedulerStats) -> Dict:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        return {
+            'chain': self.chain,
+            'last_block': stats.last_block,
+            'blocks_processed': stats.processed,
+            'blocks_dropped': stats.dropped,
+            'cycles_per_s': self.cycles / elapsed,
+            'avg_cycle_ms': self.busy_time / self.cycles * 1000 if self.cycles else 0.0,
+            'utilization': self.busy_time / elapsed,  # near 1.0 means this chain needs its own process
+            'avg_lag_ms': stats.avg_lag * 1000,
+            'max_lag_ms': stats.max_lag * 1000,
+            'venue_error_rate': self.venue_errors / self.venue_calls if self.venue_calls else 0.0,
+            'opportunities': self.opportunities,
+            'rpc': self.rpc.to_dict() if self.rpc else None,
+            'analytics': self.analytics.to_dict(),
+            'sink': self.sink.to_dict() if self.sink else None
+        }
+
+    def report(self, stats: SchedulerStats) -> str:
+        m = self.to_dict(stats)
+        return (f"[{self.chain}] block {m['last_block']}: {m['cycles_per_s']:.2f} cycles/s, "
+                f"avg cycle {m['avg_cycle_ms']:.0f}ms, utilization {m['utilization'] * 100:.0f}%, "
+                f"lag avg {m['avg_lag_ms']:.0f}ms, dropped {m['blocks_dropped']}, "
+                f"venue errors {m['venue_error_rate'] * 100:.1f}%, opportunities {m['opportunities']}"
+                + (f", {self.rpc.report()}" if self.rpc else "")
+                + (f", {self.sink.report()}" if self.sink else "")
+                + f"\n[{self.chain}] {self.analytics.summary()}")
+
+class ChainMonitor:
+    """
+    The live pricing loop for one chain. Each monitor owns its connection
+    pool, head feed and scheduler, so several can share one event loop
+    without a slow chain holding back a fast one.
+    """
+    def __init__(self, profile: ChainProfile,
+                 venues_factory: Callable = chain_venues,
+                 sampler_factory: Optional[Callable] = None,
+                 feed=None, every_n_blocks: int = 1, pool_size: int = 20):
+        self.profile = profile
+        self.venues_factory = venues_factory  # (profile, AsyncWeb3) -> List[Venue]
+        self.sampler_factory = sampler_factory  # AsyncWeb3 -> sampler, optional
+        self.feed = feed
+        self.every_n_blocks = every_n_blocks
+        self.pool_size = pool_size
+
+        self.metrics = ChainMetrics(profile.name, rpc=get_rpc_guard(profile.rpc_url))
+        self.scheduler: Optional[BlockScheduler] = None
+
+    def stats(self) -> SchedulerStats:
+        return self.scheduler.stats if self.scheduler else SchedulerStats()
+
+    async def run(self, max_cycles: Optional[int] = None):
+        logger, json_file = setup_logging(self.profile.name)
+        # Opportunities are written to json_file (and its successors each day) off the event loop
+        sink = OpportunitySink(self.profile.name)
+        self.metrics.sink = sink
+        # The sink's writer thread is closed however startup or the scheduler ends
+        try:
+            w3 = await make_async_web3(self.profile.rpc_url, self.pool_size)
+            fanout = VenueFanout(w3, self.venues_factory(self.profile, w3))
+            sampler = self.sampler_factory(w3) if self.sampler_factory else None
+
+            # Static pool metadata is read once so each cycle only issues price-bearing calls
+            multicall = Multicall(self.profile.web3())
+            for venue in fanout.venues:
+                await asyncio.to_thread(venue.warm, multicall)
+
+            # Follow new heads over websockets when available, otherwise poll eth_blockNumber
+            feed = self.feed
+            if feed is None:
+                ws_url = self.profile.ws_url
+                feed = SubscriptionHeadFeed(ws_url) if ws_url else PollingHeadFeed(w3, initial_block_time=self.profile.block_time)
+            self.scheduler = BlockScheduler(feed, every_n_blocks=self.every_n_blocks)
+
+            async def cycle(block_number: int):
+                start = time.perf_counter()
+                snapshot, opportunities = await check_block(fanout, logger, block_number, sampler, self.profile.name)
+                self.metrics.record(time.perf_counter() - start, snapshot, opportunities)
+                sink.put(block_number, opportunities)
+
+            await self.scheduler.run(cycle, max_cycles=max_cycles, report=lambda stats: logger.info(stats.report()))
+        finally:
+            await asyncio.to_thread(sink.close)
+
+def chain_metrics(monitors: List[ChainMonitor]) -> Dict[str, Dict]:
+    """Current metrics of every monitor keyed by chain name"""
+    return {m.profile.name: m.metrics.to_dict(m.stats()) for m in monitors}
+
+async def report_metrics(monitors: List[ChainMonitor], interval: float = 60.0, path: Optional[str] = None):
+    """Print every chain's throughput each interval, and overwrite path with it as JSON if given"""
+    while True:
+        await asyncio.sleep(interval)
+        for m in monitors:
+            print(m.metrics.report(m.stats()))
+        if path:
+            try:
+                with open(path, 'w') as f:
+                    json.dump(chain_metrics(monitors), f, indent=2)
+            except OSError as e:
+                print(f"Error writing metrics to {path}: {str(e)}")
+
+async def run_chains(monitors: List[ChainMonitor], report_interval: float = 60.0, metrics_file: Optional[str] = None):
+    """Run several chain monitors concurrently in one process until they all finish"""
+    reporter = asyncio.create_task(report_metrics(monitors, report_interval, metrics_file))
+    try:
+        results = await asyncio.gather(*(m.run() for m in monitors), return_exceptions=True)
+        for m, result in zip(monitors, results):
+            if isinstance(result, Exception):
+                print(f"Error monitoring {m.profile.name}: {str(result)}")
+    finally:
+        reporter.cancel()
+
+def monitors_from_env(chains: Optional[List[str]] = None) -> List[ChainMonitor]:
+    """One default monitor per chain name, from the arguments or the comma-separated CHAINS env var"""
+    if not chains:
+        chains = [c for c in os.getenv('CHAINS', 'mainnet').split(',') if c.strip()]
+    every_n_blocks = int(os.getenv('BLOCKS_PER_CHECK', 1))
+    return [ChainMonitor(get_profile(c.strip()), every_n_blocks=every_n_blocks) for c in chains]
+
+def main():
+    # e.g. python -m pricer_core.monitor mainnet arbitrum
+    monitors = monitors_from_env(sys.argv[1:])
+    asyncio.run(run_chains(monitors, float(os.getenv('METRICS_INTERVAL', 60)), os.getenv('METRICS_FILE')))
+
+if __name__ == "__main__":
+    main()
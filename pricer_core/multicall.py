@@ -0,0 +1,130 @@
+from web3 import Web3
+from eth_abi import encode, decode
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+# Multicall3 is deployed at the same address on every chain we care about
+MULTICALL3_ADDRESS = Web3.to_checksum_address("0xcA11bde05977b3631167028862bE2a173976CA11")
+
+# aggregate3((address target, bool allowFailure, bytes callData)[]) -> (bool success, bytes returnData)[]
+AGGREGATE3_SELECTOR = Web3.keccak(text="aggregate3((address,bool,bytes)[])")[:4]
+
+@dataclass
+class Call:
+    """A single read to pack into a multicall batch"""
+    target: str
+    signature: str  # e.g. "get_dy(uint256,uint256,uint256)"
+    args: Tuple = ()
+    output_types: Tuple[str, ...] = ('uint256',)
+    key: Hashable = None
+
+    @property
+    def input_types(self) -> List[str]:
+        inner = self.signature[self.signature.index('(') + 1:-1]
+        return [t for t in inner.split(',') if t]
+
+    def encode(self) -> bytes:
+        selector = Web3.keccak(text=self.signature)[:4]
+        return selector + encode(self.input_types, list(self.args))
+
+    def decode(self, data: bytes) -> Any:
+        values = decode(list(self.output_types), data)
+        # Unwrap single return values so callers get a plain int/address
+        return values[0] if len(values) == 1 else values
+
+@dataclass
+class MulticallResult:
+    block_number: int
+    results: Dict[Hashable, Any] = field(default_factory=dict)
+    failed: List[Hashable] = field(default_factory=list)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.results.get(key, default)
+
+class Multicall:
+    def __init__(self, w3: Web3, address: str = MULTICALL3_ADDRESS, batch_size: int = 100):
+        self.w3 = w3
+        self.address = Web3.to_checksum_address(address)
+        self.batch_size = batch_size  # calls per aggregate3, keeps requests under node gas/size caps
+
+    def resolve_block(self, block_identifier=None) -> int:
+        """Turn 'latest'/None into a concrete block number so every batch reads the same state"""
+        if block_identifier is None or block_identifier == 'latest':
+            return self.w3.eth.block_number
+        return int(block_identifier)
+
+    def aggregate(self, calls: Sequence[Call], block_identifier=None) -> MulticallResult:
+        """
+        Execute calls through Multicall3.aggregate3, pinned to a single block.
+        Individual calls may fail without failing the batch; their keys are
+        listed in `failed` and map to None in `results`.
+        """
+        block_number = self.resolve_block(block_identifier)
+        result = MulticallResult(block_number=block_number)
+
+        for start in range(0, len(calls), self.batch_size):
+            chunk = calls[start:start + self.batch_size]
+            try:
+                raw = self.w3.eth.call({'to': self.address, 'data': encode_aggregate3(chunk)}, block_number)
+                responses = decode_aggregate3(raw)
+            except Exception as e:
+                print(f"Multicall batch at block {block_number} failed: {str(e)}")
+                responses = [(False, b'')] * len(chunk)
+            collect_results(result, chunk, responses, start)
+
+        return result
+
+class AsyncMulticall:
+    """Multicall for AsyncWeb3; chunks of one aggregate run concurrently"""
+    def __init__(self, w3, address: str = MULTICALL3_ADDRESS, batch_size: int = 100):
+        self.w3 = w3
+        self.address = Web3.to_checksum_address(address)
+        self.batch_size = batch_size
+
+    async def resolve_block(self, block_identifier=None) -> int:
+        if block_identifier is None or block_identifier == 'latest':
+            return await self.w3.eth.block_number
+        return int(block_identifier)
+
+    async def aggregate(self, calls: Sequence[Call], block_identifier=None) -> MulticallResult:
+        block_number = await self.resolve_block(block_identifier)
+        result = MulticallResult(block_number=block_number)
+        chunks = [(start, calls[start:start + self.batch_size])
+                  for start in range(0, len(calls), self.batch_size)]
+
+        async def run_chunk(chunk):
+            try:
+                raw = await self.w3.eth.call({'to': self.address, 'data': encode_aggregate3(chunk)}, block_number)
+                return decode_aggregate3(raw)
+            except Exception as e:
+                print(f"Multicall batch at block {block_number} failed: {str(e)}")
+                return [(False, b'')] * len(chunk)
+
+        responses = await asyncio.gather(*(run_chunk(chunk) for _, chunk in chunks))
+        for (start, chunk), chunk_responses in zip(chunks, responses):
+            collect_results(result, chunk, chunk_responses, start)
+
+        return result
+
+def encode_aggregate3(calls: Sequence[Call]) -> bytes:
+    payload = [(Web3.to_checksum_address(c.target), True, c.encode()) for c in calls]
+    return AGGREGATE3_SELECTOR + encode(['(address,bool,bytes)[]'], [payload])
+
+def decode_aggregate3(raw: bytes) -> List[Tuple[bool, bytes]]:
+    return list(decode(['(bool,bytes)[]'], bytes(raw))[0])
+
+def collect_results(result: MulticallResult, calls: Sequence[Call],
+                    responses: List[Tuple[bool, bytes]], offset: int = 0):
+    """Decode aggregate3 responses into result, tolerating per-call failures"""
+    for i, (call, (success, data)) in enumerate(zip(calls, responses)):
+        key = call.key if call.key is not None else offset + i
+        value = None
+        if success and data:
+            try:
+                value = call.decode(data)
+            except Exception:
+                success = False
+        if not success or value is None:
+            result.failed.append(key)
+        result.results[key] = value
@@ -0,0 +1,99 @@
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Dict, List, Optional, TextIO
+import json
+import os
+import queue
+import threading
+import time
+
+from pricer_core.arb import opportunities_path
+
+@dataclass
+class SinkStats:
+    queued: int = 0
+    written: int = 0
+    dropped: int = 0  # rows refused because the queue was full
+    batches: int = 0
+    errors: int = 0  # batches lost to a failed write
+
+class OpportunitySink:
+    """
+    Append-only JSONL record of every opportunity the live loop finds, one
+    file per chain and day (logs/opportunities_[chain_]{date}.jsonl, the
+    json_file setup_logging() names). put() never blocks: rows go on a
+    bounded queue and a background thread writes them in batches, so a slow
+    disk can't stall pricing. When the queue is full rows are dropped and
+    counted instead.
+    """
+    def __init__(self, chain: Optional[str] = None, log_dir: str = 'logs', max_queue: int = 10_000,
+                 batch_size: int = 500, flush_interval: float = 1.0):
+        self.chain = chain
+        self.log_dir = log_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval  # seconds a partial batch may wait
+        self.stats = SinkStats()
+        os.makedirs(log_dir, exist_ok=True)
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._file: Optional[TextIO] = None
+        self._day: Optional[str] = None
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"opportunity-sink-{chain or 'default'}", daemon=True)
+        self._thread.start()
+
+    def put(self, block_number: int, opportunities: List[Dict], timestamp: Optional[float] = None):
+        """Queue a block's opportunities for writing, dropping any that don't fit"""
+        timestamp = timestamp or time.time()
+        for opp in opportunities:
+            row = {'timestamp': timestamp, 'chain': self.chain, 'block': block_number, **opp}
+            try:
+                self._queue.put_nowait(row)
+                self.stats.queued += 1
+            except queue.Full:
+                self.stats.dropped += 1
+
+    def _run(self):
+        while not (self._closed.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+        if self._file:
+            self._file.close()
+
+    def _write(self, batch: List[Dict]):
+        try:
+            for row in batch:
+                day = datetime.fromtimestamp(row['timestamp']).strftime('%Y%m%d')
+                if day != self._day:
+                    # Rotate at midnight, local time like the log files
+                    if self._file:
+                        self._file.close()
+                    self._file = open(opportunities_path(self.chain, day, self.log_dir), 'a')
+                    self._day = day
+                self._file.write(json.dumps(row) + '\n')
+            self._file.flush()
+            self.stats.written += len(batch)
+            self.stats.batches += 1
+        except (OSError, TypeError, ValueError) as e:
+            self.stats.errors += 1
+            print(f"Error writing {len(batch)} opportunities: {str(e)}")
+
+    def close(self, timeout: float = 5.0):
+        """Write whatever is queued and stop the writer thread"""
+        self._closed.set()
+        self._thread.join(timeout)
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self.stats), 'pending': self._queue.qsize()}
+
+    def report(self) -> str:
+        s = self.stats
+        return f"sink {s.written} written, {s.dropped} dropped" + (f", {s.errors} failed batches" if s.errors else "")
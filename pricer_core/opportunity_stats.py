@@ -0,0 +1,207 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from datetime import datetime
+import math
+import time
+
+# Quantiles shown in reports
+QUANTILES = (0.5, 0.9, 0.99)
+
+class QuantileSketch:
+    """
+    HDR-style histogram with log-spaced buckets: every value lands in a
+    bucket whose bounds are within relative_accuracy of it, so quantiles are
+    exact to that relative error and memory depends only on the range of
+    values seen (a few thousand buckets across 1e-9..1e9 at 1%), never on
+    how many. Values <= 0 are counted as 0.
+    """
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= 0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other: 'QuantileSketch'):
+        for index, n in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = max(math.ceil(q * self.count) - 1, 0)  # nearest rank
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Midpoint of the bucket in relative terms, clamped to what was actually seen
+                estimate = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        summary = {'count': self.count, 'mean': self.mean,
+                   'min': self.min if self.count else None, 'max': self.max if self.count else None}
+        for q in QUANTILES:
+            summary[f"p{q * 100:g}"] = self.quantile(q)
+        return summary
+
+class OpportunityStats:
+    """
+    Running summary of an opportunity stream, fed one checked block at a
+    time with observe(). Keeps per-pair counts, profit quantiles (per asset
+    in quote units and overall in percent), how many consecutive checked
+    blocks each buy/sell pair stayed open, and the best opportunity so far.
+    Memory grows with the number of pools, not with the number of blocks.
+    """
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.blocks = 0  # checked blocks observed
+        self.blocks_with_opportunities = 0
+        self.opportunities = 0
+        self.pair_counts: Dict[Tuple[str, str], int] = {}
+        self.profit_pct = QuantileSketch(relative_accuracy)
+        self.profit: Dict[str, QuantileSketch] = {}  # asset -> profit per unit of asset, in quote
+        self.best: Optional[Dict] = None
+
+        # Runs: consecutive checked blocks in which a pair had an opportunity
+        self.run_lengths = QuantileSketch(relative_accuracy)
+        self.longest_run: Optional[Dict] = None
+        self._open_runs: Dict[Tuple[str, str], Tuple[int, int]] = {}  # pair -> (first block, length)
+
+        self._last_report = time.monotonic()
+
+    def observe(self, block: int, timestamp: int, opportunities: List[Dict]):
+        """One checked block and every opportunity found in it (possibly none)"""
+        self.blocks += 1
+        if opportunities:
+            self.blocks_with_opportunities += 1
+
+        pairs = set()
+        for opp in opportunities:
+            self.opportunities += 1
+            pair = (opp['buy_pool'], opp['sell_pool'])
+            pairs.add(pair)
+            self.pair_counts[pair] = self.pair_counts.get(pair, 0) + 1
+
+            asset = opp.get('asset', 'eth')
+            profit = opp.get(f"profit_per_{asset}")
+            if profit is not None:
+                self.profit.setdefault(asset, QuantileSketch(self.relative_accuracy)).add(profit)
+            self.profit_pct.add(opp['profit_percentage'])
+            if self.best is None or opp['profit_percentage'] > self.best['profit_percentage']:
+                self.best = {**opp, 'block': block, 'timestamp': timestamp}
+
+        for pair in [p for p in self._open_runs if p not in pairs]:
+            self._close_run(pair)
+        for pair in pairs:
+            first, length = self._open_runs.get(pair, (block, 0))
+            self._open_runs[pair] = (first, length + 1)
+
+    def _close_run(self, pair: Tuple[str, str]):
+        first, length = self._open_runs.pop(pair)
+        self.run_lengths.add(length)
+        self._note_run(pair, first, length)
+
+    def _note_run(self, pair: Tuple[str, str], first: int, length: int):
+        if self.longest_run is None or length > self.longest_run['blocks']:
+            self.longest_run = {'buy_pool': pair[0], 'sell_pool': pair[1], 'first_block': first, 'blocks': length}
+
+    def observe_all(self, results: Iterable[Tuple]) -> 'OpportunityStats':
+        """Feed (timestamp, block, opportunities, ...) results in block order"""
+        for result in results:
+            self.observe(result[1], result[0], result[2])
+        return self
+
+    def report_due(self, interval: float) -> bool:
+        """True at most once per interval seconds, for periodic summaries"""
+        now = time.monotonic()
+        if now - self._last_report < interval:
+            return False
+        self._last_report = now
+        return True
+
+    def to_dict(self) -> Dict:
+        # Runs still open count at their current length
+        for pair, (first, length) in self._open_runs.items():
+            self._note_run(pair, first, length)
+        return {
+            'blocks': self.blocks,
+            'blocks_with_opportunities': self.blocks_with_opportunities,
+            'opportunities': self.opportunities,
+            'pairs': [{'buy_pool': buy, 'sell_pool': sell, 'count': n}
+                      for (buy, sell), n in sorted(self.pair_counts.items(), key=lambda item: -item[1])],
+            'profit_percentage': self.profit_pct.to_dict(),
+            'profit': {asset: sketch.to_dict() for asset, sketch in self.profit.items()},
+            'run_length': self.run_lengths.to_dict(),
+            'open_runs': len(self._open_runs),
+            'longest_run': self.longest_run,
+            'best': self.best
+        }
+
+    def summary(self) -> str:
+        """One line for periodic output"""
+        median = self.profit_pct.quantile(0.5)
+        best = self.best['profit_percentage'] if self.best else None
+        return (f"Opportunities: {self.opportunities} in {self.blocks_with_opportunities}/{self.blocks} blocks, "
+                f"median {median or 0:.3f}%, best {best or 0:.3f}%, "
+                f"longest run {self.longest_run['blocks'] if self.longest_run else 0} blocks")
+
+    def report(self) -> str:
+        """Multi-line summary in the shape analyze_results used to print"""
+        if not self.opportunities:
+            return "No opportunities found to analyze"
+        s = self.to_dict()
+        lines = ["\n=== Arbitrage Analysis ===",
+                 f"Blocks checked: {s['blocks']} ({s['blocks_with_opportunities']} with opportunities)",
+                 f"Total opportunities found: {s['opportunities']}"]
+        for asset, sketch in self.profit.items():
+            lines.append(f"{asset.upper()}: total potential profit {sketch.total:.2f} USDC, "
+                         f"average {sketch.mean:.2f} USDC per {asset.upper()}")
+        pct = s['profit_percentage']
+        lines.append("Profit %: " + ", ".join(f"p{q * 100:g} {pct[f'p{q * 100:g}']:.3f}%" for q in QUANTILES)
+                     + f", max {pct['max']:.3f}%")
+        lines.append("\nPairs:")
+        for pair in s['pairs'][:10]:
+            lines.append(f"{pair['buy_pool']} -> {pair['sell_pool']}: {pair['count']}")
+        runs = s['run_length']
+        if runs['count']:
+            lines.append(f"\nRuns: {runs['count']} closed, median {runs['p50']:.0f} blocks, p90 {runs['p90']:.0f} blocks")
+        longest = s['longest_run']
+        lines.append(f"Longest run: {longest['blocks']} blocks from block {longest['first_block']} "
+                     f"({longest['buy_pool']} -> {longest['sell_pool']})")
+
+        best = s['best']
+        asset = best.get('asset', 'eth')
+        lines += ["\nBest opportunity:",
+                  f"Block: {best['block']}",
+                  f"Time: {datetime.fromtimestamp(best['timestamp'])}",
+                  f"Buy from: {best['buy_pool']} at {best['buy_price']:.2f} USDC",
+                  f"Sell to: {best['sell_pool']} at {best['sell_price']:.2f} USDC",
+                  f"Profit: {best[f'profit_per_{asset}']:.2f} USDC per {asset.upper()} ({best['profit_percentage']:.2f}%)"]
+        return "\n".join(lines)
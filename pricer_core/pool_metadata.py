@@ -0,0 +1,155 @@
+from web3 import Web3
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Iterable, List, Optional
+import json
+import threading
+
+from pricer_core.multicall import Call, Multicall
+
+# Bump when the on-disk layout changes; older files are discarded and re-warmed
+SCHEMA_VERSION = 1
+
+# Curve uses this placeholder for native ETH, it has no decimals() to call
+NATIVE_ETH = "0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE"
+
+@dataclass
+class PoolMetadata:
+    address: str
+    venue: str  # 'uniswap_v3' or 'curve'
+    tokens: List[str]
+    decimals: List[int]
+    fee: Optional[int] = None  # Uniswap fee tier in hundredths of a bip
+    coin_indices: Dict[str, int] = field(default_factory=dict)  # token -> index in the pool
+
+    def index_of(self, token: str) -> int:
+        return self.coin_indices[Web3.to_checksum_address(token)]
+
+    def decimals_of(self, token: str) -> int:
+        return self.decimals[self.index_of(token)]
+
+class PoolMetadataStore:
+    """
+    Persistent store of static pool data (tokens, decimals, fee tier, coin
+    indices) keyed by chain id and pool address. Nothing in here can change
+    for a deployed pool, so entries never expire; warm() only reads pools and
+    tokens that aren't already known.
+    """
+    def __init__(self, chain_id: int, cache_file: str = "pool_metadata_cache.json"):
+        self.chain_id = chain_id
+        self.cache_file = cache_file
+
+        self.pools: Dict[str, PoolMetadata] = {}  # pool -> metadata
+        self.token_decimals: Dict[str, int] = {NATIVE_ETH: 18}  # token -> decimals
+        self._lock = threading.Lock()
+
+        self.load_cache()
+
+    def get(self, pool_address: str) -> Optional[PoolMetadata]:
+        return self.pools.get(Web3.to_checksum_address(pool_address))
+
+    def load_cache(self):
+        """Load this chain's entries from file, ignoring files from another schema version"""
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if data.get('version') != SCHEMA_VERSION:
+            return
+
+        chain = data['chains'].get(str(self.chain_id), {})
+        self.pools = {k: PoolMetadata(**v) for k, v in chain.get('pools', {}).items()}
+        self.token_decimals.update(chain.get('tokens', {}))
+
+    def save_cache(self):
+        """Save this chain's entries, keeping other chains already in the file"""
+        data = {'version': SCHEMA_VERSION, 'chains': {}}
+        try:
+            with open(self.cache_file, 'r') as f:
+                existing = json.load(f)
+            if existing.get('version') == SCHEMA_VERSION:
+                data = existing
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+        chain = data['chains'].setdefault(str(self.chain_id), {'pools': {}, 'tokens': {}})
+        chain['pools'].update({k: asdict(v) for k, v in self.pools.items()})
+        chain['tokens'].update(self.token_decimals)
+        with open(self.cache_file, 'w') as f:
+            json.dump(data, f)
+
+    def warm(self, multicall: Multicall, uniswap_pools: Iterable[str] = (),
+             curve_pools: Dict[str, int] = None):
+        """
+        Read metadata for any pools not yet in the store in two multicall
+        rounds: pool reads (token0/token1/fee, coins(i)), then decimals() for
+        tokens seen for the first time.
+        curve_pools maps pool address -> number of coins. Safe to call from
+        several threads; only one warms at a time and the rest see its entries.
+        """
+        with self._lock:
+            self._warm(multicall, uniswap_pools, curve_pools)
+
+    def _warm(self, multicall: Multicall, uniswap_pools: Iterable[str], curve_pools: Optional[Dict[str, int]]):
+        uniswap_pools = [Web3.to_checksum_address(p) for p in uniswap_pools if not self.get(p)]
+        curve_pools = {Web3.to_checksum_address(p): n for p, n in (curve_pools or {}).items() if not self.get(p)}
+        if not uniswap_pools and not curve_pools:
+            return
+
+        calls = []
+        for pool in uniswap_pools:
+            calls += [
+                Call(pool, "token0()", output_types=('address',), key=(pool, 'token0')),
+                Call(pool, "token1()", output_types=('address',), key=(pool, 'token1')),
+                Call(pool, "fee()", output_types=('uint24',), key=(pool, 'fee')),
+            ]
+        for pool, n_coins in curve_pools.items():
+            calls += [Call(pool, "coins(uint256)", (i,), output_types=('address',), key=(pool, i))
+                      for i in range(n_coins)]
+        pool_reads = multicall.aggregate(calls)
+
+        pool_tokens = {}
+        for pool in uniswap_pools:
+            token0, token1 = pool_reads.get((pool, 'token0')), pool_reads.get((pool, 'token1'))
+            if token0 and token1 and pool_reads.get((pool, 'fee')) is not None:
+                pool_tokens[pool] = [Web3.to_checksum_address(token0), Web3.to_checksum_address(token1)]
+            else:
+                print(f"Error reading metadata for pool {pool}")
+        for pool, n_coins in curve_pools.items():
+            coins = [pool_reads.get((pool, i)) for i in range(n_coins)]
+            if all(coins):
+                pool_tokens[pool] = [Web3.to_checksum_address(c) for c in coins]
+            else:
+                print(f"Error reading metadata for pool {pool}")
+
+        new_tokens = {t for tokens in pool_tokens.values() for t in tokens if t not in self.token_decimals}
+        if new_tokens:
+            decimals = multicall.aggregate([
+                Call(token, "decimals()", output_types=('uint8',), key=token) for token in new_tokens
+            ])
+            for token in new_tokens:
+                if decimals.get(token) is not None:
+                    self.token_decimals[token] = decimals.get(token)
+
+        for pool, tokens in pool_tokens.items():
+            if any(t not in self.token_decimals for t in tokens):
+                print(f"Error reading token decimals for pool {pool}")
+                continue
+            self.pools[pool] = PoolMetadata(
+                address=pool,
+                venue='uniswap_v3' if pool in uniswap_pools else 'curve',
+                tokens=tokens,
+                decimals=[self.token_decimals[t] for t in tokens],
+                fee=pool_reads.get((pool, 'fee')),
+                coin_indices={t: i for i, t in enumerate(tokens)}
+            )
+
+        self.save_cache()
+
+_stores: Dict[int, PoolMetadataStore] = {}
+
+def get_pool_metadata_store(chain_id: int) -> PoolMetadataStore:
+    """Shared store per chain so the Uniswap and Curve modules warm the same entries"""
+    if chain_id not in _stores:
+        _stores[chain_id] = PoolMetadataStore(chain_id)
+    return _stores[chain_id]
@@ -0,0 +1,200 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+import json
+import os
+import shutil
+import time
+
+# Numeric columns and their on-disk dtypes; venue/pool/asset/side are dictionary-encoded strings
+NUMERIC_COLUMNS = {'block': '<u8', 'timestamp': '<u8', 'size': '<f8', 'amount_out': '<f8'}
+STRING_COLUMNS = ('pool', 'asset', 'side')
+COLUMNS = ('block', 'timestamp', 'venue', 'pool', 'asset', 'side', 'size', 'amount_out')
+
+def rows_from_pools(block: int, timestamp: int, pools: Sequence[Dict],
+                    sizes: Dict[str, Tuple[float, float]]) -> List[Dict]:
+    """
+    Long-format rows for priced pools in the shape get_prices_at_block()
+    returns. sizes maps asset -> (asset amount quoted on the sell side,
+    quote amount spent on the buy side), e.g. {'eth': (1, 3000)}; a sell
+    row is asset in -> quote out and a buy row quote in -> asset out.
+    """
+    rows = []
+    for pool in pools:
+        for asset, (asset_size, quote_size) in sizes.items():
+            sell, buy = pool.get(f"{asset}_sell"), pool.get(f"{asset}_buy")
+            base = {'block': block, 'timestamp': timestamp, 'venue': pool['name'],
+                    'pool': pool.get('pool_address', pool['name']), 'asset': asset}
+            if sell:
+                rows.append({**base, 'side': 'sell', 'size': asset_size, 'amount_out': sell * asset_size})
+            if buy:
+                rows.append({**base, 'side': 'buy', 'size': quote_size, 'amount_out': quote_size / buy})
+    return rows
+
+class PriceHistoryStore:
+    """
+    Columnar, append-only price history for replaying backtests offline.
+    Rows are partitioned on disk by chain, venue and a block range bucket:
+
+        root/chain=1/venue=Curve/blocks=21000000-21099999/part-<ns>/{column}.npy
+
+    Each part holds one .npy per column plus meta.json (row count, block
+    min/max, string dictionaries). scan() prunes partitions by venue and
+    block range from the paths and meta before memory-mapping any column.
+    """
+    def __init__(self, root: str = "price_history", chain_id: int = 1,
+                 partition_blocks: int = 100_000, buffer_rows: int = 50_000):
+        self.root = root
+        self.chain_id = chain_id
+        self.partition_blocks = partition_blocks
+        self.buffer_rows = buffer_rows  # rows held in memory before a flush
+        self._buffer: List[Dict] = []
+
+    @property
+    def chain_dir(self) -> str:
+        return os.path.join(self.root, f"chain={self.chain_id}")
+
+    def append(self, rows: Iterable[Dict]):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.buffer_rows:
+            self.flush()
+
+    def append_pools(self, block: int, timestamp: int, pools: Sequence[Dict],
+                     sizes: Dict[str, Tuple[float, float]]):
+        self.append(rows_from_pools(block, timestamp, pools, sizes))
+
+    def flush(self):
+        """Write buffered rows as one new part per (venue, block bucket)"""
+        rows, self._buffer = self._buffer, []
+        groups: Dict[Tuple[str, int], List[Dict]] = {}
+        for row in rows:
+            bucket = row['block'] // self.partition_blocks
+            groups.setdefault((row['venue'], bucket), []).append(row)
+        for (venue, bucket), part_rows in groups.items():
+            self._write_part(venue, bucket, part_rows)
+
+    def _write_part(self, venue: str, bucket: int, rows: List[Dict]):
+        start = bucket * self.partition_blocks
+        partition = os.path.join(self.chain_dir, f"venue={venue}", f"blocks={start}-{start + self.partition_blocks - 1}")
+        part_dir = os.path.join(partition, f"part-{time.time_ns()}")
+        tmp_dir = f"{part_dir}.tmp"
+        os.makedirs(tmp_dir)
+
+        meta = {'rows': len(rows), 'dictionaries': {}}
+        for column, dtype in NUMERIC_COLUMNS.items():
+            np.save(os.path.join(tmp_dir, f"{column}.npy"), np.array([row[column] for row in rows], dtype=dtype))
+        for column in STRING_COLUMNS:
+            values, codes = np.unique([row[column] for row in rows], return_inverse=True)
+            np.save(os.path.join(tmp_dir, f"{column}.npy"), codes.astype('<u4'))
+            meta['dictionaries'][column] = values.tolist()
+        blocks = [row['block'] for row in rows]
+        meta['block_min'], meta['block_max'] = min(blocks), max(blocks)
+        with open(os.path.join(tmp_dir, "meta.json"), 'w') as f:
+            json.dump(meta, f)
+
+        # A part only becomes visible once every column is on disk
+        os.rename(tmp_dir, part_dir)
+
+    def compact(self):
+        """Merge each partition's parts into one, so scans open a few large files instead of many small ones"""
+        self.flush()
+        for venue, start, parts in self._partitions():
+            if len(parts) < 2:
+                continue
+            data = self._read(venue, parts, None, COLUMNS)
+            rows = [dict(zip(data, values)) for values in zip(*(column.tolist() for column in data.values()))]
+            self._write_part(venue, start // self.partition_blocks, rows)
+            for part_dir, _ in parts:
+                shutil.rmtree(part_dir)
+
+    def _partitions(self, block_range: Optional[Tuple[int, int]] = None, venues: Optional[Iterable[str]] = None):
+        """
+        (venue, first block, [(part dir, meta)]) for every partition that can
+        hold rows matching the filters, pruned by path and then by each
+        part's block min/max
+        """
+        if not os.path.isdir(self.chain_dir):
+            return
+        venues = set(venues) if venues is not None else None
+        for venue_dir in sorted(os.listdir(self.chain_dir)):
+            venue = venue_dir.split('=', 1)[1]
+            if venues is not None and venue not in venues:
+                continue
+            for blocks_dir in sorted(os.listdir(os.path.join(self.chain_dir, venue_dir))):
+                start, end = (int(b) for b in blocks_dir.split('=', 1)[1].split('-'))
+                if block_range and (end < block_range[0] or start > block_range[1]):
+                    continue
+                partition = os.path.join(self.chain_dir, venue_dir, blocks_dir)
+                parts = []
+                for part in sorted(os.listdir(partition)):
+                    if part.endswith('.tmp'):
+                        continue
+                    with open(os.path.join(partition, part, "meta.json"), 'r') as f:
+                        meta = json.load(f)
+                    if block_range and (meta['block_max'] < block_range[0] or meta['block_min'] > block_range[1]):
+                        continue
+                    parts.append((os.path.join(partition, part), meta))
+                yield venue, start, parts
+
+    def _read(self, venue: str, parts: List[Tuple[str, Dict]], block_range: Optional[Tuple[int, int]],
+              columns: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Requested columns of the rows in parts within block_range, memory-mapped and decoded"""
+        out = {column: [] for column in columns}
+        for part_dir, meta in parts:
+            mask = slice(None)
+            if block_range:
+                blocks = np.load(os.path.join(part_dir, "block.npy"), mmap_mode='r')
+                mask = (blocks >= block_range[0]) & (blocks <= block_range[1])
+            n = meta['rows'] if isinstance(mask, slice) else int(mask.sum())
+            for column in columns:
+                if column == 'venue':
+                    out[column].append(np.full(n, venue, dtype=object))
+                    continue
+                values = np.load(os.path.join(part_dir, f"{column}.npy"), mmap_mode='r')[mask]
+                if column in STRING_COLUMNS:
+                    values = np.array(meta['dictionaries'][column], dtype=object)[values]
+                out[column].append(np.asarray(values))
+        return {column: np.concatenate(arrays) if arrays else np.array([]) for column, arrays in out.items()}
+
+    def scan(self, block_range: Optional[Tuple[int, int]] = None, venues: Optional[Iterable[str]] = None,
+             columns: Sequence[str] = COLUMNS) -> Dict[str, np.ndarray]:
+        """
+        Matching rows as column arrays, block_range inclusive. String columns
+        come back decoded as object arrays; only requested columns are read.
+        """
+        parts = [self._read(venue, parts, block_range, columns)
+                 for venue, _, parts in self._partitions(block_range, venues)]
+        return {column: np.concatenate([p[column] for p in parts]) if parts else np.array([])
+                for column in columns}
+
+    def replay(self, block_range: Optional[Tuple[int, int]] = None,
+               venues: Optional[Iterable[str]] = None) -> Iterator[Tuple[int, int, List[Dict]]]:
+        """
+        (block, timestamp, pools) in block order, with pools rebuilt in the
+        shape find_arbitrage_opportunities takes. A row written twice for the
+        same block, pool, asset and side (e.g. a chunk redone after a crash)
+        counts once.
+        """
+        data = self.scan(block_range, venues)
+        if not len(data['block']):
+            return
+        # Stable, so of two rows for the same quote the one written last wins
+        order = np.argsort(data['block'], kind='stable')
+        blocks = data['block'][order]
+        boundaries = np.flatnonzero(np.diff(blocks)) + 1
+        # Plain lists index far faster than numpy scalars in the per-row loop
+        rows = zip(*(data[column][order].tolist() for column in COLUMNS))
+        ends = boundaries.tolist() + [len(blocks)]
+
+        i = 0
+        for end in ends:
+            pools: Dict[Tuple[str, str], Dict] = {}
+            block = timestamp = None
+            while i < end:
+                block, timestamp, venue, pool_address, asset, side, size, amount_out = next(rows)
+                i += 1
+                pool = pools.setdefault((venue, pool_address), {'name': venue, 'pool_address': pool_address, 'block': block})
+                if side == 'sell':
+                    pool[f"{asset}_sell"] = amount_out / size
+                elif amount_out:
+                    pool[f"{asset}_buy"] = size / amount_out
+            yield block, timestamp, list(pools.values())
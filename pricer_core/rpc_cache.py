@@ -0,0 +1,250 @@
+from web3.middleware import Web3Middleware
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from pricer_core.block_index import REORG_DEPTH
+
+# Position of the block parameter for methods whose answer is fixed once that block is final
+BLOCK_PARAM = {
+    'eth_call': 1,
+    'eth_getBalance': 1,
+    'eth_getCode': 1,
+    'eth_getStorageAt': 2,
+    'eth_getBlockByNumber': 0,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key BLOB PRIMARY KEY,
+    method TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    result BLOB NOT NULL,  -- zlib-compressed JSON of the response's result
+    size INTEGER NOT NULL,
+    used REAL NOT NULL  -- last hit or store, for evicting the least recently used
+);
+CREATE INDEX IF NOT EXISTS responses_used ON responses (used);
+"""
+
+def _block_number(tag: Any) -> Optional[int]:
+    """A block parameter as a number, None for tags like 'latest' that move"""
+    if isinstance(tag, int):
+        return tag
+    if isinstance(tag, str) and tag.startswith('0x'):
+        return int(tag, 16)
+    return None
+
+def pinned_block(method: str, params: Any) -> Optional[int]:
+    """
+    The block a request is pinned to, or None when its answer can change
+    (latest/pending tags, blockHash log filters, state overrides, or a
+    method that isn't cached). eth_chainId counts as pinned to block 0.
+    """
+    if method == 'eth_chainId':
+        return 0
+    if method == 'eth_getLogs':
+        log_filter = params[0] if params else {}
+        if 'blockHash' in log_filter:
+            return None
+        from_block, to_block = (_block_number(log_filter.get(k)) for k in ('fromBlock', 'toBlock'))
+        return to_block if from_block is not None else None
+    index = BLOCK_PARAM.get(method)
+    if index is None or len(params) <= index or (method == 'eth_call' and len(params) > 2):
+        return None
+    return _block_number(params[index])
+
+@dataclass
+class RpcCacheStats:
+    hits: int = 0
+    misses: int = 0  # cacheable requests that went to the network
+    uncacheable: int = 0  # requests for latest, recent blocks or uncached methods
+    stored: int = 0
+    evicted: int = 0
+
+class RpcResponseCache:
+    """
+    Content-addressed cache of RPC responses for one chain, in SQLite at
+    rpc_cache_{chain_id}.sqlite. A response is keyed by a hash of the chain
+    id, method and params (for eth_call: block number, to-address and
+    calldata), and only requests pinned to a block number are cached, never
+    latest. Blocks within reorg_depth of the newest head seen through the
+    cache are left alone, and the middleware reads the head before caching
+    anything. Once the file holds more than max_bytes of
+    responses the least recently used are evicted.
+    """
+    def __init__(self, chain_id: int, path: Optional[str] = None, max_bytes: int = 1 << 30,
+                 reorg_depth: int = REORG_DEPTH):
+        self.chain_id = chain_id
+        self.path = path or f"rpc_cache_{chain_id}.sqlite"
+        self.max_bytes = max_bytes
+        self.reorg_depth = reorg_depth
+
+        self.stats = RpcCacheStats()
+        self.head: Optional[int] = None
+        self._lock = threading.Lock()
+
+        # Backtest worker processes share the file: wait out each other's write locks rather than fail
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats.hits + self.stats.misses
+        return self.stats.hits / lookups if lookups else 0.0
+
+    def key(self, method: str, params: Any) -> bytes:
+        request = json.dumps([self.chain_id, method, params], sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(request.encode()).digest()
+
+    def cacheable_block(self, method: str, params: Any) -> Optional[int]:
+        """
+        pinned_block(), unless that block is still close enough to the head
+        to be reorged; nothing is cacheable until a head has been seen
+        """
+        block = pinned_block(method, params)
+        if block is None or self.head is None or block > self.head - self.reorg_depth:
+            return None
+        return block
+
+    def needs_head(self, method: str, params: Any) -> bool:
+        """True when a pinned request arrives before any head is known, see RpcCacheMiddleware"""
+        return self.head is None and pinned_block(method, params) is not None
+
+    def get(self, key: bytes) -> Optional[Any]:
+        with self._lock:
+            row = self.conn.execute("SELECT result FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            with self.conn:
+                self.conn.execute("UPDATE responses SET used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key: bytes, method: str, block: int, result: Any):
+        data = zlib.compress(json.dumps(result, separators=(',', ':')).encode())
+        with self._lock:
+            with self.conn:
+                old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, method, block, result, size, used) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, method, block, data, len(data), time.time())
+                )
+            self.size += len(data) - (old[0] if old else 0)
+            self.stats.stored += 1
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used responses until the cache is back under 90% of max_bytes"""
+        target = self.max_bytes * 0.9
+        with self.conn:
+            while self.size > target:
+                rows = self.conn.execute("SELECT key, size FROM responses ORDER BY used LIMIT 1000").fetchall()
+                if not rows:
+                    self.size = 0
+                    break
+                for key, size in rows:
+                    self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.size -= size
+                    self.stats.evicted += 1
+                    if self.size <= target:
+                        break
+
+    def _note_head(self, method: str, params: Any, response: Dict):
+        """Track the newest head among responses passing through, to keep recent blocks out"""
+        result = response.get('result') if isinstance(response, dict) else None
+        if method == 'eth_blockNumber' and isinstance(result, str):
+            block = int(result, 16)
+        elif method == 'eth_getBlockByNumber' and isinstance(result, dict) and _block_number(params[0]) is None:
+            block = _block_number(result.get('number'))
+        else:
+            return
+        if block is not None and (self.head is None or block > self.head):
+            self.head = block
+
+    def lookup(self, method: str, params: Any):
+        """(key, block, cached response) where key is None for uncacheable requests and response None on a miss"""
+        block = self.cacheable_block(method, params)
+        if block is None:
+            self.stats.uncacheable += 1
+            return None, None, None
+        key = self.key(method, params)
+        result = self.get(key)
+        if result is None:
+            return key, block, None
+        return key, block, {'jsonrpc': '2.0', 'id': 0, 'result': result}
+
+    def store(self, key: Optional[bytes], method: str, params: Any, block: Optional[int], response: Dict):
+        self._note_head(method, params, response)
+        if key is None or not isinstance(response, dict) or 'error' in response or response.get('result') is None:
+            return
+        self.put(key, method, block, response['result'])
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self.stats), 'hit_rate': self.hit_rate, 'bytes': self.size}
+
+    def report(self) -> str:
+        s = self.stats
+        return (f"RPC cache: {s.hits} hits, {s.misses} misses ({self.hit_rate * 100:.1f}% hit rate), "
+                f"{s.uncacheable} uncacheable, {s.evicted} evicted, {self.size / 1e6:.1f} MB")
+
+class RpcCacheMiddleware(Web3Middleware):
+    """Answers pinned requests of a Web3/AsyncWeb3 from an RpcResponseCache"""
+    def __init__(self, w3, cache: RpcResponseCache):
+        super().__init__(w3)
+        self.cache = cache
+
+    def wrap_make_request(self, make_request):
+        def middleware(method, params):
+            if self.cache.needs_head(method, params):
+                # Read the head once, so blocks within reorg depth of it are never cached
+                self.cache.store(None, 'eth_blockNumber', [], None, make_request('eth_blockNumber', []))
+            key, block, cached = self.cache.lookup(method, params)
+            if cached is not None:
+                return cached
+            response = make_request(method, params)
+            self.cache.store(key, method, params, block, response)
+            return response
+        return middleware
+
+    async def async_wrap_make_request(self, make_request):
+        async def middleware(method, params):
+            if self.cache.needs_head(method, params):
+                self.cache.store(None, 'eth_blockNumber', [], None, await make_request('eth_blockNumber', []))
+            key, block, cached = self.cache.lookup(method, params)
+            if cached is not None:
+                return cached
+            response = await make_request(method, params)
+            self.cache.store(key, method, params, block, response)
+            return response
+        return middleware
+
+def cache_web3(w3, cache: RpcResponseCache):
+    """
+    Put the cache next to the provider, just outside the rpc_guard if there
+    is one, so hits cost neither a network call nor rate limit tokens. A
+    client that already has a cache is switched over to this one.
+    """
+    onion = w3.middleware_onion
+    if 'rpc_cache' in onion:
+        onion.replace('rpc_cache', lambda w3: RpcCacheMiddleware(w3, cache))
+        return w3
+    guard = onion['rpc_guard'] if 'rpc_guard' in onion else None
+    if guard is not None:
+        onion.remove('rpc_guard')
+    onion.inject(lambda w3: RpcCacheMiddleware(w3, cache), name='rpc_cache', layer=0)
+    if guard is not None:
+        onion.inject(guard, name='rpc_guard', layer=0)
+    return w3
@@ -0,0 +1,298 @@
+from web3.middleware import Web3Middleware
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Optional
+import aiohttp
+import asyncio
+import os
+import random
+import requests
+import threading
+import time
+
+# Compute units per method (Alchemy's pricing); anything not listed costs DEFAULT_COMPUTE_UNITS
+COMPUTE_UNITS = {
+    'eth_chainId': 0,
+    'eth_blockNumber': 10,
+    'eth_getBlockByNumber': 16,
+    'eth_call': 26,
+    'eth_getLogs': 75,
+    'eth_subscribe': 10,
+}
+DEFAULT_COMPUTE_UNITS = 20
+
+# HTTP statuses worth retrying; 429 also means the rate is too high
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# JSON-RPC error codes/messages providers use for throttling instead of a 429 status
+THROTTLE_CODES = {429, -32005}
+THROTTLE_MESSAGES = ('rate limit', 'compute units', 'capacity', 'too many requests')
+
+class CircuitOpenError(Exception):
+    """The RPC endpoint failed repeatedly and calls are being refused until it cools down"""
+
+class RpcThrottled(Exception):
+    """The provider answered with a throttling error inside a 200 response"""
+
+class TokenBucket:
+    """Compute units refilled at `rate` per second, up to one second's worth of burst"""
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, cost: float) -> float:
+        """Take cost units, possibly into debt; returns how long the caller must wait"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            return max(0.0, -self.tokens / self.rate)
+
+    def acquire(self, cost: float):
+        wait = self._reserve(cost)
+        if wait:
+            time.sleep(wait)
+
+    async def async_acquire(self, cost: float):
+        wait = self._reserve(cost)
+        if wait:
+            await asyncio.sleep(wait)
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failed attempts and refuses
+    calls for reset_timeout seconds, then lets calls through again; the
+    first failure after that reopens it straight away
+    """
+    def __init__(self, failure_threshold: int = 10, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'open' if time.monotonic() - self.opened_at < self.reset_timeout else 'half-open'
+
+    def allow(self) -> bool:
+        return self.state != 'open'
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                if self.state != 'open':
+                    self.trips += 1
+                self.opened_at = time.monotonic()
+
+@dataclass
+class RpcStats:
+    calls: int = 0
+    compute_units: int = 0
+    retried: int = 0  # attempts that were retried
+    throttled: int = 0  # 429s and throttling errors seen
+    dropped: int = 0  # calls that failed after every retry or were refused by the breaker
+
+class RpcGuard:
+    """
+    Shared rate limiting and retries for every call to one RPC endpoint.
+    Calls wait on a token bucket of compute units; throttled or 5xx/
+    connection failures are retried with full-jitter exponential backoff;
+    repeated failures open a circuit breaker. The rate is tuned by AIMD:
+    it creeps up by increase_step CU/s after every success_window calls
+    without throttling and is cut by backoff_factor on each throttle, so it
+    settles just under the largest rate the plan allows.
+    """
+    def __init__(self, max_rate: float = 330.0, initial_rate: Optional[float] = None, min_rate: float = 20.0,
+                 max_retries: int = 5, base_delay: float = 0.25, max_delay: float = 10.0,
+                 increase_step: float = 10.0, success_window: int = 50, backoff_factor: float = 0.7,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.max_rate = max_rate  # compute units per second the plan allows
+        self.min_rate = min_rate
+        self.bucket = TokenBucket(initial_rate or max_rate * 0.5)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.increase_step = increase_step
+        self.success_window = success_window
+        self.backoff_factor = backoff_factor
+        self.breaker = breaker or CircuitBreaker()
+
+        self.stats = RpcStats()
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def _on_success(self):
+        self.breaker.record_success()
+        with self._lock:
+            self._successes += 1
+            if self._successes >= self.success_window:
+                self._successes = 0
+                self.bucket.rate = min(self.max_rate, self.bucket.rate + self.increase_step)
+
+    def _on_throttle(self):
+        with self._lock:
+            self.stats.throttled += 1
+            self._successes = 0
+            self.bucket.rate = max(self.min_rate, self.bucket.rate * self.backoff_factor)
+
+    def _delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _begin(self, method: str) -> float:
+        """Count the call and its cost, refusing it if the breaker is open"""
+        cost = COMPUTE_UNITS.get(method, DEFAULT_COMPUTE_UNITS)
+        with self._lock:
+            self.stats.calls += 1
+            self.stats.compute_units += cost
+        if not self.breaker.allow():
+            with self._lock:
+                self.stats.dropped += 1
+            raise CircuitOpenError(f"RPC circuit open, refusing {method}")
+        return cost
+
+    def _classify(self, error: Exception) -> Optional[str]:
+        """'throttle', 'retry' or None when the error isn't worth retrying"""
+        if isinstance(error, RpcThrottled):
+            return 'throttle'
+        status = None
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            status = error.response.status_code
+        elif isinstance(error, aiohttp.ClientResponseError):
+            status = error.status
+        if status == 429:
+            return 'throttle'
+        if status in RETRY_STATUSES:
+            return 'retry'
+        if isinstance(error, (requests.ConnectionError, requests.Timeout, aiohttp.ClientConnectionError,
+                              asyncio.TimeoutError)):
+            return 'retry'
+        return None
+
+    def _check_response(self, response: Dict) -> Dict:
+        """Raise RpcThrottled for throttling errors returned as a normal JSON-RPC response"""
+        error = response.get('error') if isinstance(response, dict) else None
+        if isinstance(error, dict):
+            message = str(error.get('message', '')).lower()
+            if error.get('code') in THROTTLE_CODES or any(m in message for m in THROTTLE_MESSAGES):
+                raise RpcThrottled(error.get('message'))
+        return response
+
+    def _failed(self, method: str, error: Exception, attempt: int) -> bool:
+        """Record a failed attempt; True when it should be retried"""
+        kind = self._classify(error)
+        if kind == 'throttle':
+            self._on_throttle()
+        elif kind == 'retry':
+            self.breaker.record_failure()
+        if kind is None or attempt >= self.max_retries or not self.breaker.allow():
+            if kind is not None:
+                with self._lock:
+                    self.stats.dropped += 1
+                print(f"Error calling {method}: giving up after {attempt + 1} attempts: {str(error)}")
+            return False
+        with self._lock:
+            self.stats.retried += 1
+        return True
+
+    def call(self, make_request: Callable, method: str, params: Any) -> Any:
+        cost = self._begin(method)
+        attempt = 0
+        while True:
+            self.bucket.acquire(cost)
+            try:
+                response = self._check_response(make_request(method, params))
+                self._on_success()
+                return response
+            except Exception as e:
+                if not self._failed(method, e, attempt):
+                    raise
+            time.sleep(self._delay(attempt))
+            attempt += 1
+
+    async def async_call(self, make_request: Callable, method: str, params: Any) -> Any:
+        cost = self._begin(method)
+        attempt = 0
+        while True:
+            await self.bucket.async_acquire(cost)
+            try:
+                response = self._check_response(await make_request(method, params))
+                self._on_success()
+                return response
+            except Exception as e:
+                if not self._failed(method, e, attempt):
+                    raise
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self.stats), 'rate_cu_per_s': self.rate, 'breaker': self.breaker.state,
+                'breaker_trips': self.breaker.trips}
+
+    def report(self) -> str:
+        s = self.stats
+        return (f"RPC: {s.calls} calls ({s.compute_units} CU), {s.retried} retried, {s.throttled} throttled, "
+                f"{s.dropped} dropped, rate {self.rate:.0f} CU/s, breaker {self.breaker.state}")
+
+class RpcGuardMiddleware(Web3Middleware):
+    """Routes every request of a Web3/AsyncWeb3 instance through an RpcGuard"""
+    def __init__(self, w3, guard: RpcGuard):
+        super().__init__(w3)
+        self.guard = guard
+
+    def wrap_make_request(self, make_request):
+        def middleware(method, params):
+            return self.guard.call(make_request, method, params)
+        return middleware
+
+    async def async_wrap_make_request(self, make_request):
+        async def middleware(method, params):
+            return await self.guard.async_call(make_request, method, params)
+        return middleware
+
+_guards: Dict[str, RpcGuard] = {}
+_guards_lock = threading.Lock()
+_rate_share = 1.0  # fraction of the plan this process may use
+
+def get_rpc_guard(url: Optional[str]) -> RpcGuard:
+    """
+    One guard per endpoint url, shared by every Web3 built for it in this
+    process, sized by RPC_COMPUTE_UNITS_PER_SECOND (the plan's CU/s)
+    """
+    key = url or ''
+    with _guards_lock:
+        if key not in _guards:
+            _guards[key] = RpcGuard(max_rate=float(os.getenv('RPC_COMPUTE_UNITS_PER_SECOND', 330)) * _rate_share)
+        return _guards[key]
+
+def share_rpc_rate(share: float):
+    """
+    Limit this process to a fraction of each endpoint's plan, e.g. 1/N in
+    each of N worker processes, so together they stay within it
+    """
+    global _rate_share
+    with _guards_lock:
+        for guard in _guards.values():
+            guard.max_rate = guard.max_rate / _rate_share * share
+            guard.bucket.rate = min(guard.bucket.rate, guard.max_rate)
+        _rate_share = share
+
+def guard_web3(w3, guard: RpcGuard):
+    """Put the guard innermost in a Web3/AsyncWeb3's middleware stack, so it sees raw provider responses"""
+    w3.middleware_onion.inject(lambda w3: RpcGuardMiddleware(w3, guard), name='rpc_guard', layer=0)
+    return w3
@@ -0,0 +1,83 @@
+from typing import Dict, List, Tuple
+
+from pricer_core.chains import ChainProfile
+from pricer_core.multicall import Call, Multicall, MulticallResult
+from pricer_core.pool_metadata import PoolMetadataStore, get_pool_metadata_store
+
+# Quote sizes in whole tokens, scaled by each token's decimals
+ETH_AMOUNT = 1  # 1 ETH
+USDC_AMOUNT = 3000  # 3000 USDC
+
+QUOTE_SIGNATURE = "quoteExactInputSingle(address,address,uint24,uint256,uint160)"
+
+class UniswapQuoter:
+    """
+    ETH/USDC buy and sell prices for one chain's Uniswap V3 pools, quoted
+    through that chain's QuoterV1 and batched with Multicall3
+    """
+    def __init__(self, profile: ChainProfile, metadata: PoolMetadataStore = None):
+        self.profile = profile
+        self.metadata = metadata or get_pool_metadata_store(profile.chain_id)
+
+    @property
+    def pools(self) -> Dict[str, str]:
+        return self.profile.uniswap_pools
+
+    def warm(self, multicall: Multicall):
+        """Load token/fee/decimals for every pool so the hot loop only issues quotes"""
+        self.metadata.warm(multicall, uniswap_pools=self.pools.keys())
+
+    def quote_params(self, pool_address: str) -> Tuple[str, str, int, int, int]:
+        """(weth_token, usdc_token, fee, eth_decimals, usdc_decimals) for a pool"""
+        metadata = self.metadata.get(pool_address)
+        if metadata is None:
+            raise ValueError(f"No pool metadata for {pool_address} on {self.profile.name}")
+        token0, token1 = metadata.tokens
+
+        # Determine token ordering
+        is_usdc_token0 = token0.lower() == self.profile.usdc.lower()
+        usdc_token = token0 if is_usdc_token0 else token1
+        weth_token = token1 if is_usdc_token0 else token0
+        return weth_token, usdc_token, metadata.fee, metadata.decimals_of(weth_token), metadata.decimals_of(usdc_token)
+
+    def quote_calls(self) -> List[Call]:
+        """Quoter calls for every pool with warmed metadata"""
+        calls = []
+        for pool_address in self.pools:
+            if self.metadata.get(pool_address) is None:
+                print(f"Error with pool {pool_address}: no pool metadata")
+                continue
+            weth_token, usdc_token, fee, eth_decimals, usdc_decimals = self.quote_params(pool_address)
+            calls += [
+                Call(self.profile.quoter, QUOTE_SIGNATURE,
+                     (weth_token, usdc_token, fee, ETH_AMOUNT * 10**eth_decimals, 0),
+                     key=(pool_address, 'usdc_for_eth')),
+                Call(self.profile.quoter, QUOTE_SIGNATURE,
+                     (usdc_token, weth_token, fee, USDC_AMOUNT * 10**usdc_decimals, 0),
+                     key=(pool_address, 'eth_for_usdc')),
+            ]
+        return calls
+
+    def prices_from_results(self, results: MulticallResult) -> Dict[str, Dict[str, float]]:
+        """Pool address -> {'eth_buy', 'eth_sell', 'name'} from a multicall result"""
+        pool_prices = {}
+        for pool_address in self.pools:
+            usdc_for_eth = results.get((pool_address, 'usdc_for_eth'))
+            eth_for_usdc = results.get((pool_address, 'eth_for_usdc'))
+            if not usdc_for_eth or not eth_for_usdc:
+                print(f"Error with pool {pool_address}: missing quotes at block {results.block_number}")
+                continue
+            _, _, _, eth_decimals, usdc_decimals = self.quote_params(pool_address)
+            pool_prices[pool_address] = prices_from_amounts(usdc_for_eth, eth_for_usdc, usdc_decimals, eth_decimals)
+        return pool_prices
+
+def prices_from_amounts(usdc_for_eth: int, eth_for_usdc: int,
+                        usdc_decimals: int, eth_decimals: int) -> Dict[str, float]:
+    """Convert raw quoter outputs into per-ETH buy/sell prices"""
+    eth_sell_price = usdc_for_eth / (10**usdc_decimals) / ETH_AMOUNT
+    eth_buy_price = (USDC_AMOUNT / (eth_for_usdc / 10**eth_decimals))
+    return {
+        'eth_buy': eth_buy_price,
+        'eth_sell': eth_sell_price,
+        'name': 'Uniswap'
+    }
@@ -0,0 +1,130 @@
+from web3 import AsyncWeb3, AsyncHTTPProvider
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+import aiohttp
+import asyncio
+import os
+import time
+
+from pricer_core.chains import ChainProfile
+from pricer_core.multicall import AsyncMulticall, Multicall
+from pricer_core.rpc_guard import get_rpc_guard, guard_web3
+from pricer_core.uniswap import UniswapQuoter
+
+async def make_async_web3(url: str, pool_size: int = 20) -> AsyncWeb3:
+    """
+    AsyncWeb3 whose requests share one keep-alive aiohttp connection pool
+    and go through the endpoint's shared RpcGuard
+    """
+    provider = AsyncHTTPProvider(url, exception_retry_configuration=None)
+    session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=pool_size))
+    await provider.cache_async_session(session)
+    return guard_web3(AsyncWeb3(provider), get_rpc_guard(url))
+
+class Venue:
+    """A price source that can be fetched as one coroutine per cycle"""
+    name = 'Venue'
+
+    def __init__(self, timeout: float = 5.0):
+        self.timeout = timeout  # seconds before this venue is dropped from the cycle
+
+    async def fetch(self, block_number: int) -> Dict[str, Dict[str, float]]:
+        """Return pool/market id -> price dict, in the same shape as get_curve_prices()"""
+        raise NotImplementedError
+
+    def warm(self, multicall: Multicall):
+        """Read any static data (tokens, decimals, fee tiers) once before the first cycle"""
+        pass
+
+class UniswapVenue(Venue):
+    name = 'Uniswap'
+
+    def __init__(self, multicall: AsyncMulticall, quoter: UniswapQuoter, timeout: float = 5.0):
+        super().__init__(timeout)
+        self.multicall = multicall
+        self.quoter = quoter
+
+    async def fetch(self, block_number: int) -> Dict[str, Dict[str, float]]:
+        results = await self.multicall.aggregate(self.quoter.quote_calls(), block_number)
+        return self.quoter.prices_from_results(results)
+
+    def warm(self, multicall: Multicall):
+        self.quoter.warm(multicall)
+
+class CoinbaseVenue(Venue):
+    name = 'Coinbase'
+
+    async def fetch(self, block_number: int) -> Dict[str, Dict[str, float]]:
+        # The Coinbase client is blocking, keep it off the event loop
+        from pricer_core.coinbase import get_coinbase_prices
+        prices = await asyncio.to_thread(get_coinbase_prices)
+        return {'coinbase': prices} if prices else {}
+
+class GMXVenue(Venue):
+    """
+    GMX quotes from the blocking SDK router, on one dedicated worker thread.
+    A timed-out fetch can't stop the SDK call and the router isn't thread
+    safe, so while the previous quote is still running the next blocks are
+    skipped (reported as an error) instead of starting another one.
+    """
+    name = 'GMX'
+
+    def __init__(self, router, timeout: float = 10.0):
+        super().__init__(timeout)
+        self.router = router  # anything with GMXRouter.get_swap_quote(token_in, token_out, amount_in)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gmx')
+        self.running: Optional[Future] = None
+
+    def _quote(self):
+        return (self.router.get_swap_quote("ETH", "USDC", 1),
+                self.router.get_swap_quote("USDC", "ETH", 3000))
+
+    async def fetch(self, block_number: int) -> Dict[str, Dict[str, float]]:
+        if self.running is not None and not self.running.done():
+            raise RuntimeError("previous GMX quote still running, skipping this block")
+        self.running = self.executor.submit(self._quote)
+        sell, buy = await asyncio.wrap_future(self.running)
+        if not sell or not buy or not sell['amount_out'] or not buy['amount_out']:
+            return {}
+        return {'gmx': {'eth_sell': float(sell['amount_out']), 'eth_buy': 3000 / float(buy['amount_out'])}}
+
+class VenueFanout:
+    """
+    Runs every venue concurrently against one block. Each venue has its own
+    timeout, so cycle latency is bounded by the slowest healthy venue and a
+    failing venue only drops its own prices.
+    """
+    def __init__(self, w3: AsyncWeb3, venues: List[Venue]):
+        self.w3 = w3
+        self.venues = venues
+
+    async def fetch_all(self, block_number: Optional[int] = None) -> Dict:
+        if block_number is None:
+            block_number = await self.w3.eth.block_number
+
+        results = await asyncio.gather(*(self._run(venue, block_number) for venue in self.venues))
+
+        snapshot = {'block': block_number, 'venues': {}, 'latency': {}, 'errors': {}}
+        for venue, (prices, latency, error) in zip(self.venues, results):
+            snapshot['venues'][venue.name] = prices
+            snapshot['latency'][venue.name] = latency
+            if error:
+                snapshot['errors'][venue.name] = error
+        return snapshot
+
+    async def _run(self, venue: Venue, block_number: int):
+        start = time.perf_counter()
+        try:
+            prices = await asyncio.wait_for(venue.fetch(block_number), timeout=venue.timeout)
+            return prices, time.perf_counter() - start, None
+        except asyncio.TimeoutError:
+            return {}, time.perf_counter() - start, f"timed out after {venue.timeout:.1f}s"
+        except Exception as e:
+            return {}, time.perf_counter() - start, str(e)
+
+def chain_venues(profile: ChainProfile, w3: AsyncWeb3, include_coinbase: bool = True) -> List[Venue]:
+    """Venues every chain profile supports: its Uniswap pools, plus Coinbase as the CEX reference"""
+    venues = [UniswapVenue(AsyncMulticall(w3), UniswapQuoter(profile))]
+    if include_coinbase and os.getenv('COINBASE_API_KEY'):
+        venues.append(CoinbaseVenue())
+    return venues